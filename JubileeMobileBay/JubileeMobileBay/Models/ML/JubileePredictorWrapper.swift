@@ -38,9 +38,18 @@ class JubileePredictorWrapper: NSObject {
         // Get prediction from model
         let output = try model.prediction(from: inputFeatures)
         
+        // Single-ensemble models return [jubileeProbability, confidenceScore] as one array
+        if let combined = output.featureValue(for: "jubileePrediction")?.multiArrayValue,
+           combined.count >= 2 {
+            return JubileePredictorWrapperOutput(
+                jubileeProbability: combined[0].doubleValue,
+                confidenceScore: combined[1].doubleValue
+            )
+        }
+
         // Extract jubilee probability
         let jubileeProbability = output.featureValue(for: "jubileeProbability")?.doubleValue ?? 0.5
-        
+
         // Calculate confidence score based on input conditions
         let confidenceScore = calculateConfidence(
             airTemp: input.airTemperature,
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Incremental build of the JubileePredictor model
+Runs generate -> split -> train -> evaluate -> convert -> optimize -> save -> verify
+as a dependency graph. Every stage result is cached under a hash of its
+settings, its code and the content of its inputs, so a rerun only executes
+the stages whose inputs changed, and stages whose inputs are ready run in
+parallel
+
+The default forests are limited to depth 10 (a 7.8 MB model). The
+shipped train_jubilee_model forests have no depth limit, reach depth 42
+and make an ~80 MB model that trains and verifies in about 100 s here;
+--set max_depth=null builds those. Tools that take DEFAULT_CONFIG
+(benchmark_pipeline, tree_shap) therefore work on the depth-10 forests
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Bump when the cache layout changes
+CACHE_FORMAT = 1
+
+FEATURES = ['airTemperature', 'waterTemperature', 'windSpeed', 'dissolvedOxygen']
+TARGETS = ['jubileeProbability', 'confidenceScore']
+OUTPUT_NAME = 'jubileePrediction'
+
+DEFAULT_CONFIG = {
+    # Data
+    'n_samples': 20000,
+    'seed': 42,
+    'test_size': 0.2,
+    # Forests: 'random_forest', or 'oblivious' for boosted symmetric trees (oblivious_trees.py)
+    'learner': 'random_forest',
+    'n_estimators': 100,
+    # train_jubilee_model sets no limit (null); see the module docstring
+    'max_depth': 10,
+    'oblivious_depth': 6,
+    'learning_rate': 0.1,
+    # Verification
+    'verify_tolerance': 1e-6,
+    # Spec metadata
+    'author': 'JubileeMobileBay Team',
+    'short_description': 'Predicts jubilee events based on environmental conditions',
+    'version': '1.0.0',
+    'license': 'MIT',
+    'descriptions': {
+        'airTemperature': 'Air temperature in Fahrenheit',
+        'waterTemperature': 'Water temperature in Fahrenheit',
+        'windSpeed': 'Wind speed in miles per hour',
+        'dissolvedOxygen': 'Dissolved oxygen in mg/L',
+        OUTPUT_NAME: 'Jubilee prediction [jubileeProbability, confidenceScore] (0.0-1.0)'
+    }
+}
+
+# Stages
+
+def generate(params):
+    """Synthetic environmental conditions and targets"""
+    from train_jubilee_model import generate_training_data
+
+    data = generate_training_data(n_samples=params['n_samples'], seed=params['seed'])
+    return {'X': data[FEATURES].values, 'y': data[TARGETS].values}
+
+def split(params, data):
+    """Train/test split of the generated data"""
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        data['X'], data['y'], test_size=params['test_size'], random_state=params['seed']
+    )
+    return {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+def train_forest(params, data):
+    """Random forest or oblivious boosted trees for one target column"""
+    if params['learner'] == 'oblivious':
+        from oblivious_trees import ObliviousBoostingRegressor
+
+        model = ObliviousBoostingRegressor(
+            n_estimators=params['n_estimators'], depth=params['oblivious_depth'],
+            learning_rate=params['learning_rate']
+        )
+    elif params['learner'] == 'random_forest':
+        from sklearn.ensemble import RandomForestRegressor
+
+        model = RandomForestRegressor(
+            n_estimators=params['n_estimators'], max_depth=params['max_depth'],
+            random_state=params['seed'], n_jobs=-1
+        )
+    else:
+        raise ValueError(f"Unknown learner {params['learner']!r}")
+    model.fit(data['X_train'], data['y_train'][:, params['target']])
+    return model
+
+def evaluate(params, data, *forests):
+    """Test-set MSE, RMSE and R² per target"""
+    import numpy as np
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    metrics = {}
+    for i, (target, forest) in enumerate(zip(TARGETS, forests)):
+        y_pred = forest.predict(data['X_test'])
+        mse = mean_squared_error(data['y_test'][:, i], y_pred)
+        metrics[target] = {'mse': mse, 'rmse': float(np.sqrt(mse)), 'r2': r2_score(data['y_test'][:, i], y_pred)}
+    return metrics
+
+def convert(params, *forests):
+    """Core ML spec bytes: both forests merged into one two-output tree ensemble"""
+    import coremltools as ct
+    from create_simple_model import merge_tree_ensembles
+
+    if params['learner'] == 'oblivious':
+        specs = [forest.to_spec(FEATURES, target) for target, forest in zip(TARGETS, forests)]
+    else:
+        converter_inputs = [(name, ct.models.datatypes.Double()) for name in FEATURES]
+        specs = [
+            ct.converters.sklearn.convert(forest, input_features=converter_inputs, output_feature_names=target).get_spec()
+            for target, forest in zip(TARGETS, forests)
+        ]
+    spec = merge_tree_ensembles(specs, [(name, '') for name in FEATURES], OUTPUT_NAME)
+    return spec.SerializeToString()
+
+def optimize(params, spec_bytes):
+    """Run the neural network optimizer (tree ensembles pass through unchanged)"""
+    import optimize_neural_network
+    import reference_evaluator
+
+    spec = reference_evaluator.parse_spec(spec_bytes)
+    optimized, report = optimize_neural_network.optimize_spec(spec)
+    return {'spec': optimized.SerializeToString(), 'report': report}
+
+def save(params, optimized):
+    """Final spec bytes with metadata and feature descriptions applied
+
+    Edits the serialized spec in place rather than parsing it, so metadata
+    changes rebuild in milliseconds even for large ensembles.
+    """
+    import spec_wire
+
+    metadata = {
+        'author': params['author'],
+        'shortDescription': params['short_description'],
+        'versionString': params['version'],
+        'license': params['license']
+    }
+    return spec_wire.set_metadata(
+        optimized['spec'], metadata, {'outputLayout': ','.join(TARGETS)}, params['descriptions']
+    )
+
+def verify(params, optimized, data, *forests):
+    """Check the optimized spec against the trained forests on the test set
+
+    Runs on the optimized spec rather than the saved one: metadata does not
+    change predictions, so a metadata-only rebuild does not re-verify.
+
+    The check is only exact for the conversion, not for the model on
+    device: sklearn trees compare float32 copies of the inputs while Core ML
+    compares doubles, so an input between a split threshold and its float32
+    rounding takes a different branch in each. The check runs on
+    float32-exact copies of the test rows, which hides those differences;
+    threshold_rows counts the unmodified test rows where they occur.
+    """
+    import numpy as np
+    import reference_evaluator
+
+    spec = reference_evaluator.parse_spec(optimized['spec'])
+    X = data['X_test'].astype(np.float32).astype(np.float64)
+    expected = np.column_stack([forest.predict(X) for forest in forests])
+    actual = reference_evaluator.predict_batch(spec, X)
+    difference = float(np.abs(actual - expected).max())
+    if difference > params['verify_tolerance']:
+        raise ValueError(f"Core ML spec differs from the trained forests by {difference:.3g}")
+
+    raw = np.abs(reference_evaluator.predict_batch(spec, data['X_test'])
+                 - np.column_stack([forest.predict(data['X_test']) for forest in forests])).max(axis=1)
+    return {
+        'rows': len(expected),
+        'max_abs_difference': difference,
+        'threshold_rows': int((raw > params['verify_tolerance']).sum()),
+        'threshold_max_abs_difference': float(raw.max())
+    }
+
+# Build graph
+
+class Stage:
+    """One node of the build graph
+
+    params names the config entries the stage reads, constants are fixed
+    per-stage settings, and sources lists the sibling modules whose code
+    the stage depends on besides its own function.
+    """
+
+    def __init__(self, name, function, inputs=(), params=(), constants=None, sources=()):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.params = list(params)
+        self.constants = dict(constants or {})
+        self.sources = list(sources)
+
+    def settings(self, config):
+        settings = {name: config[name] for name in self.params}
+        settings.update(self.constants)
+        return settings
+
+    def code_digest(self):
+        digest = hashlib.sha256(inspect.getsource(self.function).encode('utf-8'))
+        for source in self.sources:
+            with open(os.path.join(MODULE_DIR, source), 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def key(self, config, input_digests):
+        """Cache key over the stage's code, settings and input contents"""
+        description = {
+            'format': CACHE_FORMAT,
+            'stage': self.name,
+            'code': self.code_digest(),
+            'settings': self.settings(config),
+            'inputs': input_digests
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ArtifactCache:
+    """Stage outputs pickled under their cache key, with a digest of the content"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def lookup(self, key):
+        """Content digest of a cached artifact, or None if it is not cached"""
+        try:
+            with open(self._path(key, '.json')) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry['digest'] if os.path.exists(self._path(key, '.pkl')) else None
+
+    def load(self, key):
+        with open(self._path(key, '.pkl'), 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, key, stage_name, value):
+        """Write an artifact atomically and return its content digest"""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        digest = hashlib.sha256(data).hexdigest()
+        write_atomic(self._path(key, '.pkl'), data)
+        entry = {'stage': stage_name, 'digest': digest, 'bytes': len(data), 'created': time.time()}
+        write_atomic(self._path(key, '.json'), json.dumps(entry).encode('utf-8'))
+        return digest
+
+def write_atomic(path, data):
+    """Write bytes through a temporary file so readers never see a partial file"""
+    temporary = f"{path}.tmp{os.getpid()}"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+class BuildGraph:
+    """Runs stages in dependency order, reusing cached results"""
+
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+
+    def run(self, config, cache, jobs=None, force=()):
+        """Build every stage and return (artifact loader, per-stage report)
+
+        Downstream stages are keyed on the content digest of their inputs,
+        so a stage that reruns but produces identical output leaves the rest
+        of the graph cached.
+        """
+        pending = dict(self.stages)
+        keys, digests, values = {}, {}, {}
+        report = []
+
+        def load(name):
+            if name not in values:
+                values[name] = cache.load(keys[name])
+            return values[name]
+
+        def execute(stage):
+            started = time.perf_counter()
+            value = stage.function(stage.settings(config), *[load(name) for name in stage.inputs])
+            digest = cache.store(keys[stage.name], stage.name, value)
+            return value, digest, time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            running = {}
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name, stage in list(pending.items()):
+                        if any(dependency not in digests for dependency in stage.inputs):
+                            continue
+                        del pending[name]
+                        keys[name] = stage.key(config, [digests[dependency] for dependency in stage.inputs])
+                        cached = None if name in force else cache.lookup(keys[name])
+                        if cached:
+                            digests[name] = cached
+                            report.append({'stage': name, 'status': 'cached', 'seconds': 0.0})
+                            progressed = True
+                        else:
+                            running[pool.submit(execute, stage)] = name
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Stages {sorted(pending)} have cyclic dependencies")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    values[name], digests[name], seconds = future.result()
+                    report.append({'stage': name, 'status': 'built', 'seconds': seconds})
+
+        return load, report
+
+def jubilee_build_graph():
+    """The JubileePredictor pipeline: one forest per target, merged into one ensemble"""
+    train_stages = [f'train_{target}' for target in TARGETS]
+    stages = [
+        Stage('generate', generate, params=['n_samples', 'seed'], sources=['train_jubilee_model.py']),
+        Stage('split', split, ['generate'], params=['test_size', 'seed']),
+        *[
+            Stage(
+                name, train_forest, ['split'],
+                params=['learner', 'n_estimators', 'max_depth', 'oblivious_depth', 'learning_rate', 'seed'],
+                constants={'target': i}, sources=['oblivious_trees.py']
+            )
+            for i, name in enumerate(train_stages)
+        ],
+        Stage('evaluate', evaluate, ['split', *train_stages]),
+        Stage('convert', convert, train_stages, params=['learner'], sources=['create_simple_model.py']),
+        Stage('optimize', optimize, ['convert'], sources=['optimize_neural_network.py', 'reference_evaluator.py']),
+        Stage(
+            'save', save, ['optimize'],
+            params=['author', 'short_description', 'version', 'license', 'descriptions'], sources=['spec_wire.py']
+        ),
+        Stage(
+            'verify', verify, ['optimize', 'split', *train_stages],
+            params=['verify_tolerance'], sources=['reference_evaluator.py']
+        )
+    ]
+    return BuildGraph(stages)
+
+def parse_setting(text, config):
+    """Apply one KEY=VALUE override; values are JSON where possible, dotted keys reach into dicts"""
+    key, separator, raw = text.partition('=')
+    if not separator:
+        raise ValueError(f"Expected KEY=VALUE, got {text!r}")
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    *parents, leaf = key.split('.')
+    target = config
+    for parent in parents:
+        target = target[parent]
+    if leaf not in target and not parents:
+        raise KeyError(f"Unknown build setting {key!r}")
+    target[leaf] = value
+
+def write_if_changed(path, data):
+    """Write the model only when its bytes differ from what is on disk"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    write_atomic(path, data)
+    return True
+
+if __name__ == "__main__":
+    import argparse
+    import copy
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-o', '--output', default='JubileePredictor.mlmodel', help='Where to write the model')
+    parser.add_argument('--cache-dir', default='.build_cache', help='Directory for cached stage outputs')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='Stages to run in parallel')
+    parser.add_argument(
+        '--set', action='append', default=[], metavar='KEY=VALUE',
+        help='Override a build setting, e.g. n_estimators=50 or descriptions.windSpeed="Wind (mph)"'
+    )
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE', help='Rebuild a stage even if cached')
+    args = parser.parse_args()
+
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    for setting in args.set:
+        parse_setting(setting, config)
+
+    started = time.perf_counter()
+    graph = jubilee_build_graph()
+    unknown = set(args.force) - set(graph.stages)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    load, report = graph.run(config, ArtifactCache(args.cache_dir), jobs=args.jobs, force=set(args.force))
+
+    changed = write_if_changed(args.output, load('save'))
+    elapsed = time.perf_counter() - started
+
+    print(f"{'Stage':<28} {'Status':<8} {'Seconds':>8}")
+    for entry in report:
+        print(f"{entry['stage']:<28} {entry['status']:<8} {entry['seconds']:>8.3f}")
+
+    if any(entry['stage'] == 'evaluate' and entry['status'] == 'built' for entry in report):
+        for target, metrics in load('evaluate').items():
+            print(f"\n{target}: MSE {metrics['mse']:.4f}, RMSE {metrics['rmse']:.4f}, R² {metrics['r2']:.4f}")
+    if any(entry['stage'] == 'verify' and entry['status'] == 'built' for entry in report):
+        verification = load('verify')
+        print(f"\nVerified on {verification['rows']} float32-exact test rows, "
+              f"max difference {verification['max_abs_difference']:.3g}")
+        if verification['threshold_rows']:
+            print(f"  {verification['threshold_rows']} unmodified test rows lie next to a split threshold and differ "
+                  f"by up to {verification['threshold_max_abs_difference']:.3g} (sklearn rounds inputs to float32)")
+
+    print(f"\nModel {'written to' if changed else 'unchanged at'}: {args.output} ({elapsed:.2f}s)")
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Dense lookup-table compilation of JubileePredictor models
+The four inputs are bounded (see FEATURE_RANGES), so any trained model can
+be tabulated on a regular 4-D grid and replaced by a float16 table with
+multilinear interpolation: 16 table reads and a weighted sum per row, with
+no branches, whatever the size of the source model. Tables are exported as
+a batched Core ML model or as a plain binary file, and the interpolation
+error against the source model is reported
+"""
+
+import struct
+
+import numpy as np
+
+import reference_evaluator
+
+# One point per °F, per °F, per mph and per 0.25 mg/L
+DEFAULT_GRID = (31, 19, 26, 25)
+GRID_CHUNK_ROWS = 65536
+
+# Binary layout, little-endian:
+#   magic 'JLUT', uint16 version, uint16 inputs, uint16 outputs, uint16 reserved
+#   uint32 grid points per input
+#   float64 low per input, float64 high per input
+#   uint32 byte length + UTF-8 input names, then output names, newline-separated
+#   float16 values, C order over (grid..., outputs), starting on an 8-byte boundary
+MAGIC = b'JLUT'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHH')
+
+def _pad(offset, alignment=8):
+    return -offset % alignment
+
+class LookupTable:
+    """float16 values of a model on a regular grid over the input ranges"""
+
+    def __init__(self, values, lows, highs, input_names, output_names):
+        self.values = np.ascontiguousarray(values, dtype=np.float16)
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+        if self.values.ndim != len(self.input_names) + 1 or self.values.shape[-1] != len(self.output_names):
+            raise ValueError(f"Table of shape {self.values.shape} does not match "
+                             f"{len(self.input_names)} inputs and {len(self.output_names)} outputs")
+        if min(self.grid) < 2:
+            raise ValueError("Every input needs at least 2 grid points")
+
+    @property
+    def grid(self):
+        return self.values.shape[:-1]
+
+    def corners(self):
+        """(2^d, d) offsets of the cell corners, and their flat offsets into the table"""
+        d = len(self.grid)
+        offsets = (np.arange(2 ** d)[:, None] >> np.arange(d - 1, -1, -1)) & 1
+        strides = np.array([int(np.prod(self.grid[k + 1:])) for k in range(d)])
+        return offsets, offsets @ strides, strides
+
+    def cell_coordinates(self, X):
+        """Lower cell corner (int) and position within the cell (0..1) of each row, clamped to the grid"""
+        X = np.asarray(X, dtype=np.float64)
+        points = np.array(self.grid)
+        t = np.clip((X - self.lows) / (self.highs - self.lows), 0.0, 1.0) * (points - 1)
+        cell = np.minimum(np.floor(t), points - 2).astype(np.int64)
+        return cell, t - cell
+
+    def predict(self, X):
+        """Multilinear interpolation of (rows, inputs) X, returning (rows, outputs)"""
+        cell, fraction = self.cell_coordinates(X)
+        offsets, flat_offsets, strides = self.corners()
+        table = self.values.reshape(-1, len(self.output_names))
+        base = cell @ strides
+        result = np.zeros((len(cell), len(self.output_names)))
+        for offset, flat in zip(offsets, flat_offsets):
+            weight = np.prod(np.where(offset, fraction, 1.0 - fraction), axis=1)
+            result += weight[:, None] * table[base + flat]
+        return result
+
+    def to_bytes(self):
+        names = '\n'.join(self.input_names + self.output_names).encode('utf-8')
+        header = b''.join([
+            HEADER.pack(MAGIC, VERSION, len(self.input_names), len(self.output_names), 0),
+            struct.pack(f'<{len(self.grid)}I', *self.grid),
+            self.lows.astype('<f8').tobytes(),
+            self.highs.astype('<f8').tobytes(),
+            struct.pack('<I', len(names)),
+            names
+        ])
+        return header + bytes(_pad(len(header))) + self.values.astype('<f2').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, n_inputs, n_outputs, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} lookup table")
+        offset = HEADER.size
+        grid = struct.unpack_from(f'<{n_inputs}I', data, offset)
+        offset += 4 * n_inputs
+        lows = np.frombuffer(data, '<f8', n_inputs, offset)
+        highs = np.frombuffer(data, '<f8', n_inputs, offset + 8 * n_inputs)
+        offset += 16 * n_inputs
+        (length,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        names = bytes(data[offset:offset + length]).decode('utf-8').split('\n')
+        offset += length
+        offset += _pad(offset)
+        count = int(np.prod(grid)) * n_outputs
+        if len(data) < offset + 2 * count:
+            raise ValueError("Lookup table is truncated")
+        values = np.frombuffer(data, '<f2', count, offset).reshape(*grid, n_outputs)
+        return cls(values, lows, highs, names[:n_inputs], names[n_inputs:])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+def grid_rows(grid, lows, highs, start, stop):
+    """Input rows of flat grid points start..stop-1, in table (C) order"""
+    index = np.unravel_index(np.arange(start, stop), grid)
+    return np.column_stack([
+        lows[k] + (highs[k] - lows[k]) * index[k] / (grid[k] - 1) for k in range(len(grid))
+    ])
+
+def tabulate(predict, grid, lows, highs, chunk_rows=GRID_CHUNK_ROWS):
+    """Evaluate predict((rows, inputs)) -> (rows, outputs) on every grid point, chunk by chunk"""
+    total = int(np.prod(grid))
+    values = None
+    for start in range(0, total, chunk_rows):
+        stop = min(start + chunk_rows, total)
+        chunk = predict(grid_rows(grid, lows, highs, start, stop))
+        if values is None:
+            values = np.empty((total, chunk.shape[1]), np.float16)
+        values[start:stop] = chunk
+    return values.reshape(*grid, -1)
+
+def compile_spec(spec, grid=DEFAULT_GRID, chunk_rows=GRID_CHUNK_ROWS):
+    """Tabulate a scalar-input or batched Core ML spec over FEATURE_RANGES"""
+    from export_batched_model import output_layout
+
+    if reference_evaluator.is_batched(spec):
+        input_names = spec.description.metadata.userDefined['inputLayout'].split(',')
+    else:
+        input_names = [f.name for f in spec.description.input]
+    if len(grid) != len(input_names):
+        raise ValueError(f"Grid has {len(grid)} axes for {len(input_names)} inputs")
+    lows, highs = np.array([reference_evaluator.FEATURE_RANGES[name] for name in input_names]).T
+    values = tabulate(lambda X: reference_evaluator.predict_batch(spec, X), grid, lows, highs, chunk_rows)
+    return LookupTable(values, lows, highs, input_names, output_layout(spec))
+
+def interpolation_error(table, predict, n_samples=100_000, seed=0):
+    """Per-output max, mean and RMS error of the table against predict on random rows"""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(table.lows, table.highs, (n_samples, len(table.lows)))
+    error = np.abs(table.predict(X) - predict(X))
+    return {
+        name: {
+            'max': float(error[:, j].max()),
+            'mean': float(error[:, j].mean()),
+            'rmse': float(np.sqrt(np.mean(error[:, j] ** 2)))
+        }
+        for j, name in enumerate(table.output_names)
+    }
+
+# Core ML export
+
+def lookup_spec(table):
+    """Batched neuralNetwork spec ((N, inputs) -> (N, outputs)) that interpolates the table
+
+    Each row is scaled to grid coordinates, split into its cell corner and
+    position, and the 2^d corner values are gathered from a float16
+    constant and blended with their multilinear weights.
+
+    Only the table is float16: the flat corner indices reach the table size
+    (382,849 on the default grid) and grid positions need a finer step than
+    float16's 1/64 near 30, so the model is marked cpuOnly in its
+    computeUnits metadata, where Core ML computes in float32.
+    """
+    from coremltools.models import datatypes
+    from coremltools.models.neural_network import NeuralNetworkBuilder, flexible_shape_utils
+
+    from export_batched_model import BATCH_INPUT, BATCH_OUTPUT, COMPUTE_UNITS
+
+    d = len(table.grid)
+    n_outputs = len(table.output_names)
+    points = np.array(table.grid, dtype=np.float64)
+    offsets, flat_offsets, strides = table.corners()
+
+    builder = NeuralNetworkBuilder(
+        input_features=[(BATCH_INPUT, datatypes.Array(1, d))],
+        output_features=[(BATCH_OUTPUT, datatypes.Array(1, n_outputs))],
+        disable_rank5_shape_mapping=True
+    )
+
+    def dense(name, input_name, W, b):
+        builder.add_batched_mat_mul(
+            name=name, input_names=[input_name], output_name=name,
+            weight_matrix_rows=W.shape[0], weight_matrix_columns=W.shape[1],
+            W=W.astype(np.float32), bias=np.asarray(b, dtype=np.float32)
+        )
+        return name
+
+    # Grid coordinates, clamped to the table
+    span = table.highs - table.lows
+    dense('unit', BATCH_INPUT, np.diag(1.0 / span), -table.lows / span)
+    builder.add_clip(name='unit_clipped', input_name='unit', output_name='unit_clipped', min_value=0.0, max_value=1.0)
+    dense('position', 'unit_clipped', np.diag(points - 1), np.zeros(d))
+    builder.add_floor(name='position_floor', input_name='position', output_name='position_floor')
+    builder.add_load_constant_nd(name='last_cell', output_name='last_cell', constant_value=(points - 2)[None, :],
+                                 shape=[1, d])
+    builder.add_min_broadcastable(name='cell', input_names=['position_floor', 'last_cell'], output_name='cell')
+    builder.add_subtract_broadcastable(name='fraction', input_names=['position', 'cell'], output_name='fraction')
+
+    # Flat table index of every corner: cell @ strides + corner offset
+    dense('corner_index', 'cell', np.repeat(strides[:, None], len(flat_offsets), axis=1), flat_offsets)
+
+    # Corner weights: per axis, fraction where the corner is on the upper side, else 1 - fraction
+    factors = []
+    for k in range(d):
+        W = np.zeros((d, len(offsets)))
+        W[k] = 2.0 * offsets[:, k] - 1.0
+        factors.append(dense(f'corner_factor_{k}', 'fraction', W, 1.0 - offsets[:, k]))
+    builder.add_elementwise(name='corner_weight', input_names=factors, output_name='corner_weight', mode='MULTIPLY')
+    builder.add_expand_dims(name='corner_weight_column', input_name='corner_weight',
+                            output_name='corner_weight_column', axes=[-1])
+
+    # Gather and blend the corner values
+    flat_table = table.values.reshape(-1, n_outputs)
+    builder.add_load_constant_nd(name='table', output_name='table', constant_value=flat_table.astype(np.float32),
+                                 shape=list(flat_table.shape))
+    constant = builder.nn_spec.layers[-1].loadConstantND.data
+    constant.ClearField('floatValue')
+    constant.float16Value = flat_table.astype('<f2').tobytes()
+    builder.add_gather(name='corner_values', input_names=['table', 'corner_index'], output_name='corner_values', axis=0)
+    builder.add_multiply_broadcastable(name='weighted_values', input_names=['corner_values', 'corner_weight_column'],
+                                       output_name='weighted_values')
+    builder.add_reduce_sum(name=BATCH_OUTPUT, input_name='weighted_values', output_name=BATCH_OUTPUT,
+                           axes=[1], keepdims=False)
+
+    spec = builder.spec
+    flexible_shape_utils.set_multiarray_ndshape_range(
+        spec, BATCH_INPUT, lower_bounds=[1, d], upper_bounds=[-1, d]
+    )
+    metadata = spec.description.metadata
+    metadata.shortDescription = f"Lookup table ({' x '.join(map(str, table.grid))} grid, float16)"
+    metadata.userDefined['inputLayout'] = ','.join(table.input_names)
+    metadata.userDefined['outputLayout'] = ','.join(table.output_names)
+    metadata.userDefined['lookupGrid'] = ','.join(map(str, table.grid))
+    metadata.userDefined[COMPUTE_UNITS] = 'cpuOnly'
+    spec.description.input[0].shortDescription = f"Input rows of [{', '.join(table.input_names)}]"
+    spec.description.output[0].shortDescription = f"Prediction rows of [{', '.join(table.output_names)}]"
+    return spec
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('model', nargs='?', default='JubileePredictor.mlmodel', help='Model to tabulate')
+    parser.add_argument('--grid', default=','.join(map(str, DEFAULT_GRID)),
+                        help='Grid points per input, in input order')
+    parser.add_argument('-o', '--output', default='JubileePredictorLookup.mlmodel', help='Core ML model to write')
+    parser.add_argument('--binary', metavar='PATH', help='Also write the table in the plain binary format')
+    parser.add_argument('--no-coreml', action='store_true', help='Skip the Core ML export')
+    parser.add_argument('-n', '--samples', type=int, default=100_000, help='Random rows for the error report')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the error report')
+    args = parser.parse_args()
+
+    grid = tuple(int(points) for points in args.grid.split(','))
+    spec = reference_evaluator.load_spec(args.model)
+
+    started = time.perf_counter()
+    table = compile_spec(spec, grid)
+    print(f"Tabulated {int(np.prod(grid)):,} grid points ({' x '.join(map(str, grid))}) "
+          f"in {time.perf_counter() - started:.1f}s: {table.values.nbytes / 1024:.0f} KB of float16")
+
+    print(f"\nInterpolation error vs {args.model} on {args.samples:,} random rows:")
+    for name, error in interpolation_error(table, lambda X: reference_evaluator.predict_batch(spec, X),
+                                           args.samples, args.seed).items():
+        print(f"  {name}: max {error['max']:.4f}, mean {error['mean']:.4f}, RMSE {error['rmse']:.4f}")
+
+    if args.binary:
+        table.save(args.binary)
+        print(f"\nBinary table saved to: {args.binary}")
+
+    if not args.no_coreml:
+        lookup = lookup_spec(table)
+        X = reference_evaluator.random_rows(1024)
+        difference = np.abs(reference_evaluator.predict_batch(lookup, X) - table.predict(X)).max()
+        print(f"\nCore ML layers: {len(lookup.neuralNetwork.layers)}")
+        print(f"Max difference vs NumPy interpolation on {len(X)} rows: {difference:.3g}")
+        with open(args.output, 'wb') as f:
+            f.write(lookup.SerializeToString())
+        print(f"Lookup model saved to: {args.output}")
@@ -10,8 +10,8 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
-def create_simple_model():
-    """Create a simple Random Forest model for jubilee prediction"""
+def train_simple_forests():
+    """Train the probability and confidence forests on synthetic data"""
     
     # Generate some synthetic training data
     np.random.seed(42)
@@ -74,6 +74,13 @@ def create_simple_model():
     conf_model = RandomForestRegressor(n_estimators=10, max_depth=5, random_state=42)
     conf_model.fit(X, confidence)
     
+    return prob_model, conf_model
+
+def create_simple_model():
+    """Create a simple Random Forest model for jubilee prediction"""
+    
+    prob_model, conf_model = train_simple_forests()
+    
     # Convert probability model to Core ML
     prob_coreml = ct.converters.sklearn.convert(
         prob_model,
@@ -83,7 +90,7 @@ def create_simple_model():
             ('windSpeed', ct.models.datatypes.Double()),
             ('dissolvedOxygen', ct.models.datatypes.Double())
         ],
-        output_feature_names=['jubileeProbability']
+        output_feature_names='jubileeProbability'
     )
     
     # Convert confidence model to Core ML
@@ -95,7 +102,7 @@ def create_simple_model():
             ('windSpeed', ct.models.datatypes.Double()),
             ('dissolvedOxygen', ct.models.datatypes.Double())
         ],
-        output_feature_names=['confidenceScore']
+        output_feature_names='confidenceScore'
     )
     
     # Create a pipeline model that combines both outputs
@@ -151,12 +158,136 @@ def create_simple_model():
     
     return final_model
 
+def find_tree_ensemble(spec):
+    """Return the treeEnsembleRegressor message of a converted model spec"""
+    model_type = spec.WhichOneof('Type')
+    if model_type == 'treeEnsembleRegressor':
+        return spec.treeEnsembleRegressor
+    if model_type in ('pipeline', 'pipelineRegressor'):
+        pipeline = getattr(spec, model_type).pipeline
+        for model_spec in pipeline.models:
+            if model_spec.WhichOneof('Type') == 'treeEnsembleRegressor':
+                return model_spec.treeEnsembleRegressor
+    raise ValueError(f"No treeEnsembleRegressor found in {model_type} spec")
+
+def merge_tree_ensembles(specs, input_features, output_name):
+    """Merge single-output tree ensembles into one multi-dimension ensemble
+
+    Ensemble k's trees are renumbered after those of the previous ensembles
+    and their leaves are routed to output index k, so a single pass over the
+    trees produces every target at once.
+    """
+    from coremltools.proto import Model_pb2
+
+    spec = Model_pb2.Model()
+    spec.specificationVersion = max(s.specificationVersion for s in specs)
+
+    # The sklearn converter numbers features in input order, so the merged
+    # ensemble can read the scalar inputs directly without a vectorizer
+    for name, description in input_features:
+        input_feature = spec.description.input.add()
+        input_feature.name = name
+        input_feature.shortDescription = description
+        input_feature.type.doubleType.MergeFromString(b'')
+
+    output_feature = spec.description.output.add()
+    output_feature.name = output_name
+    output_feature.type.multiArrayType.shape.append(len(specs))
+    output_feature.type.multiArrayType.dataType = Model_pb2.ArrayFeatureType.DOUBLE
+    spec.description.predictedFeatureName = output_name
+
+    merged = spec.treeEnsembleRegressor.treeEnsemble
+    merged.numPredictionDimensions = len(specs)
+
+    tree_offset = 0
+    for target_index, source_spec in enumerate(specs):
+        source = find_tree_ensemble(source_spec).treeEnsemble
+        if source.numPredictionDimensions != 1:
+            raise ValueError("Only single-output tree ensembles can be merged")
+
+        merged.basePredictionValue.append(
+            source.basePredictionValue[0] if source.basePredictionValue else 0.0
+        )
+
+        n_trees = 0
+        for node in source.nodes:
+            new_node = merged.nodes.add()
+            new_node.CopyFrom(node)
+            new_node.treeId = node.treeId + tree_offset
+            for info in new_node.evaluationInfo:
+                info.evaluationIndex = target_index
+            n_trees = max(n_trees, node.treeId + 1)
+
+        tree_offset += n_trees
+
+    return spec
+
+def create_single_ensemble_model():
+    """Create a single two-output tree ensemble for jubilee prediction
+
+    Produces the same values as create_simple_model() but evaluates both
+    forests in one treeEnsembleRegressor instead of a two-model Pipeline.
+    The output is a 2-element array: [jubileeProbability, confidenceScore].
+    """
+    from coremltools.models import MLModel
+
+    prob_model, conf_model = train_simple_forests()
+
+    input_features = [
+        ('airTemperature', 'Air temperature in Fahrenheit'),
+        ('waterTemperature', 'Water temperature in Fahrenheit'),
+        ('windSpeed', 'Wind speed in miles per hour'),
+        ('dissolvedOxygen', 'Dissolved oxygen in mg/L')
+    ]
+    converter_inputs = [(name, ct.models.datatypes.Double()) for name, _ in input_features]
+
+    prob_spec = ct.converters.sklearn.convert(
+        prob_model, input_features=converter_inputs, output_feature_names='jubileeProbability'
+    ).get_spec()
+    conf_spec = ct.converters.sklearn.convert(
+        conf_model, input_features=converter_inputs, output_feature_names='confidenceScore'
+    ).get_spec()
+
+    spec = merge_tree_ensembles([prob_spec, conf_spec], input_features, 'jubileePrediction')
+    spec.description.output[0].shortDescription = (
+        'Jubilee prediction [jubileeProbability, confidenceScore] (0.0-1.0)'
+    )
+
+    # Set metadata
+    spec.description.metadata.author = 'JubileeMobileBay Team'
+    spec.description.metadata.shortDescription = 'Placeholder model for jubilee event prediction'
+    spec.description.metadata.versionString = '1.0.0'
+    spec.description.metadata.license = 'MIT'
+    spec.description.metadata.userDefined['outputLayout'] = 'jubileeProbability,confidenceScore'
+
+    return MLModel(spec)
+
+def unpack_prediction(prediction):
+    """Map a model prediction to jubileeProbability/confidenceScore values"""
+    if 'jubileePrediction' in prediction:
+        values = np.asarray(prediction['jubileePrediction']).reshape(-1)
+        return {'jubileeProbability': values[0], 'confidenceScore': values[1]}
+    return prediction
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--single-ensemble',
+        action='store_true',
+        help='Merge both forests into one two-output treeEnsembleRegressor instead of a Pipeline'
+    )
+    args = parser.parse_args()
+
     print("Creating placeholder Core ML model...")
-    
+
     try:
         # Create the model
-        model = create_simple_model()
+        if args.single_ensemble:
+            model = create_single_ensemble_model()
+        else:
+            model = create_simple_model()
         
         # Save the model
         output_path = 'JubileePredictor.mlmodel'
@@ -196,7 +327,7 @@ if __name__ == "__main__":
         ]
         
         for test in test_cases:
-            prediction = model.predict(test['input'])
+            prediction = unpack_prediction(model.predict(test['input']))
             print(f"\n{test['name']}:")
             print(f"  Input: {test['input']}")
             print(f"  Jubilee Probability: {float(prediction['jubileeProbability']):.3f}")
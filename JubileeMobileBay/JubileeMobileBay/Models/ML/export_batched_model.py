@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Batched export of JubileePredictor models
+Rewrites a scalar-input model (tree ensemble, GLM or neural network) as a
+neural network that takes one (N, 4) MultiArray of input rows and returns
+an (N, outputs) MultiArray, so a 24-hour or multi-station forecast is a
+single prediction call
+
+Tree ensembles become dense matrix products (see tree_gemm_blocks) when
+they fit MAX_TREE_MATRIX_ENTRIES. Deeper forests, such as the unbounded
+train_jubilee_model forest (~3.4M nodes), are walked one level per layer
+with gathers instead (see tree_traversal_tables); that form indexes nodes
+with float32 and is marked cpuOnly in the computeUnits metadata
+"""
+
+import numpy as np
+
+import reference_evaluator
+
+BATCH_INPUT = 'features'
+BATCH_OUTPUT = 'predictions'
+
+# A block's path matrix is (internal nodes x leaves) of its trees, so a block
+# of k similar trees costs k times the entries of k one-tree blocks. Trees are
+# grouped into blocks of at most this many entries, trading a few more layers
+# for smaller matrices, and ensembles whose blocks need more than
+# MAX_TREE_MATRIX_ENTRIES in total are refused
+MAX_TREE_BLOCK_ENTRIES = 1_000_000
+MAX_TREE_MATRIX_ENTRIES = 50_000_000
+
+# Rows evaluated at once by gemm_predict, bounding the (rows x nodes) blobs
+GEMM_CHUNK_ROWS = 4096
+
+# Metadata key naming the compute units a batched model is exact on. Node
+# indices past 2048 are not exact in float16, so models that gather by node
+# index must run on the CPU (MLComputeUnits.cpuOnly)
+COMPUTE_UNITS = 'computeUnits'
+
+class TreeEnsembleTooLarge(ValueError):
+    """The GEMM form of a tree ensemble would exceed MAX_TREE_MATRIX_ENTRIES"""
+
+def split_comparison(trees):
+    """(strict, flipped) normalizing every split of trees to "x <= t" (or "x < t") taking the true branch
+
+    flipped marks the nodes (GreaterThan / GreaterThanEqual) that take the
+    true branch when that test fails.
+    """
+    internal = ~trees.is_leaf
+    behaviors = set(np.unique(trees.behavior[internal]).tolist())
+    if behaviors <= {0, 3}:
+        strict = False
+    elif behaviors <= {1, 2}:
+        strict = True
+    else:
+        raise NotImplementedError(f"Cannot express split behaviors {sorted(behaviors)} as one comparison")
+    return strict, internal & np.isin(trees.behavior, (2, 3))
+
+def tree_gemm_blocks(trees, n_features, max_block_entries=MAX_TREE_BLOCK_ENTRIES):
+    """Express a tree ensemble as dense matrices, one block per group of trees
+
+    trees holds flat node arrays shaped like reference_evaluator's
+    CompiledTreeEnsemble. Returns (blocks, base, strict), where each block
+    is (A, B, C, D, V) such that for input rows X:
+      T = (X @ A) <= B          (or < B when strict) -- (N, internal nodes)
+      P = T @ C                  -- (N, leaves)
+      E = (P == D)               -- one reached leaf per tree
+      Y = sum of E @ V + base    -- (N, outputs)
+    C[i, l] is +1 when leaf l sits under the true branch of node i, -1 under
+    the false branch, and D[l] counts the true branches on the path to l.
+    """
+    internal = ~trees.is_leaf
+    strict, flipped = split_comparison(trees)
+
+    # Parent of every node and whether it hangs off the (normalized) true branch
+    n_nodes = len(trees.is_leaf)
+    parent = np.full(n_nodes, -1, np.int64)
+    on_true = np.zeros(n_nodes, bool)
+    nodes = np.flatnonzero(internal)
+    flipped = flipped[nodes]
+    parent[trees.true_child[nodes]] = nodes
+    parent[trees.false_child[nodes]] = nodes
+    on_true[trees.true_child[nodes]] = ~flipped
+    on_true[trees.false_child[nodes]] = flipped
+
+    tree_index = np.unique(trees.tree_ids, return_inverse=True)[1].reshape(-1)
+    n_trees = int(tree_index.max()) + 1 if n_nodes else 0
+    internal_counts = np.bincount(tree_index[internal], minlength=n_trees)
+    leaf_counts = np.bincount(tree_index[trees.is_leaf], minlength=n_trees)
+
+    # Group consecutive trees while their block stays within max_block_entries
+    groups, current, size = [], [], (0, 0)
+    for tree in range(n_trees):
+        grown = (size[0] + internal_counts[tree], size[1] + leaf_counts[tree])
+        if current and grown[0] * grown[1] > max_block_entries:
+            groups.append(current)
+            current, grown = [], (internal_counts[tree], leaf_counts[tree])
+        current.append(tree)
+        size = grown
+    if current:
+        groups.append(current)
+
+    total = sum(internal_counts[g].sum() * leaf_counts[g].sum() for g in groups)
+    if total > MAX_TREE_MATRIX_ENTRIES:
+        raise TreeEnsembleTooLarge(
+            f"Tree ensemble too large for GEMM form ({total:,} path matrix entries); "
+            "limit max_depth when training"
+        )
+
+    blocks = []
+    for group in groups:
+        in_group = np.isin(tree_index, group)
+        block_internal = np.flatnonzero(internal & in_group)
+        block_leaves = np.flatnonzero(trees.is_leaf & in_group)
+        position = np.full(n_nodes, -1, np.int64)
+        position[block_internal] = np.arange(len(block_internal))
+
+        A = np.zeros((n_features, len(block_internal)))
+        A[trees.feature[block_internal], np.arange(len(block_internal))] = 1.0
+        B = trees.threshold[block_internal].astype(np.float64)
+        C = np.zeros((len(block_internal), len(block_leaves)))
+        D = np.zeros(len(block_leaves))
+
+        # Walk every leaf up to its root at once
+        columns = np.arange(len(block_leaves))
+        child = block_leaves
+        while len(child):
+            above = parent[child]
+            keep = above >= 0
+            child, above, columns = child[keep], above[keep], columns[keep]
+            C[position[above], columns] = np.where(on_true[child], 1.0, -1.0)
+            D += np.bincount(columns[on_true[child]], minlength=len(block_leaves))
+            child = above
+        blocks.append((A, B, C, D, trees.leaf_values[block_leaves].astype(np.float64)))
+
+    return blocks, np.asarray(trees.base, dtype=np.float64), strict
+
+def tree_traversal_tables(trees):
+    """Per-node tables that walk a tree ensemble one level at a time, for forests too deep for GEMM form
+
+    Returns (roots, feature, threshold, other, step, values, levels, strict).
+    A row at node i moves to other[i] + step[i] * (x[feature[i]] <= threshold[i])
+    (< when strict); leaves point at themselves, so after levels steps every
+    tree has reached its leaf. values holds the leaf values with the base
+    prediction folded into the leaves of the first tree, so summing the
+    reached rows over the trees gives the prediction.
+    """
+    strict, flipped = split_comparison(trees)
+    # Core ML compares in float32: round each threshold towards the side that
+    # keeps x <= t (or x < t) unchanged for every float32 x
+    threshold = trees.threshold.astype(np.float32)
+    if strict:
+        threshold = np.where(threshold < trees.threshold, np.nextafter(threshold, np.float32(np.inf)), threshold)
+    else:
+        threshold = np.where(threshold > trees.threshold, np.nextafter(threshold, np.float32(-np.inf)), threshold)
+    low = np.where(flipped, trees.false_child, trees.true_child)
+    high = np.where(flipped, trees.true_child, trees.false_child)
+    values = trees.leaf_values.astype(np.float64)
+    first_tree = trees.tree_ids == trees.tree_ids[trees.roots[0]]
+    values[first_tree & trees.is_leaf] += trees.base
+    levels = int(trees.node_depths().max()) - 1 if len(trees.roots) else 0
+    return trees.roots, trees.feature, threshold, high, low - high, values, levels, strict
+
+def tree_gemm_matrices(ensemble, n_features):
+    """Express a TreeEnsembleParameters message as a single block of dense matrices
+
+    Returns (A, B, C, D, V, base, strict); see tree_gemm_blocks.
+    """
+    trees = reference_evaluator.compiled_tree_ensemble(ensemble)
+    blocks, base, strict = tree_gemm_blocks(trees, n_features, max_block_entries=np.inf)
+    return (*blocks[0], base, strict)
+
+def gemm_predict(blocks, base, strict, X, chunk_rows=GEMM_CHUNK_ROWS):
+    """Evaluate tree_gemm_blocks output on (rows, features) X with NumPy, as the network does"""
+    X = np.asarray(X, dtype=np.float64)
+    compare = np.less if strict else np.less_equal
+    Y = np.tile(base, (len(X), 1))
+    for start in range(0, len(X), chunk_rows):
+        chunk = X[start:start + chunk_rows]
+        for A, B, C, D, V in blocks:
+            decisions = compare(chunk @ A, B).astype(np.float64)
+            reached = (decisions @ C == D).astype(np.float64)
+            Y[start:start + chunk_rows] += reached @ V
+    return Y
+
+
+class BatchedModelBuilder:
+    """Accumulates the layers of the batched network"""
+
+    def __init__(self, input_names, n_outputs):
+        from coremltools.models import datatypes
+        from coremltools.models.neural_network import NeuralNetworkBuilder
+
+        self.input_names = list(input_names)
+        self.builder = NeuralNetworkBuilder(
+            input_features=[(BATCH_INPUT, datatypes.Array(1, len(self.input_names)))],
+            output_features=[(BATCH_OUTPUT, datatypes.Array(1, n_outputs))],
+            disable_rank5_shape_mapping=True
+        )
+        self.columns = {}
+        self.counter = 0
+        self.cpu_only = False
+
+    def unique(self, name):
+        self.counter += 1
+        return f"{name}_{self.counter}"
+
+    def column(self, input_name):
+        """(N, 1) blob holding one named input column of the feature matrix"""
+        if input_name not in self.columns:
+            j = self.input_names.index(input_name)
+            output = self.unique(f"column_{input_name}")
+            self.builder.add_slice_static(
+                name=output, input_name=BATCH_INPUT, output_name=output,
+                begin_ids=[0, j], end_ids=[0, j + 1], strides=[1, 1],
+                begin_masks=[True, False], end_masks=[True, False]
+            )
+            self.columns[input_name] = output
+        return self.columns[input_name]
+
+    def dense(self, name, input_name, W, b):
+        """y = x @ W + b with W shaped (in, out)"""
+        output = self.unique(name)
+        self.builder.add_batched_mat_mul(
+            name=output, input_names=[input_name], output_name=output,
+            weight_matrix_rows=W.shape[0], weight_matrix_columns=W.shape[1],
+            W=W.astype(np.float32), bias=np.asarray(b, dtype=np.float32)
+        )
+        return output
+
+    def sigmoid(self, input_name):
+        output = self.unique('sigmoid')
+        self.builder.add_activation(name=output, non_linearity='SIGMOID', input_name=input_name, output_name=output)
+        return output
+
+    def add_tree_ensemble(self, params, input_name):
+        """Emit the GEMM form of a treeEnsembleRegressor, returning (blob, width)"""
+        trees = reference_evaluator.compiled_tree_ensemble(params.treeEnsemble)
+        try:
+            blocks, base, strict = tree_gemm_blocks(trees, len(self.input_names))
+        except TreeEnsembleTooLarge:
+            output = self.add_tree_traversal(trees, input_name)
+        else:
+            output = self.add_tree_blocks(blocks, base, strict, input_name)
+        if params.postEvaluationTransform == 2:  # Regression_Logistic
+            output = self.sigmoid(output)
+        return output, len(trees.base)
+
+    def add_tree_blocks(self, blocks, base, strict, input_name):
+        """Emit tree_gemm_blocks output, summing the blocks; returns the (N, outputs) blob"""
+        outputs = []
+        for k, (A, B, C, D, V) in enumerate(blocks):
+            # Fold the thresholds into the bias so a single comparison with 0 remains
+            margins = self.dense('tree_margins', input_name, A, -B)
+            decisions = self.unique('tree_decisions')
+            self.builder.add_less_than(
+                name=decisions, input_names=[margins], output_name=decisions,
+                use_less_than_equal=not strict, alpha=0.0
+            )
+            paths = self.dense('tree_paths', decisions, C, -D)
+            reached = self.unique('tree_leaves')
+            self.builder.add_equal(name=reached, input_names=[paths], output_name=reached, alpha=0.0)
+            outputs.append(self.dense('tree_values', reached, V, base if k == 0 else np.zeros(len(base))))
+        if len(outputs) == 1:
+            return outputs[0]
+        total = self.unique('tree_sum')
+        self.builder.add_elementwise(name=total, input_names=outputs, output_name=total, mode='ADD')
+        return total
+
+    def add_tree_traversal(self, trees, input_name):
+        """Emit tree_traversal_tables as one gather step per level; returns the (N, outputs) blob"""
+        roots, feature, threshold, other, step, values, levels, strict = tree_traversal_tables(trees)
+        tables = {}
+        for name, table in (('feature', feature), ('threshold', threshold), ('other', other),
+                            ('step', step), ('values', values)):
+            tables[name] = self.unique(f"tree_{name}_table")
+            self.builder.add_load_constant_nd(name=tables[name], output_name=tables[name],
+                                              constant_value=np.asarray(table, dtype=np.float32),
+                                              shape=table.shape)
+
+        def gather(name, position):
+            output = self.unique(f"tree_{name}")
+            self.builder.add_gather(name=output, input_names=[tables[name], position], output_name=output, axis=0)
+            return output
+
+        # (N, trees) node index of every row in every tree, starting at the roots
+        position = self.dense('tree_roots', input_name, np.zeros((len(self.input_names), len(roots))), roots)
+        for _ in range(levels):
+            values_at = self.unique('tree_inputs')
+            self.builder.add_gather_along_axis(name=values_at, input_names=[input_name, gather('feature', position)],
+                                               output_name=values_at, axis=1)
+            decisions = self.unique('tree_decisions')
+            self.builder.add_less_than(name=decisions, input_names=[values_at, gather('threshold', position)],
+                                       output_name=decisions, use_less_than_equal=not strict)
+            moves = self.unique('tree_moves')
+            self.builder.add_multiply_broadcastable(name=moves, input_names=[decisions, gather('step', position)],
+                                                    output_name=moves)
+            next_position = self.unique('tree_position')
+            self.builder.add_add_broadcastable(name=next_position, input_names=[gather('other', position), moves],
+                                               output_name=next_position)
+            position = next_position
+        total = self.unique('tree_sum')
+        self.builder.add_reduce_sum(name=total, input_name=gather('values', position), output_name=total,
+                                    axes=[1], keepdims=False)
+        self.cpu_only = True
+        return total
+
+    def add_glm(self, params, input_name):
+        """Emit a glmRegressor as one matrix multiply, returning (blob, width)"""
+        W = np.array([list(w.value) for w in params.weights])
+        output = self.dense('glm', input_name, W.T, list(params.offset))
+        if params.postEvaluationTransform == 1:  # Logit
+            output = self.sigmoid(output)
+        elif params.postEvaluationTransform != 0:
+            raise NotImplementedError("Only NoTransform and Logit GLMs can be batched")
+        return output, W.shape[0]
+
+    def add_neural_network(self, spec):
+        """Re-emit a per-row network on (N, ...) blobs, returning [(blob, width)] per output"""
+        inputs = [f.name for f in spec.description.input]
+        widths = {f.name: reference_evaluator.feature_width(f.type) for f in spec.description.input}
+        blobs = {}
+
+        def blob(name):
+            if name not in blobs:
+                blobs[name] = self.column(name)
+            return blobs[name]
+
+        for layer in spec.neuralNetwork.layers:
+            kind = layer.WhichOneof('layer')
+            output = self.unique(layer.output[0])
+
+            if kind in ('concat', 'concatND') and list(layer.input) == inputs and all(widths[n] == 1 for n in inputs):
+                # Concatenating every scalar input in order is the feature matrix itself
+                blobs[layer.output[0]] = BATCH_INPUT
+                widths[layer.output[0]] = len(inputs)
+                continue
+            if kind == 'innerProduct':
+                W, b = reference_evaluator.inner_product_weights(layer.innerProduct)
+                blobs[layer.output[0]] = self.dense(layer.name, blob(layer.input[0]), W.T, b)
+                widths[layer.output[0]] = W.shape[0]
+                continue
+            if kind == 'splitND':
+                outputs = [self.unique(name) for name in layer.output]
+                sizes = list(layer.splitND.splitSizes)
+                self.builder.add_split_nd(
+                    name=output, input_name=blob(layer.input[0]), output_names=outputs,
+                    axis=-1, num_splits=len(outputs), split_sizes=sizes or None
+                )
+                blobs.update(zip(layer.output, outputs))
+                widths.update(zip(layer.output, sizes or [widths[layer.input[0]] // len(outputs)] * len(outputs)))
+                continue
+
+            if kind in ('activation', 'add', 'multiply', 'copy'):
+                # Resolve inputs first: column slices must precede the layer
+                input_names = [blob(name) for name in layer.input]
+                new_layer = self.builder.nn_spec.layers.add()
+                new_layer.CopyFrom(layer)
+                new_layer.name = output
+                del new_layer.input[:]
+                new_layer.input.extend(input_names)
+                new_layer.output[0] = output
+                width = widths[layer.input[0]]
+            elif kind in ('concat', 'concatND'):
+                self.builder.add_concat_nd(
+                    name=output, input_names=[blob(name) for name in layer.input], output_name=output, axis=-1
+                )
+                width = sum(widths[name] for name in layer.input)
+            elif kind == 'slice' and layer.slice.axis == 0:
+                params = layer.slice
+                source_width = widths[layer.input[0]]
+                end = params.endIndex if params.endIndex != -1 else source_width
+                self.builder.add_slice_static(
+                    name=output, input_name=blob(layer.input[0]), output_name=output,
+                    begin_ids=[0, params.startIndex], end_ids=[0, end], strides=[1, params.stride or 1],
+                    begin_masks=[True, False], end_masks=[True, False]
+                )
+                width = len(range(params.startIndex, end, params.stride or 1))
+            else:
+                raise NotImplementedError(f"Cannot batch neural network layer {layer.name} ({kind})")
+            blobs[layer.output[0]] = output
+            widths[layer.output[0]] = width
+
+        return [(blob(f.name), widths[f.name]) for f in spec.description.output]
+
+    def add_model(self, spec, input_name=BATCH_INPUT):
+        """Emit any supported model, returning [(blob, width)] in output order"""
+        model_type = spec.WhichOneof('Type')
+        if model_type == 'treeEnsembleRegressor':
+            return [self.add_tree_ensemble(spec.treeEnsembleRegressor, input_name)]
+        if model_type == 'glmRegressor':
+            return [self.add_glm(spec.glmRegressor, input_name)]
+        if model_type == 'neuralNetwork':
+            return self.add_neural_network(spec)
+        if model_type in ('pipeline', 'pipelineRegressor'):
+            return self.add_pipeline(spec)
+        raise NotImplementedError(f"Cannot batch {model_type} models")
+
+    def add_pipeline(self, spec):
+        """Emit each regressor of a pipeline side by side"""
+        produced = {}
+        for model_spec in reference_evaluator.pipeline_models(spec):
+            if model_spec.WhichOneof('Type') == 'featureVectorizer':
+                columns = [item.inputColumn for item in model_spec.featureVectorizer.inputList]
+                if columns != self.input_names:
+                    raise NotImplementedError("Feature vectorizer must list the model inputs in order")
+                continue
+            blocks = self.add_model(model_spec)
+            produced.update(zip([f.name for f in model_spec.description.output], blocks))
+        return [produced[f.name] for f in spec.description.output if f.name in produced]
+
+def output_layout(spec):
+    """Names of the batched output columns, in order"""
+    layout = spec.description.metadata.userDefined.get('outputLayout')
+    if layout:
+        return layout.split(',')
+    return [f.name for f in spec.description.output]
+
+def batched_spec(spec):
+    """Return a neuralNetwork spec taking (N, inputs) rows and returning (N, outputs)"""
+    from coremltools.models.neural_network import flexible_shape_utils
+
+    input_names = [f.name for f in spec.description.input]
+    layout = output_layout(spec)
+    model = BatchedModelBuilder(input_names, len(layout))
+    blocks = model.add_model(spec)
+
+    width = sum(w for _, w in blocks)
+    if width != len(layout):
+        layout = layout[:width] if width < len(layout) else layout + [f'output{i}' for i in range(len(layout), width)]
+
+    # Name the final blob after the model output
+    names = [name for name, _ in blocks]
+    if len(names) == 1 and names[0] != BATCH_INPUT:
+        final = model.builder.nn_spec.layers[-1]
+        if final.output[0] != names[0]:
+            raise ValueError("Batched output is not produced by the last layer")
+        final.output[0] = BATCH_OUTPUT
+    else:
+        model.builder.add_concat_nd(name='combine_outputs', input_names=names, output_name=BATCH_OUTPUT, axis=-1)
+
+    batched = model.builder.spec
+    flexible_shape_utils.set_multiarray_ndshape_range(
+        batched, BATCH_INPUT, lower_bounds=[1, len(input_names)], upper_bounds=[-1, len(input_names)]
+    )
+    batched.description.output[0].type.multiArrayType.ClearField('shape')
+    batched.description.output[0].type.multiArrayType.shape.extend([1, width])
+
+    batched.description.metadata.CopyFrom(spec.description.metadata)
+    batched.description.metadata.userDefined['inputLayout'] = ','.join(input_names)
+    batched.description.metadata.userDefined['outputLayout'] = ','.join(layout)
+    if model.cpu_only:
+        batched.description.metadata.userDefined[COMPUTE_UNITS] = 'cpuOnly'
+    batched.description.input[0].shortDescription = f"Input rows of [{', '.join(input_names)}]"
+    batched.description.output[0].shortDescription = f"Prediction rows of [{', '.join(layout)}]"
+    return batched
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('model', nargs='?', default='JubileePredictor.mlmodel', help='Scalar-input model to batch')
+    parser.add_argument('-o', '--output', default='JubileePredictorBatch.mlmodel', help='Where to write the batched model')
+    parser.add_argument('--no-optimize', action='store_true', help='Skip the neural network optimizer')
+    args = parser.parse_args()
+
+    spec = reference_evaluator.load_spec(args.model)
+    if not args.no_optimize:
+        import optimize_neural_network
+        spec, _ = optimize_neural_network.optimize_spec(spec)
+
+    batched = batched_spec(spec)
+
+    # Check the batched model against the original with the reference evaluator
+    # Rows exact in float32, as Core ML passes them to the network
+    X = reference_evaluator.random_rows(1024).astype(np.float32).astype(np.float64)
+    difference = np.abs(reference_evaluator.predict_batch(spec, X) - reference_evaluator.predict_batch(batched, X))
+    print(f"Layers: {len(batched.neuralNetwork.layers)}")
+    print(f"Outputs: {batched.description.metadata.userDefined['outputLayout']}")
+    print(f"Max difference vs scalar model on {len(X)} rows: {difference.max():.3g}")
+
+    with open(args.output, 'wb') as f:
+        f.write(batched.SerializeToString())
+    print(f"Batched model saved to: {args.output}")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Command-line entry point for the JubileePredictor model scripts
+One command with subcommands for generating data, training, exporting
+batched models, inspecting, verifying, evaluating, explaining and
+benchmarking models. Heavy modules (NumPy, scikit-learn, coremltools) are
+only imported by the subcommands that use them, so --help and inspect start
+instantly
+"""
+
+import argparse
+import sys
+
+PROG = 'jubilee_cli.py'
+
+# Subcommands that hand the rest of the command line to an existing script
+DELEGATED = {
+    'train': ('build_jubilee_model', 'Train, convert and verify the model (incremental build)'),
+    'export-batched': ('export_batched_model', 'Convert a model to the batched MultiArray form'),
+    'evaluate': ('evaluate_model', 'Stream a holdout through a model and report accuracy and calibration'),
+    'explain': ('tree_shap', 'Attribute forest predictions to their inputs with TreeSHAP'),
+    'bench': ('benchmark_pipeline', 'Run or compare the pipeline benchmarks')
+}
+
+def run_script(module, argv, command):
+    """Run a script's __main__ block as if it had been invoked with argv"""
+    import runpy
+
+    # alter_sys would replace argv[0], which argparse uses as the program name
+    sys.argv = [f"{PROG} {command}", *argv]
+    runpy.run_module(module, run_name='__main__')
+
+def command_generate(args):
+    from train_jubilee_model import generate_training_data
+
+    data = generate_training_data(n_samples=args.samples, seed=args.seed)
+    data.to_csv(args.output, index=False)
+    print(f"{len(data):,} rows saved to: {args.output}")
+
+def command_inspect(args):
+    import inspect_model
+
+    sys.exit(inspect_model.run(args))
+
+def command_verify(args):
+    """Evaluate a model with the reference evaluator; exit 1 if a check fails"""
+    import numpy as np
+
+    import reference_evaluator
+
+    spec = reference_evaluator.load_spec(args.model)
+    X = np.vstack([
+        [list(test['input'].values()) for test in reference_evaluator.TEST_CASES],
+        reference_evaluator.random_rows(args.samples, args.seed)
+    ])
+    predictions = reference_evaluator.predict_batch(spec, X)
+    failures = []
+
+    print(f"{args.model} ({spec.WhichOneof('Type')}): {predictions.shape[1]} outputs on {len(X):,} rows")
+    if not np.all(np.isfinite(predictions)):
+        failures.append(f"{int(np.sum(~np.isfinite(predictions)))} non-finite outputs")
+    if args.range:
+        low, high = (float(value) for value in args.range.split(','))
+        # Summing many trees in float64 can overshoot a bound by round-off
+        outside = np.sum((predictions < low - args.range_tolerance) | (predictions > high + args.range_tolerance))
+        # Shortest round-trip repr, so an overshoot such as 1.0000000000000007 shows
+        print(f"Outputs span {float(predictions.min())!r} to {float(predictions.max())!r} "
+              f"(expected {low:g} to {high:g}, tolerance {args.range_tolerance:g})")
+        if outside:
+            failures.append(f"{int(outside)} outputs outside [{low:g}, {high:g}] by more than {args.range_tolerance:g}")
+    if args.against:
+        other = reference_evaluator.load_spec(args.against)
+        difference = np.abs(predictions - reference_evaluator.predict_batch(other, X)).max()
+        print(f"Max difference vs {args.against}: {difference:.3g} (tolerance {args.tolerance:g})")
+        if difference > args.tolerance:
+            failures.append(f"differs from {args.against} by {difference:.3g}")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+def build_parser():
+    import inspect_model  # light: spec_wire only, NumPy is imported when trees are decoded
+
+    parser = argparse.ArgumentParser(prog=PROG, description=__doc__)
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    generate_parser = subparsers.add_parser('generate', help='Write synthetic training data as CSV')
+    generate_parser.add_argument('-o', '--output', default='jubilee_training_data.csv', help='CSV file to write')
+    generate_parser.add_argument('-n', '--samples', type=int, default=20000, help='Rows to generate')
+    generate_parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    generate_parser.set_defaults(handler=command_generate)
+
+    # Delegated subcommands parse their own options, including --help
+    def add_delegated(command):
+        subparsers.add_parser(command, help=DELEGATED[command][1], add_help=False)
+
+    add_delegated('train')
+    add_delegated('export-batched')
+
+    inspect_parser = subparsers.add_parser('inspect', help='Summarize .mlmodel files without loading coremltools')
+    inspect_model.add_arguments(inspect_parser)
+    inspect_parser.set_defaults(handler=command_inspect)
+
+    verify_parser = subparsers.add_parser('verify', help='Check a model with the NumPy reference evaluator')
+    verify_parser.add_argument('model', nargs='?', default='JubileePredictor.mlmodel', help='Model to check')
+    verify_parser.add_argument('--against', metavar='MODEL', help='Require matching predictions from this model')
+    verify_parser.add_argument('--tolerance', type=float, default=1e-5, help='Allowed difference for --against')
+    verify_parser.add_argument('--range', metavar='LOW,HIGH', help='Require every output within this range')
+    verify_parser.add_argument('--range-tolerance', type=float, default=1e-6,
+                               help='Allowed overshoot of --range, e.g. float64 round-off')
+    verify_parser.add_argument('-n', '--samples', type=int, default=1000, help='Random rows besides the test cases')
+    verify_parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    verify_parser.set_defaults(handler=command_verify)
+
+    add_delegated('evaluate')
+    add_delegated('explain')
+    add_delegated('bench')
+
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command in DELEGATED:
+        run_script(DELEGATED[args.command][0], extra, args.command)
+        return
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Opt-in memory profiling for the model scripts
+Takes tracemalloc snapshots at stage boundaries and reports, per stage, the
+peak traced memory, the process RSS high-water mark and the allocation
+sites that grew the most. tracemalloc sees Python and NumPy allocations;
+protobuf specs live in native arenas and only show up in RSS
+"""
+
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+def rss_high_water_bytes():
+    """Peak resident set size of this process so far, or None if unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class MemoryProfiler:
+    """Records memory use of consecutive, non-nested stages"""
+
+    def __init__(self, top=10, frames=1):
+        self.top = top
+        self.frames = frames
+        self.stages = []
+        self._snapshot = None
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ])
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._snapshot = self._take_snapshot()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Profile the enclosed block as one stage"""
+        if self._snapshot is None:
+            self.start()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            snapshot = self._take_snapshot()
+            growth = sorted(
+                (stat for stat in snapshot.compare_to(self._snapshot, 'lineno') if stat.size_diff > 0),
+                key=lambda stat: stat.size_diff, reverse=True
+            )
+            self._snapshot = snapshot
+            self.stages.append({
+                'stage': name,
+                'seconds': seconds,
+                'start_bytes': start_bytes,
+                'end_bytes': end_bytes,
+                'peak_bytes': peak_bytes,
+                'rss_high_water_bytes': rss_high_water_bytes(),
+                'top_sites': [
+                    {
+                        'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        'size_diff_bytes': stat.size_diff,
+                        'blocks': stat.count_diff
+                    }
+                    for stat in growth[:self.top]
+                ]
+            })
+
+    def report(self):
+        """Print the per-stage table followed by each stage's top allocation sites"""
+        print("\nMemory profile (tracemalloc)")
+        print(f"{'Stage':<24} {'Seconds':>8} {'Peak MB':>9} {'Retained MB':>12} {'RSS HWM MB':>11}")
+        for entry in self.stages:
+            rss = entry['rss_high_water_bytes']
+            print(
+                f"{entry['stage']:<24} {entry['seconds']:>8.2f} {entry['peak_bytes'] / MB:>9.1f} "
+                f"{(entry['end_bytes'] - entry['start_bytes']) / MB:>+12.1f} "
+                f"{rss / MB if rss is not None else float('nan'):>11.1f}"
+            )
+        for entry in self.stages:
+            if not entry['top_sites']:
+                continue
+            print(f"\nTop allocation sites in {entry['stage']}:")
+            for site in entry['top_sites']:
+                print(f"  {site['size_diff_bytes'] / MB:>+8.2f} MB  {site['site']} ({site['blocks']:+} blocks)")
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.stages, f, indent=2)
+
+class NullProfiler:
+    """Stand-in used when profiling is off: stages cost nothing"""
+
+    stages = []
+
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def report(self):
+        pass
+
+    def save(self, path):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+def add_arguments(parser):
+    """Add --profile-memory/--memory-report/--memory-top to an argparse parser"""
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Report peak memory, RSS and top allocation sites per stage')
+    parser.add_argument('--memory-report', metavar='PATH', help='Also write the memory profile as JSON')
+    parser.add_argument('--memory-top', type=int, default=10, help='Allocation sites to list per stage')
+
+def profiler_from_args(args):
+    """A started MemoryProfiler if profiling was requested, else NULL_PROFILER"""
+    if not (args.profile_memory or args.memory_report):
+        return NULL_PROFILER
+    profiler = MemoryProfiler(top=args.memory_top)
+    profiler.start()
+    return profiler
+
+def finish(profiler, args):
+    """Print and optionally save the profile"""
+    profiler.report()
+    if args.memory_report:
+        profiler.save(args.memory_report)
+        print(f"\nMemory profile saved to: {args.memory_report}")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Oblivious (symmetric) tree ensembles for JubileePredictor
+Gradient-boosted trees in which every node of a level uses the same split,
+so a depth-D tree is D (feature, threshold) pairs and 2^D leaves.
+Predicting a row is D comparisons that form a leaf index and one read of
+the leaf array: no pointer chasing, no data-dependent branches, and the
+same cost for every row. Includes a vectorized NumPy batch predictor and
+an exporter to a treeEnsembleRegressor spec
+"""
+
+import numpy as np
+
+# Rows predicted at once, bounding the (trees x rows) leaf index arrays
+PREDICT_CHUNK_ROWS = 16384
+
+def quantile_borders(column, n_bins):
+    """Up to n_bins - 1 split candidates: midpoints between distinct quantile values"""
+    values = np.unique(np.quantile(column, np.linspace(0.0, 1.0, n_bins + 1)))
+    return (values[:-1] + values[1:]) / 2.0
+
+class ObliviousBoostingRegressor:
+    """Least-squares gradient boosting of oblivious trees, single or multi-output
+
+    Features are quantized once into at most n_bins bins. Each level picks
+    the (feature, border) pair that most reduces the squared error summed
+    over every leaf of the level and every output, using per-leaf gradient
+    histograms; leaf values are shrunk by l2_regularization and scaled by
+    learning_rate. If every feature is constant there is nothing to split
+    on, and the model is a single leaf predicting the mean (n_trees_ 1,
+    depth_ 0).
+    """
+
+    def __init__(self, n_estimators=100, depth=6, learning_rate=0.1, n_bins=64, l2_regularization=1.0):
+        self.n_estimators = n_estimators
+        self.depth = depth
+        self.learning_rate = learning_rate
+        self.n_bins = n_bins
+        self.l2_regularization = l2_regularization
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.single_output_ = y.ndim == 1
+        Y = y.reshape(len(y), -1)
+        n_rows, n_features = X.shape
+        n_outputs = Y.shape[1]
+
+        self.borders_ = [quantile_borders(X[:, j], self.n_bins) for j in range(n_features)]
+        # bins[i, j] = number of borders below X[i, j], so "x > border b" is "bin > b"
+        bins = np.column_stack([np.searchsorted(self.borders_[j], X[:, j]) for j in range(n_features)])
+        n_borders = [len(borders) for borders in self.borders_]
+        width = max(n_borders) + 1
+
+        self.base_ = Y.mean(axis=0)
+        self.n_trees_, self.depth_ = (self.n_estimators, self.depth) if any(n_borders) else (1, 0)
+        prediction = np.tile(self.base_, (n_rows, 1))
+        self.features_ = np.zeros((self.n_trees_, self.depth_), np.int64)
+        self.thresholds_ = np.zeros((self.n_trees_, self.depth_))
+        self.leaf_values_ = np.zeros((self.n_trees_, 2 ** self.depth_, n_outputs))
+        l2 = self.l2_regularization
+        if not any(n_borders):
+            return self._index_splits()
+
+        for tree in range(self.n_estimators):
+            residual = Y - prediction
+            leaf = np.zeros(n_rows, np.int64)
+            for level in range(self.depth):
+                n_leaves = 2 ** level
+                best = (-np.inf, 0, 0)
+                for j in range(n_features):
+                    if not n_borders[j]:
+                        continue
+                    cell = leaf * width + bins[:, j]
+                    counts = np.bincount(cell, minlength=n_leaves * width).reshape(n_leaves, width)
+                    sums = np.stack([
+                        np.bincount(cell, weights=residual[:, o], minlength=n_leaves * width).reshape(n_leaves, width)
+                        for o in range(n_outputs)
+                    ])
+                    # Left of border b holds bins 0..b
+                    left_counts = np.cumsum(counts, axis=1)[:, :n_borders[j]]
+                    left_sums = np.cumsum(sums, axis=2)[:, :, :n_borders[j]]
+                    right_counts = counts.sum(axis=1, keepdims=True) - left_counts
+                    right_sums = sums.sum(axis=2, keepdims=True) - left_sums
+                    score = (
+                        (left_sums ** 2 / (left_counts + l2)).sum(axis=(0, 1))
+                        + (right_sums ** 2 / (right_counts + l2)).sum(axis=(0, 1))
+                    )
+                    border = int(np.argmax(score))
+                    if score[border] > best[0]:
+                        best = (score[border], j, border)
+                _, j, border = best
+                self.features_[tree, level] = j
+                self.thresholds_[tree, level] = self.borders_[j][border]
+                leaf = leaf * 2 + (bins[:, j] > border)
+
+            n_leaves = 2 ** self.depth
+            counts = np.bincount(leaf, minlength=n_leaves)
+            for o in range(n_outputs):
+                sums = np.bincount(leaf, weights=residual[:, o], minlength=n_leaves)
+                self.leaf_values_[tree, :, o] = self.learning_rate * sums / (counts + l2)
+            prediction += self.leaf_values_[tree][leaf]
+
+        return self._index_splits()
+
+    def _index_splits(self):
+        # Trees reuse the same few borders: compare each distinct split once per row
+        splits = np.stack([self.features_.ravel(), self.thresholds_.ravel()], axis=1)
+        self.splits_, split_index = np.unique(splits, axis=0, return_inverse=True)
+        self.split_index_ = split_index.reshape(self.n_trees_, self.depth_)
+        return self
+
+    def leaf_indices(self, X):
+        """(trees, rows) leaf index of each row; the first level is the most significant bit"""
+        X = np.asarray(X, dtype=np.float64)
+        decisions = X.T[self.splits_[:, 0].astype(np.int64)] > self.splits_[:, 1, None]
+        leaves = np.zeros((self.n_trees_, len(X)), np.uint8 if self.depth_ <= 8 else np.int64)
+        for level in range(self.depth_):
+            leaves <<= 1
+            leaves |= decisions[self.split_index_[:, level]]
+        return leaves
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        n_outputs = self.leaf_values_.shape[2]
+        # Offset of each tree's leaves in the flattened per-output leaf arrays
+        tree_offsets = (np.arange(self.n_trees_) * 2 ** self.depth_)[:, None]
+        output_values = self.leaf_values_.reshape(-1, n_outputs).T.copy()
+        result = np.empty((len(X), n_outputs))
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            leaves = self.leaf_indices(X[start:start + PREDICT_CHUNK_ROWS]) + tree_offsets
+            for o in range(n_outputs):
+                result[start:start + PREDICT_CHUNK_ROWS, o] = self.base_[o] + np.take(output_values[o], leaves).sum(axis=0)
+        return result[:, 0] if self.single_output_ else result
+
+    def to_spec(self, input_names, output_name):
+        """treeEnsembleRegressor spec reading the scalar inputs, with one output dimension per target
+
+        Every tree is written out as a complete binary tree: the node of
+        level d reached by path p (as bits) has id 2^d - 1 + p, and the
+        x <= threshold branch is the 0 bit.
+        """
+        from coremltools.proto import Model_pb2
+
+        TreeNode = Model_pb2.TreeEnsembleParameters.TreeNode
+        n_outputs = self.leaf_values_.shape[2]
+
+        spec = Model_pb2.Model()
+        spec.specificationVersion = 1
+        for name in input_names:
+            input_feature = spec.description.input.add()
+            input_feature.name = name
+            input_feature.type.doubleType.MergeFromString(b'')
+        output_feature = spec.description.output.add()
+        output_feature.name = output_name
+        if self.single_output_:
+            output_feature.type.doubleType.MergeFromString(b'')
+        else:
+            output_feature.type.multiArrayType.shape.append(n_outputs)
+            output_feature.type.multiArrayType.dataType = Model_pb2.ArrayFeatureType.DOUBLE
+        spec.description.predictedFeatureName = output_name
+
+        ensemble = spec.treeEnsembleRegressor.treeEnsemble
+        ensemble.numPredictionDimensions = n_outputs
+        ensemble.basePredictionValue.extend(self.base_.tolist())
+        for tree in range(self.n_trees_):
+            for level in range(self.depth_):
+                for path in range(2 ** level):
+                    node = ensemble.nodes.add()
+                    node.treeId = tree
+                    node.nodeId = 2 ** level - 1 + path
+                    node.nodeBehavior = TreeNode.BranchOnValueLessThanEqual
+                    node.branchFeatureIndex = int(self.features_[tree, level])
+                    node.branchFeatureValue = float(self.thresholds_[tree, level])
+                    node.trueChildNodeId = 2 ** (level + 1) - 1 + 2 * path
+                    node.falseChildNodeId = 2 ** (level + 1) - 1 + 2 * path + 1
+            for path in range(2 ** self.depth_):
+                node = ensemble.nodes.add()
+                node.treeId = tree
+                node.nodeId = 2 ** self.depth_ - 1 + path
+                node.nodeBehavior = TreeNode.LeafNode
+                for o in range(n_outputs):
+                    info = node.evaluationInfo.add()
+                    info.evaluationIndex = o
+                    info.evaluationValue = float(self.leaf_values_[tree, path, o])
+        return spec
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import reference_evaluator
+    from build_jubilee_model import FEATURES, OUTPUT_NAME, TARGETS
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-o', '--output', default='JubileePredictorOblivious.mlmodel', help='Where to write the model')
+    parser.add_argument('-n', '--samples', type=int, default=20000, help='Rows of training data')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--trees', type=int, default=200, help='Boosting rounds')
+    parser.add_argument('--depth', type=int, default=6, help='Depth of every tree')
+    parser.add_argument('--learning-rate', type=float, default=0.1, help='Shrinkage of each tree')
+    parser.add_argument('--bins', type=int, default=64, help='Quantization bins per feature')
+    args = parser.parse_args()
+
+    from sklearn.model_selection import train_test_split
+
+    import evaluate_model
+    from train_jubilee_model import generate_training_data
+
+    data = generate_training_data(n_samples=args.samples, seed=args.seed)
+    X_train, X_test, y_train, y_test = train_test_split(
+        data[FEATURES].values, data[TARGETS].values, test_size=0.2, random_state=args.seed
+    )
+
+    started = time.perf_counter()
+    model = ObliviousBoostingRegressor(args.trees, args.depth, args.learning_rate, args.bins).fit(X_train, y_train)
+    print(f"Trained {args.trees} oblivious trees of depth {args.depth} in {time.perf_counter() - started:.1f}s")
+
+    evaluate_model.print_report(evaluate_model.evaluate(model.predict, evaluate_model.array_chunks(X_test, y_test)))
+
+    X = reference_evaluator.random_rows(100_000)
+    started = time.perf_counter()
+    model.predict(X)
+    print(f"\nBatch prediction: {(time.perf_counter() - started) / len(X) * 1e6:.2f} µs/row")
+
+    spec = model.to_spec(FEATURES, OUTPUT_NAME)
+    spec.description.metadata.userDefined['outputLayout'] = ','.join(TARGETS)
+    difference = np.abs(reference_evaluator.predict_batch(spec, X_test) - model.predict(X_test)).max()
+    print(f"Nodes: {len(spec.treeEnsembleRegressor.treeEnsemble.nodes):,}")
+    print(f"Max difference of the Core ML spec on {len(X_test):,} test rows: {difference:.3g}")
+
+    with open(args.output, 'wb') as f:
+        f.write(spec.SerializeToString())
+    print(f"Model saved to: {args.output}")
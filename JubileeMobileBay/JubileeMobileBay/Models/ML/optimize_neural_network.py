@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Graph optimizer for JubileePredictor neural network specs
+Folds elementwise affine layers into inner products, fuses activation and
+slice chains, and removes dead layers, then checks the optimized spec
+against the original with the reference evaluator
+"""
+
+import copy
+
+import numpy as np
+
+import reference_evaluator
+
+NEURAL_NETWORK_TYPES = ('neuralNetwork', 'neuralNetworkRegressor', 'neuralNetworkClassifier')
+
+# Elementwise layers that map each column independently and keep the width
+ELEMENTWISE_ACTIVATIONS = ('linear', 'ReLU', 'leakyReLU', 'sigmoid', 'tanh', 'scaledTanh', 'sigmoidHard', 'softplus')
+
+class Graph:
+    """Mutable view of a neural network layer list"""
+
+    def __init__(self, layers, input_widths, protected):
+        self.layers = [copy.deepcopy(layer) for layer in layers]
+        self.input_widths = dict(input_widths)
+        self.protected = set(protected)  # model input and output names
+
+    def producers(self):
+        return {name: layer for layer in self.layers for name in layer.output}
+
+    def consumers(self):
+        result = {}
+        for layer in self.layers:
+            for name in layer.input:
+                result.setdefault(name, []).append(layer)
+        return result
+
+    def widths(self):
+        """Infer the per-row width of every blob, or None when unknown"""
+        widths = dict(self.input_widths)
+        for layer in self.layers:
+            kind = layer.WhichOneof('layer')
+            inputs = [widths.get(name) for name in layer.input]
+            if kind in ('activation', 'copy') or (kind in ('add', 'multiply') and len(inputs) == 1):
+                out = [inputs[0]]
+            elif kind == 'innerProduct':
+                out = [layer.innerProduct.outputChannels]
+            elif kind in ('concat', 'concatND'):
+                out = [sum(inputs) if None not in inputs else None]
+            elif kind == 'slice' and inputs[0] is not None:
+                params = layer.slice
+                end = params.endIndex if params.endIndex != -1 else None
+                out = [len(range(inputs[0])[params.startIndex:end:params.stride or 1])]
+            elif kind == 'splitND' and layer.splitND.splitSizes:
+                out = list(layer.splitND.splitSizes)
+            else:
+                out = [None] * len(layer.output)
+            widths.update(zip(layer.output, out))
+        return widths
+
+    def rename_uses(self, old, new):
+        """Point every consumer of blob old at blob new"""
+        for layer in self.layers:
+            for i, name in enumerate(layer.input):
+                if name == old:
+                    layer.input[i] = new
+
+    def remove(self, layer):
+        self.layers = [l for l in self.layers if l is not layer]
+
+def is_linear(layer):
+    return layer.WhichOneof('layer') == 'activation' and layer.activation.WhichOneof('NonlinearityType') == 'linear'
+
+def activation_kind(layer):
+    if layer.WhichOneof('layer') != 'activation':
+        return None
+    return layer.activation.WhichOneof('NonlinearityType')
+
+def set_inner_product(layer, W, b):
+    """Store float64 (W, b) back into an innerProduct layer"""
+    params = layer.innerProduct
+    params.outputChannels, params.inputChannels = W.shape
+    params.weights.ClearField('floatValue')
+    params.weights.floatValue.extend(W.astype(np.float32).reshape(-1).tolist())
+    params.hasBias = True
+    params.bias.ClearField('floatValue')
+    params.bias.floatValue.extend(b.astype(np.float32).tolist())
+
+# Passes. Each returns the number of rewrites it made.
+
+def normalize_affine_layers(graph):
+    """Rewrite single-input add/multiply layers as LINEAR activations"""
+    count = 0
+    for layer in graph.layers:
+        kind = layer.WhichOneof('layer')
+        if kind in ('add', 'multiply') and len(layer.input) == 1:
+            alpha, beta = (1.0, layer.add.alpha) if kind == 'add' else (layer.multiply.alpha, 0.0)
+            layer.ClearField(kind)
+            layer.activation.linear.alpha = alpha
+            layer.activation.linear.beta = beta
+            count += 1
+    return count
+
+def fuse_activation_chains(graph):
+    """Compose LINEAR after LINEAR and drop repeated idempotent activations"""
+    count = 0
+    for layer in list(graph.layers):
+        kind = activation_kind(layer)
+        if kind is None:
+            continue
+        source = graph.producers().get(layer.input[0])
+        if source is None or activation_kind(source) is None:
+            continue
+        if len(graph.consumers().get(source.output[0], [])) != 1 or source.output[0] in graph.protected:
+            continue
+
+        source_kind = activation_kind(source)
+        if kind == 'linear' and source_kind == 'linear':
+            a1, b1 = source.activation.linear.alpha, source.activation.linear.beta
+            a2, b2 = layer.activation.linear.alpha, layer.activation.linear.beta
+            layer.activation.linear.alpha = a2 * a1
+            layer.activation.linear.beta = a2 * b1 + b2
+        elif not (kind == source_kind and kind in ('ReLU', 'sigmoidHard')):
+            continue
+        layer.input[0] = source.input[0]
+        graph.remove(source)
+        count += 1
+    return count
+
+def fold_affine_into_inner_product(graph):
+    """Fold LINEAR layers (directly or through a concat) into the next innerProduct"""
+    count = 0
+    widths = graph.widths()
+    consumers = graph.consumers()
+    producers = graph.producers()
+
+    for blob, users in list(consumers.items()):
+        if blob in graph.protected or not users:
+            continue
+        if not all(user.WhichOneof('layer') == 'innerProduct' for user in users):
+            continue
+        source = producers.get(blob)
+        if source is None:
+            continue
+
+        if is_linear(source):
+            width = widths.get(blob)
+            if width is None:
+                continue
+            scale = np.full(width, source.activation.linear.alpha)
+            shift = np.full(width, source.activation.linear.beta)
+            new_inputs = None
+        elif source.WhichOneof('layer') in ('concat', 'concatND'):
+            parts = [producers.get(name) for name in source.input]
+            part_widths = [widths.get(name) for name in source.input]
+            if None in part_widths:
+                continue
+            foldable = [
+                part is not None and is_linear(part) and part.output[0] not in graph.protected
+                and len(consumers.get(part.output[0], [])) == 1
+                for part in parts
+            ]
+            if not any(foldable):
+                continue
+            scale, shift, new_inputs = [], [], []
+            for name, part, width, fold in zip(source.input, parts, part_widths, foldable):
+                if fold:
+                    scale.append(np.full(width, part.activation.linear.alpha))
+                    shift.append(np.full(width, part.activation.linear.beta))
+                    new_inputs.append(part.input[0])
+                else:
+                    scale.append(np.ones(width))
+                    shift.append(np.zeros(width))
+                    new_inputs.append(name)
+            scale, shift = np.concatenate(scale), np.concatenate(shift)
+        else:
+            continue
+
+        for user in users:
+            W, b = reference_evaluator.inner_product_weights(user.innerProduct)
+            set_inner_product(user, W * scale, b + W @ shift)
+
+        if new_inputs is None:
+            graph.rename_uses(blob, source.input[0])
+            graph.remove(source)
+            count += 1
+        else:
+            for part, fold in zip(parts, foldable):
+                if fold:
+                    graph.remove(part)
+                    count += 1
+            del source.input[:]
+            source.input.extend(new_inputs)
+
+        # The graph changed under the cached maps; pick up the rest next round
+        return count
+    return count
+
+def fold_affine_after_inner_product(graph):
+    """Fold a LINEAR layer into the innerProduct that feeds it"""
+    count = 0
+    for layer in list(graph.layers):
+        if not is_linear(layer):
+            continue
+        source = graph.producers().get(layer.input[0])
+        if source is None or source.WhichOneof('layer') != 'innerProduct':
+            continue
+        if source.output[0] in graph.protected or len(graph.consumers().get(source.output[0], [])) != 1:
+            continue
+        alpha, beta = layer.activation.linear.alpha, layer.activation.linear.beta
+        W, b = reference_evaluator.inner_product_weights(source.innerProduct)
+        set_inner_product(source, W * alpha, b * alpha + beta)
+        source.output[0] = layer.output[0]
+        graph.remove(layer)
+        count += 1
+    return count
+
+def remove_identity_layers(graph):
+    """Drop copy layers, full-width slices and LINEAR activations with alpha 1 and beta 0"""
+    count = 0
+    widths = graph.widths()
+    for layer in list(graph.layers):
+        identity = layer.WhichOneof('layer') == 'copy' or (
+            is_linear(layer) and layer.activation.linear.alpha == 1.0 and layer.activation.linear.beta == 0.0
+        ) or (
+            layer.WhichOneof('layer') == 'slice' and layer.slice.axis == 0
+            and widths.get(layer.input[0]) is not None
+            and widths.get(layer.output[0]) == widths.get(layer.input[0])
+        )
+        if not identity:
+            continue
+        source_name, output_name = layer.input[0], layer.output[0]
+        if output_name not in graph.protected:
+            graph.rename_uses(output_name, source_name)
+        else:
+            # Keep the model output name by renaming the producer's output instead
+            source = graph.producers().get(source_name)
+            if source is None or source_name in graph.protected:
+                continue
+            if len(graph.consumers().get(source_name, [])) != 1:
+                continue
+            source.output[list(source.output).index(source_name)] = output_name
+        graph.remove(layer)
+        count += 1
+    return count
+
+def _used_columns(graph, blob, width, consumers):
+    """Columns of blob read downstream, following width-preserving activations"""
+    if blob in graph.protected:
+        return set(range(width))
+    used = set()
+    for user in consumers.get(blob, []):
+        kind = user.WhichOneof('layer')
+        if kind == 'slice' and user.slice.axis == 0:
+            end = user.slice.endIndex if user.slice.endIndex != -1 else None
+            used.update(range(width)[user.slice.startIndex:end:user.slice.stride or 1])
+        elif activation_kind(user) in ELEMENTWISE_ACTIVATIONS:
+            used.update(_used_columns(graph, user.output[0], width, consumers))
+        else:
+            return set(range(width))
+    return used
+
+def _remap_slices(graph, blob, mapping, consumers):
+    """Rewrite slice bounds downstream of blob after columns were dropped"""
+    for user in consumers.get(blob, []):
+        if user.WhichOneof('layer') == 'slice':
+            params = user.slice
+            end = params.endIndex if params.endIndex != -1 else len(mapping)
+            kept = [mapping[c] for c in range(params.startIndex, end, params.stride or 1)]
+            params.startIndex, params.endIndex, params.stride = kept[0], kept[-1] + 1, 1
+        else:
+            _remap_slices(graph, user.output[0], mapping, consumers)
+
+def prune_unused_outputs(graph):
+    """Drop innerProduct output channels that no downstream slice reads"""
+    count = 0
+    consumers = graph.consumers()
+    for layer in graph.layers:
+        if layer.WhichOneof('layer') != 'innerProduct':
+            continue
+        width = layer.innerProduct.outputChannels
+        used = sorted(_used_columns(graph, layer.output[0], width, consumers))
+        if not used or len(used) == width:
+            continue
+        # Slices of non-contiguous survivors would need strides; keep it simple
+        if used != list(range(used[0], used[-1] + 1)):
+            continue
+        W, b = reference_evaluator.inner_product_weights(layer.innerProduct)
+        set_inner_product(layer, W[used], b[used])
+        mapping = {column: i for i, column in enumerate(used)}
+        _remap_slices(graph, layer.output[0], mapping, consumers)
+        count += width - len(used)
+    return count
+
+def fuse_slices_into_split(graph, spec_version):
+    """Replace sibling slices that partition a blob with one splitND layer"""
+    if spec_version < 4:  # splitND needs Core ML 3
+        return 0
+    count = 0
+    widths = graph.widths()
+    for blob, users in graph.consumers().items():
+        if len(users) < 2 or not all(
+            user.WhichOneof('layer') == 'slice' and user.slice.axis == 0 and user.slice.stride in (0, 1)
+            for user in users
+        ):
+            continue
+        width = widths.get(blob)
+        if width is None:
+            continue
+        bounds = sorted(
+            (user.slice.startIndex, user.slice.endIndex if user.slice.endIndex != -1 else width, user)
+            for user in users
+        )
+        contiguous = bounds[0][0] == 0 and bounds[-1][1] == width and all(
+            prev[1] == nxt[0] for prev, nxt in zip(bounds, bounds[1:])
+        )
+        if not contiguous:
+            continue
+
+        first = min(users, key=graph.layers.index)
+        split = copy.deepcopy(first)
+        split.ClearField('slice')
+        split.name = f"split_{blob}"
+        del split.output[:]
+        split.output.extend(user.output[0] for _, _, user in bounds)
+        split.splitND.axis = -1
+        split.splitND.numSplits = len(bounds)
+        split.splitND.splitSizes.extend(end - start for start, end, _ in bounds)
+
+        graph.layers[graph.layers.index(first)] = split
+        for user in users:
+            if user is not first:
+                graph.remove(user)
+        count += len(users) - 1
+        return count
+    return count
+
+def remove_dead_layers(graph, outputs):
+    """Drop layers none of whose outputs reach a model output"""
+    live = set(outputs)
+    kept = []
+    for layer in reversed(graph.layers):
+        if any(name in live for name in layer.output):
+            live.update(layer.input)
+            kept.append(layer)
+    removed = len(graph.layers) - len(kept)
+    graph.layers = kept[::-1]
+    return removed
+
+def optimize_layers(layers, description, spec_version):
+    """Run every pass to a fixed point, returning (layers, pass counts)"""
+    input_widths = {f.name: reference_evaluator.feature_width(f.type) for f in description.input}
+    outputs = [f.name for f in description.output]
+    graph = Graph(layers, input_widths, list(input_widths) + outputs)
+
+    stats = {'normalize_affine_layers': normalize_affine_layers(graph)}
+    passes = [
+        ('remove_dead_layers', lambda: remove_dead_layers(graph, outputs)),
+        ('fuse_activation_chains', lambda: fuse_activation_chains(graph)),
+        ('fold_affine_into_inner_product', lambda: fold_affine_into_inner_product(graph)),
+        ('fold_affine_after_inner_product', lambda: fold_affine_after_inner_product(graph)),
+        ('remove_identity_layers', lambda: remove_identity_layers(graph)),
+        ('prune_unused_outputs', lambda: prune_unused_outputs(graph)),
+        ('fuse_slices_into_split', lambda: fuse_slices_into_split(graph, spec_version))
+    ]
+    changed = True
+    while changed:
+        changed = False
+        for name, run in passes:
+            n = run()
+            stats[name] = stats.get(name, 0) + n
+            changed = changed or n > 0
+    return graph.layers, stats
+
+def optimize_spec(spec, verify=True, n_samples=2048, tolerance=1e-4):
+    """Return an optimized copy of spec and a report of what changed
+
+    Neural networks nested in pipelines are optimized in place of the
+    originals. Other model types are returned unchanged. With verify=True
+    the optimized spec must match the original within tolerance on random
+    inputs drawn from the feature ranges, or ValueError is raised.
+    """
+    optimized = copy.deepcopy(spec)
+    report = {'layers_before': 0, 'layers_after': 0, 'passes': {}}
+    _optimize_in_place(optimized, optimized.specificationVersion, report)
+
+    if verify and report['layers_before'] != report['layers_after']:
+        differences = reference_evaluator.max_abs_difference(spec, optimized, n_samples)
+        report['max_abs_difference'] = differences
+        worst = max(differences.values(), default=0.0)
+        if worst > tolerance:
+            raise ValueError(f"Optimized model differs from the original by {worst:.3g}: {differences}")
+    return optimized, report
+
+def _optimize_in_place(spec, spec_version, report):
+    model_type = spec.WhichOneof('Type')
+    if model_type in ('pipeline', 'pipelineRegressor', 'pipelineClassifier'):
+        for model_spec in reference_evaluator.pipeline_models(spec):
+            _optimize_in_place(model_spec, spec_version, report)
+        return
+    if model_type not in NEURAL_NETWORK_TYPES:
+        return
+
+    network = getattr(spec, model_type)
+    layers, stats = optimize_layers(network.layers, spec.description, spec_version)
+    report['layers_before'] += len(network.layers)
+    report['layers_after'] += len(layers)
+    for name, n in stats.items():
+        report['passes'][name] = report['passes'].get(name, 0) + n
+    del network.layers[:]
+    network.layers.extend(layers)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('model', nargs='?', default='JubileePredictor.mlmodel', help='Model to optimize')
+    parser.add_argument('-o', '--output', help='Where to write the optimized model (default: overwrite)')
+    parser.add_argument('--no-verify', action='store_true', help='Skip the reference evaluator check')
+    args = parser.parse_args()
+
+    spec = reference_evaluator.load_spec(args.model)
+    optimized, report = optimize_spec(spec, verify=not args.no_verify)
+
+    print(f"Layers: {report['layers_before']} -> {report['layers_after']}")
+    for name, n in report['passes'].items():
+        if n:
+            print(f"  {name}: {n}")
+    if 'max_abs_difference' in report:
+        print(f"Max difference vs original: {report['max_abs_difference']}")
+
+    output_path = args.output or args.model
+    with open(output_path, 'wb') as f:
+        f.write(optimized.SerializeToString())
+    print(f"Optimized model saved to: {output_path}")
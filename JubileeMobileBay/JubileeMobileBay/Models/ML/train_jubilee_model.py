@@ -5,17 +5,17 @@ Creates a Core ML model with multiple outputs for jubilee event prediction
 """
 
 import numpy as np
-import coremltools as ct
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.multioutput import MultiOutputRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score
 import pandas as pd
 
+from memory_profile import NULL_PROFILER
+
 # Generate synthetic training data
-def generate_training_data(n_samples=20000):
+def generate_training_data(n_samples=20000, seed=None):
     """Generate synthetic jubilee event data based on environmental conditions"""
     
+    if seed is not None:
+        np.random.seed(seed)
+    
     # Generate random environmental conditions
     air_temp = np.random.uniform(65, 95, n_samples)  # Fahrenheit
     water_temp = np.random.uniform(70, 88, n_samples)  # Fahrenheit
@@ -71,48 +71,58 @@ def generate_training_data(n_samples=20000):
     return data
 
 # Train the model
-def train_jubilee_model():
+def train_jubilee_model(profiler=NULL_PROFILER):
     """Train a multi-output regression model for jubilee prediction"""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.model_selection import train_test_split
+
+    import evaluate_model
     
     print("Generating training data...")
-    data = generate_training_data(n_samples=20000)
+    with profiler.stage('generate'):
+        data = generate_training_data(n_samples=20000)
     
     # Prepare features and targets
     feature_columns = ['airTemperature', 'waterTemperature', 'windSpeed', 'dissolvedOxygen']
     target_columns = ['jubileeProbability', 'confidenceScore']
     
-    X = data[feature_columns].values
-    y = data[target_columns].values
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    with profiler.stage('split'):
+        X = data[feature_columns].values
+        y = data[target_columns].values
+        
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
     print(f"Training data shape: {X_train.shape}")
     print(f"Test data shape: {X_test.shape}")
     
     # Create and train multi-output model
     print("\nTraining multi-output random forest model...")
-    base_regressor = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
-    model = MultiOutputRegressor(base_regressor)
-    model.fit(X_train, y_train)
+    with profiler.stage('train'):
+        base_regressor = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+        model = MultiOutputRegressor(base_regressor)
+        model.fit(X_train, y_train)
     
     # Evaluate model
     print("\nEvaluating model...")
-    y_pred = model.predict(X_test)
-    
-    for i, target in enumerate(target_columns):
-        mse = mean_squared_error(y_test[:, i], y_pred[:, i])
-        r2 = r2_score(y_test[:, i], y_pred[:, i])
-        print(f"\n{target}:")
-        print(f"  MSE: {mse:.4f}")
-        print(f"  RMSE: {np.sqrt(mse):.4f}")
-        print(f"  R² Score: {r2:.4f}")
+    with profiler.stage('evaluate'):
+        report = evaluate_model.evaluate(model.predict, evaluate_model.array_chunks(X_test, y_test), target_columns)
+    evaluate_model.print_report(report)
     
     return model, feature_columns, target_columns
 
 # Convert to Core ML
-def convert_to_coreml(model, feature_columns, target_columns):
-    """Convert scikit-learn model to Core ML format"""
+def convert_to_coreml(model, feature_columns, target_columns, profiler=NULL_PROFILER):
+    """Convert scikit-learn model to Core ML format
+    
+    The converter does not support MultiOutputRegressor, so each target's
+    forest is converted on its own and the forests are merged into one
+    tree ensemble with a [jubileeProbability, confidenceScore] output.
+    """
+    import coremltools as ct
+    
+    from create_simple_model import merge_tree_ensembles
     
     print("\nConverting to Core ML...")
     
@@ -130,54 +140,64 @@ def convert_to_coreml(model, feature_columns, target_columns):
         else:
             description = feature
             
-        input_features.append((feature, ct.models.datatypes.Double(), description))
-    
-    # Define output features
-    output_features = []
-    for target in target_columns:
-        if target == 'jubileeProbability':
-            description = 'Probability of jubilee event (0.0-1.0)'
-        elif target == 'confidenceScore':
-            description = 'Model confidence score (0.0-1.0)'
-        else:
-            description = target
-            
-        output_features.append((target, description))
+        input_features.append((feature, description))
     
     # Convert model
-    coreml_model = ct.converters.sklearn.convert(
-        model,
-        input_features=input_features,
-        output_feature_names=target_columns
-    )
-    
-    # Set metadata
-    coreml_model.author = 'JubileeMobileBay Team'
-    coreml_model.short_description = 'Predicts jubilee events based on environmental conditions'
-    coreml_model.version = '1.0.0'
-    
-    # Add descriptions to outputs
-    spec = coreml_model.get_spec()
-    for i, (name, desc) in enumerate(output_features):
-        spec.description.output[i].shortDescription = desc
-    
-    # Update spec
-    coreml_model = ct.models.MLModel(spec)
+    with profiler.stage('convert'):
+        specs = [
+            ct.converters.sklearn.convert(
+                estimator,
+                input_features=[(name, ct.models.datatypes.Double()) for name, _ in input_features],
+                output_feature_names=target
+            ).get_spec()
+            for estimator, target in zip(model.estimators_, target_columns)
+        ]
+        coreml_model = ct.models.MLModel(merge_tree_ensembles(specs, input_features, 'jubileePrediction'))
+        del specs
+    
+    with profiler.stage('metadata'):
+        # Set metadata
+        coreml_model.author = 'JubileeMobileBay Team'
+        coreml_model.short_description = 'Predicts jubilee events based on environmental conditions'
+        coreml_model.version = '1.0.0'
+        
+        # Describe the combined output
+        spec = coreml_model.get_spec()
+        spec.description.output[0].shortDescription = (
+            f"Jubilee prediction [{', '.join(target_columns)}] (0.0-1.0)"
+        )
+        spec.description.metadata.userDefined['outputLayout'] = ','.join(target_columns)
+        
+        # Update spec
+        coreml_model = ct.models.MLModel(spec)
     
     return coreml_model
 
 # Main execution
 if __name__ == "__main__":
-    # Train model
-    model, feature_columns, target_columns = train_jubilee_model()
-    
-    # Convert to Core ML
-    coreml_model = convert_to_coreml(model, feature_columns, target_columns)
-    
-    # Save model
-    output_path = 'JubileePredictor.mlmodel'
-    coreml_model.save(output_path)
-    print(f"\nCore ML model saved to: {output_path}")
+    import argparse
+    import memory_profile
+    from create_simple_model import unpack_prediction
+    
+    parser = argparse.ArgumentParser(description=__doc__)
+    memory_profile.add_arguments(parser)
+    args = parser.parse_args()
+    profiler = memory_profile.profiler_from_args(args)
+    
+    try:
+        # Train model
+        model, feature_columns, target_columns = train_jubilee_model(profiler)
+        
+        # Convert to Core ML
+        coreml_model = convert_to_coreml(model, feature_columns, target_columns, profiler)
+        
+        # Save model
+        output_path = 'JubileePredictor.mlmodel'
+        with profiler.stage('save'):
+            coreml_model.save(output_path)
+        print(f"\nCore ML model saved to: {output_path}")
+    finally:
+        memory_profile.finish(profiler, args)
     
     # Test the Core ML model
     print("\nTesting Core ML model...")
@@ -188,7 +208,7 @@ if __name__ == "__main__":
         'dissolvedOxygen': 3.5
     }
     
-    prediction = coreml_model.predict(test_input)
+    prediction = unpack_prediction(coreml_model.predict(test_input))
     print(f"\nTest prediction for optimal conditions:")
     print(f"  Input: {test_input}")
     print(f"  Jubilee Probability: {prediction['jubileeProbability']:.3f}")
@@ -94,7 +94,8 @@ def build_neural_network():
         input_channels=4,
         output_channels=16,
         W=np.random.randn(16, 4).astype(np.float32) * 0.1,
-        b=np.zeros(16).astype(np.float32)
+        b=np.zeros(16).astype(np.float32),
+        has_bias=True
     )
     
     builder.add_activation(
@@ -112,7 +113,8 @@ def build_neural_network():
         input_channels=16,
         output_channels=8,
         W=np.random.randn(8, 16).astype(np.float32) * 0.1,
-        b=np.zeros(8).astype(np.float32)
+        b=np.zeros(8).astype(np.float32),
+        has_bias=True
     )
     
     builder.add_activation(
@@ -130,7 +132,8 @@ def build_neural_network():
         input_channels=8,
         output_channels=1,
         W=np.random.randn(1, 8).astype(np.float32) * 0.1,
-        b=np.array([0.5]).astype(np.float32)
+        b=np.array([0.5]).astype(np.float32),
+        has_bias=True
     )
     
     # Sigmoid activation for probability
@@ -149,7 +152,8 @@ def build_neural_network():
         input_channels=8,
         output_channels=1,
         W=np.random.randn(1, 8).astype(np.float32) * 0.1,
-        b=np.array([0.7]).astype(np.float32)
+        b=np.array([0.7]).astype(np.float32),
+        has_bias=True
     )
     
     # Sigmoid activation for confidence
@@ -161,19 +165,28 @@ def build_neural_network():
     )
     
     # Set metadata
-    builder.author = 'JubileeMobileBay Team'
-    builder.description = 'Neural network model for predicting jubilee events based on environmental conditions'
-    builder.version = '1.0.0'
+    spec = builder.spec
+    spec.description.metadata.author = 'JubileeMobileBay Team'
+    spec.description.metadata.shortDescription = 'Neural network model for predicting jubilee events based on environmental conditions'
+    spec.description.metadata.versionString = '1.0.0'
     
     # Set input descriptions
-    builder.set_input('airTemperature', 'Air temperature in Fahrenheit')
-    builder.set_input('waterTemperature', 'Water temperature in Fahrenheit')
-    builder.set_input('windSpeed', 'Wind speed in miles per hour')
-    builder.set_input('dissolvedOxygen', 'Dissolved oxygen in mg/L')
+    input_descriptions = {
+        'airTemperature': 'Air temperature in Fahrenheit',
+        'waterTemperature': 'Water temperature in Fahrenheit',
+        'windSpeed': 'Wind speed in miles per hour',
+        'dissolvedOxygen': 'Dissolved oxygen in mg/L'
+    }
+    for input_feature in spec.description.input:
+        input_feature.shortDescription = input_descriptions[input_feature.name]
     
     # Set output descriptions
-    builder.set_output('jubileeProbability', 'Probability of jubilee event (0.0-1.0)')
-    builder.set_output('confidenceScore', 'Model confidence score (0.0-1.0)')
+    output_descriptions = {
+        'jubileeProbability': 'Probability of jubilee event (0.0-1.0)',
+        'confidenceScore': 'Model confidence score (0.0-1.0)'
+    }
+    for output_feature in spec.description.output:
+        output_feature.shortDescription = output_descriptions[output_feature.name]
     
     # Create model
     model = ct.models.MLModel(builder.spec)
@@ -203,40 +216,31 @@ def create_simple_coreml_model():
         input_feature.shortDescription = input_desc
         input_feature.type.doubleType.MergeFromString(b'')
     
-    # Add outputs
-    for output_name, output_desc in [
-        ('jubileeProbability', 'Probability of jubilee event (0.0-1.0)'),
-        ('confidenceScore', 'Model confidence score (0.0-1.0)')
-    ]:
-        output_feature = spec.description.output.add()
-        output_feature.name = output_name
-        output_feature.shortDescription = output_desc
-        output_feature.type.doubleType.MergeFromString(b'')
+    # A GLM has a single output, so both targets share one array laid out as
+    # [jubileeProbability, confidenceScore] (same layout as the single-ensemble model)
+    output_feature = spec.description.output.add()
+    output_feature.name = 'jubileePrediction'
+    output_feature.shortDescription = 'Jubilee prediction [jubileeProbability, confidenceScore] (0.0-1.0)'
+    output_feature.type.multiArrayType.shape.append(2)
+    output_feature.type.multiArrayType.dataType = ArrayFeatureType.DOUBLE
+    spec.description.predictedFeatureName = 'jubileePrediction'
     
     # Set metadata
     spec.description.metadata.author = 'JubileeMobileBay Team'
     spec.description.metadata.shortDescription = 'Predicts jubilee events based on environmental conditions'
     spec.description.metadata.versionString = '1.0.0'
-    
-    # Use pipeline model with custom layer
-    pipeline = spec.pipelineRegressor
-    
-    # Add a dummy regressor model (will be replaced with trained model)
-    model_spec = pipeline.pipeline.models.add()
-    model_spec.specificationVersion = 4
+    spec.description.metadata.userDefined['outputLayout'] = 'jubileeProbability,confidenceScore'
     
     # Create a simple linear regression as placeholder
-    lr = model_spec.glmRegressor
+    lr = spec.glmRegressor
     lr.offset.append(0.5)  # Base probability
     lr.offset.append(0.7)  # Base confidence
     
-    # Add weights for each feature
-    for i in range(4):
-        weight = lr.weights.add()
-        # Probability weights
-        weight.value.append(0.1 if i < 2 else -0.05)  # Temp positive, wind/DO negative
-        # Confidence weights  
-        weight.value.append(0.05)
+    # One weight row per output, one value per input feature
+    probability_weights = lr.weights.add()
+    probability_weights.value.extend([0.1, 0.1, -0.05, -0.05])  # Temp positive, wind/DO negative
+    confidence_weights = lr.weights.add()
+    confidence_weights.value.extend([0.05, 0.05, 0.05, 0.05])
     
     # Create MLModel
     model = ct.models.MLModel(spec)
@@ -245,21 +249,36 @@ def create_simple_coreml_model():
 
 # Main execution
 if __name__ == "__main__":
+    import argparse
+    import memory_profile
+    from create_simple_model import unpack_prediction
+    
+    parser = argparse.ArgumentParser(description=__doc__)
+    memory_profile.add_arguments(parser)
+    args = parser.parse_args()
+    profiler = memory_profile.profiler_from_args(args)
+    
     print("Building Core ML model for jubilee prediction...")
     
     try:
-        # Try neural network approach first
-        model = build_neural_network()
-        print("Neural network model created successfully")
-    except Exception as e:
-        print(f"Neural network failed: {e}")
-        print("Using simplified model instead...")
-        model = create_simple_coreml_model()
-    
-    # Save model
-    output_path = 'JubileePredictor.mlmodel'
-    model.save(output_path)
-    print(f"\nCore ML model saved to: {output_path}")
+        try:
+            # Try neural network approach first
+            with profiler.stage('build'):
+                model = build_neural_network()
+            print("Neural network model created successfully")
+        except Exception as e:
+            print(f"Neural network failed: {e}")
+            print("Using simplified model instead...")
+            with profiler.stage('fallback'):
+                model = create_simple_coreml_model()
+        
+        # Save model
+        output_path = 'JubileePredictor.mlmodel'
+        with profiler.stage('save'):
+            model.save(output_path)
+        print(f"\nCore ML model saved to: {output_path}")
+    finally:
+        memory_profile.finish(profiler, args)
     
     # Test the model
     print("\nTesting Core ML model...")
@@ -271,7 +290,7 @@ if __name__ == "__main__":
     }
     
     try:
-        prediction = model.predict(test_input)
+        prediction = unpack_prediction(model.predict(test_input))
         print(f"\nTest prediction for optimal conditions:")
         print(f"  Input: {test_input}")
         print(f"  Jubilee Probability: {prediction['jubileeProbability']}")
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Batch TreeSHAP attributions for JubileePredictor forests
+Computes exact path-dependent SHAP values (the per-feature contributions
+TreeSHAP assigns, summing to the prediction minus the expected value) for
+the scikit-learn forests the training scripts fit. Per-leaf tables are
+precomputed once; attributions for large batches are then computed with
+array operations over every tree at once, in row chunks spread across
+processes. Results are written as JubileePrediction records whose
+environmentalFactors carry the raw inputs plus one <feature>Contribution
+entry per input
+
+The forests come from build_jubilee_model's defaults, limited to depth 10.
+The unbounded train_jubilee_model forests (--set max_depth=null, ~3.4M
+nodes) need more than the 5 GB of memory this was run with
+"""
+
+import itertools
+import os
+from math import factorial
+
+import numpy as np
+
+# Most rows explained at once by one worker, and rows per descent of the trees (bounding its frontier)
+SHAP_CHUNK_ROWS = 1 << 20
+DESCENT_CHUNK_ROWS = 1024
+
+# Terms over up to this many features are batched box-stabbing queries, whose cost is mostly fixed
+# per batch; larger ones descend the trees, at a cost per row
+MAX_STABBED_FEATURES = 3
+
+class TreeShapExplainer:
+    """Exact path-dependent SHAP values for flat tree arrays with node covers
+
+    With v(S) the cover-weighted expectation of the forest given the
+    features in S, every leaf contributes c_leaf(B) to the attributions,
+    where B is the set of features whose split intervals on the leaf's path
+    contain the row. Tables hold the subset (Möbius) expansion d_leaf(A) of
+    c_leaf, so a row's attributions are sums of d_leaf(A) over the leaves
+    whose box on the features A contains it: a constant for no feature,
+    batched box-stabbing queries over the leaf corners for up to
+    stabbed_features, and one pruned descent of all trees at once for the
+    rest. Coincident corners are merged and the stabbing structures are
+    built once here; queries still cost about the same for any batch size,
+    so small batches are better served by a lower stabbed_features.
+    """
+
+    def __init__(self, trees, stabbed_features=MAX_STABBED_FEATURES):
+        if not hasattr(trees, 'cover'):
+            raise ValueError("TreeSHAP needs node covers (see compile_tree_gemm.forest_arrays)")
+        if np.any(trees.behavior[~trees.is_leaf] != 0):
+            raise NotImplementedError("Only x <= threshold splits are supported")
+
+        self.feature = trees.feature
+        self.threshold = trees.threshold
+        self.true_child = trees.true_child
+        self.false_child = trees.false_child
+        self.roots = trees.roots
+        self.n_features = M = int(trees.feature[~trees.is_leaf].max()) + 1 if (~trees.is_leaf).any() else 1
+        n_subsets = 2 ** M
+
+        leaves = np.flatnonzero(trees.is_leaf)
+        self.leaf_position = np.full(len(trees.is_leaf), -1, np.int64)
+        self.leaf_position[leaves] = np.arange(len(leaves))
+        self.values = trees.leaf_values[leaves]
+        n_outputs = self.values.shape[1]
+        lo, hi, ratio = self._path_tables(trees, leaves)
+
+        # c[leaf, B, i] = (1[i in B] - r_i) * sum over S subset of B - {i} of w(|S|) * prod over j not in S + {i} of r_j
+        weights = [factorial(s) * factorial(M - s - 1) / factorial(M) for s in range(M)]
+        members = (np.arange(n_subsets)[:, None] >> np.arange(M)) & 1
+        popcount = members.sum(axis=1)
+        c = np.zeros((len(leaves), n_subsets, M))
+        for i in range(M):
+            terms = np.zeros((len(leaves), n_subsets))
+            for S in range(n_subsets):
+                if S >> i & 1:
+                    continue
+                outside = [j for j in range(M) if j != i and not S >> j & 1]
+                terms[:, S] = weights[popcount[S]] * np.prod(ratio[:, outside], axis=1)
+            # Sum the terms over subsets S of B (a zeta transform over the feature bits)
+            for j in range(M):
+                with_j = members[:, j] == 1
+                terms[:, with_j] += terms[:, ~with_j]
+            c[:, :, i] = (members[:, i] - ratio[:, i, None]) * terms
+
+        # Möbius transform: c(B) = sum over A subset of B of d(A)
+        d = c.copy()
+        for j in range(M):
+            with_j = members[:, j] == 1
+            d[:, with_j] -= d[:, ~with_j]
+
+        def weighted(A):
+            """(leaves, features * outputs) d_leaf(A) scaled by the leaf values"""
+            return np.einsum('li,lo->lio', d[:, A], self.values).reshape(len(leaves), M * n_outputs)
+
+        # Up to stabbed_features features: the leaf boxes on A, as signed corners sorted on the first feature
+        self.constant = weighted(0).sum(axis=0)
+        self.stabbed = []
+        for A in range(1, n_subsets):
+            if popcount[A] > stabbed_features:
+                continue
+            dims = [j for j in range(M) if A >> j & 1]
+            weight = weighted(A)
+            used = np.flatnonzero(np.any(weight != 0, axis=1))
+            corner_leaf, corner_sign, corners = [], [], []
+            for upper in itertools.product((False, True), repeat=len(dims)):
+                bounds = np.column_stack([(hi if is_upper else lo)[used, j] for j, is_upper in zip(dims, upper)])
+                keep = np.all(bounds < np.inf, axis=1)
+                corner_leaf.append(used[keep])
+                corner_sign.append(np.full(keep.sum(), -1.0 if sum(upper) % 2 else 1.0))
+                corners.append(bounds[keep])
+            corners = np.concatenate(corners)
+            signed = np.concatenate(corner_sign)[:, None] * weight[np.concatenate(corner_leaf)]
+            # Leaves share thresholds, so corners often coincide; each distinct corner keeps the sum of their weights
+            corners, merged = np.unique(corners, axis=0, return_inverse=True)
+            corner_weight = np.zeros((len(corners), signed.shape[1]))
+            np.add.at(corner_weight, merged.ravel(), signed)
+            # np.unique sorts on the first feature
+            ranked = [np.unique(corners[:, k], return_inverse=True) for k in range(1, len(dims))]
+            ranks = [ranks for _, ranks in ranked]
+            bits = [len(positions).bit_length() for positions, _ in ranked]
+            self.stabbed.append((
+                dims, corners[:, 0], [positions for positions, _ in ranked],
+                wavelet_levels(ranks, bits, np.arange(len(corners), dtype=np.int32)), corner_weight
+            ))
+
+        # More features: per leaf, what is left of c(B) after the terms above, for B the
+        # features the row does not violate, with at most M - 1 - stabbed_features violated
+        low_order = d * (popcount <= stabbed_features)[:, None]
+        for j in range(M):
+            with_j = members[:, j] == 1
+            low_order[:, with_j] += low_order[:, ~with_j]
+        allowed = np.flatnonzero(popcount <= M - 1 - stabbed_features)
+        full = n_subsets - 1
+        terms = (c - low_order)[:, full ^ allowed]
+        self.leaf_terms = np.einsum('lvi,lo->lvio', terms, self.values).reshape(-1, M * n_outputs)
+        self.violation_index = np.full(n_subsets, -1, np.int64)
+        self.violation_index[allowed] = np.arange(len(allowed))
+
+        self.expected_value = trees.base + np.einsum('l,lo->o', np.prod(ratio, axis=1), self.values)
+
+    def _path_tables(self, trees, leaves):
+        """Per leaf and feature: interval (lo, hi] of the path's splits and product of cover ratios"""
+        M = self.n_features
+        parent = np.full(len(trees.is_leaf), -1, np.int64)
+        internal = np.flatnonzero(~trees.is_leaf)
+        parent[trees.true_child[internal]] = internal
+        parent[trees.false_child[internal]] = internal
+        on_true = np.zeros(len(trees.is_leaf), bool)
+        on_true[trees.true_child[internal]] = True
+
+        lo = np.full((len(leaves), M), -np.inf)
+        hi = np.full((len(leaves), M), np.inf)
+        ratio = np.ones((len(leaves), M))
+        rows = np.arange(len(leaves))
+        child = leaves
+        while len(child):
+            above = parent[child]
+            keep = above >= 0
+            rows, child, above = rows[keep], child[keep], above[keep]
+            f = trees.feature[above]
+            t = trees.threshold[above]
+            left = on_true[child]
+            hi[rows[left], f[left]] = np.minimum(hi[rows[left], f[left]], t[left])
+            lo[rows[~left], f[~left]] = np.maximum(lo[rows[~left], f[~left]], t[~left])
+            ratio[rows, f] *= trees.cover[child] / trees.cover[above]
+            child = above
+        return lo, hi, ratio
+
+    def shap_values(self, X):
+        """(rows, features, outputs) attributions of (rows, features) X"""
+        X = np.asarray(X, dtype=np.float64)
+        n, M = len(X), self.n_features
+        n_outputs = self.values.shape[1]
+        phi = np.broadcast_to(self.constant, (n, M * n_outputs)).copy()
+        for dims, first, positions, levels, weight in self.stabbed:
+            phi += dominance_sums(
+                levels, weight,
+                np.zeros(n, np.int64), np.searchsorted(first, X[:, dims[0]], side='left'),
+                [np.searchsorted(p, X[:, j], side='left') for p, j in zip(positions, dims[1:])]
+            )
+        if len(self.leaf_terms):
+            for start in range(0, n, DESCENT_CHUNK_ROWS):
+                phi[start:start + DESCENT_CHUNK_ROWS] += self._descend(X[start:start + DESCENT_CHUNK_ROWS])
+        return phi.reshape(n, M, n_outputs)
+
+    def _descend(self, X):
+        """Leaf terms over more features than are stabbed, from one descent of every tree
+
+        Rows follow their own branch, and also take the other branch of a
+        feature not yet violated while few enough features are; descent
+        states pack node << M | violated features.
+        """
+        from scipy.sparse import csr_matrix
+
+        n, M = len(X), self.n_features
+        n_allowed = (self.violation_index >= 0).sum()
+        mask = 2 ** M - 1
+        columns = X.T.ravel()
+        phi = np.zeros((n, self.leaf_terms.shape[1]))
+        rows = np.repeat(np.arange(n), len(self.roots))
+        state = np.tile(self.roots << M, n)
+        while len(state):
+            node = state >> M
+            violated = state & mask
+            leaf = self.leaf_position[node]
+            at_leaf = leaf >= 0
+            if at_leaf.any():
+                # The frontier stays sorted by row, so leaf visits form a sparse (rows x leaf terms) matrix as is
+                indptr = np.searchsorted(rows[at_leaf], np.arange(n + 1))
+                slots = leaf[at_leaf] * n_allowed + self.violation_index[violated[at_leaf]]
+                phi += csr_matrix((np.ones(indptr[-1]), slots, indptr), shape=(n, len(self.leaf_terms))) @ self.leaf_terms
+                inside = ~at_leaf
+                rows, node, violated = rows[inside], node[inside], violated[inside]
+            f = self.feature[node]
+            goes_true = columns[f * n + rows] <= self.threshold[node]
+            true_child, false_child = self.true_child[node], self.false_child[node]
+            followed = np.where(goes_true, true_child, false_child) << M | violated
+            other_violated = violated | (1 << f)
+            keep = self.violation_index[other_violated] >= 0
+            other = np.where(goes_true, false_child, true_child)[keep] << M | other_violated[keep]
+            # Each state is followed by its violating sibling, if any
+            position = np.arange(len(followed)) + np.cumsum(keep) - keep
+            next_rows = np.empty(len(followed) + len(other), np.int64)
+            state = np.empty_like(next_rows)
+            next_rows[position], state[position] = rows, followed
+            next_rows[position[keep] + 1], state[position[keep] + 1] = rows[keep], other
+            rows = next_rows
+        return phi
+
+def wavelet_levels(ranks, bits, points):
+    """The levels dominance_sums walks, for points with the given ranks
+
+    Each rank dimension is a wavelet matrix over the points, with bits
+    levels (enough for every query limit): per level, the bit, the number
+    of points with a 0 there before each position, and the levels of the
+    remaining dimensions over those points. The innermost entry is the
+    order of the points. Built once per explainer, so queries only walk the
+    levels; indices are int32 to halve their memory.
+    """
+    if not ranks:
+        return points
+    rank = ranks[0][points]
+    levels = []
+    for level in reversed(range(bits[0])):
+        zero = (rank >> level & 1) == 0
+        zero_rank = np.concatenate([np.zeros(1, np.int32), np.cumsum(zero, dtype=np.int32)])
+        levels.append((level, zero_rank, wavelet_levels(ranks[1:], bits[1:], points[zero])))
+        order = np.concatenate([np.flatnonzero(zero), np.flatnonzero(~zero)])
+        rank, points = rank[order], points[order]
+    return levels
+
+def dominance_sums(levels, weight, start, end, limits):
+    """Per query, the sum of weight over points in [start, end) whose ranks are all below its limits
+
+    levels come from wavelet_levels. At each level of a rank dimension,
+    queries with a 1 in their limit take the points in range with a 0
+    there, summed over the remaining dimensions recursively.
+    """
+    if not limits:
+        sums = np.concatenate([np.zeros((1, weight.shape[1])), np.cumsum(weight[levels], axis=0)])
+        return sums[end] - sums[start]
+
+    limit, rest_limits = limits[0], limits[1:]
+    total = np.zeros((len(start), weight.shape[1]))
+    for level, zero_rank, rest in levels:
+        one = (limit >> level & 1) == 1
+        if one.any():
+            total[one] += dominance_sums(
+                rest, weight, zero_rank[start[one]], zero_rank[end[one]], [l[one] for l in rest_limits]
+            )
+        start = np.where(one, zero_rank[-1] + start - zero_rank[start], zero_rank[start])
+        end = np.where(one, zero_rank[-1] + end - zero_rank[end], zero_rank[end])
+    return total
+
+def brute_force_shap(trees, x):
+    """Exact path-dependent SHAP values of one row by enumerating feature subsets (slow; for checks)"""
+    M = int(trees.feature[~trees.is_leaf].max()) + 1
+    n_outputs = trees.leaf_values.shape[1]
+
+    def expectation(node, S):
+        if trees.is_leaf[node]:
+            return trees.leaf_values[node]
+        true_child, false_child = trees.true_child[node], trees.false_child[node]
+        if S >> trees.feature[node] & 1:
+            return expectation(true_child if x[trees.feature[node]] <= trees.threshold[node] else false_child, S)
+        cover = trees.cover[node]
+        return (trees.cover[true_child] * expectation(true_child, S)
+                + trees.cover[false_child] * expectation(false_child, S)) / cover
+
+    v = [sum(expectation(root, S) for root in trees.roots) for S in range(2 ** M)]
+    phi = np.zeros((M, n_outputs))
+    for i in range(M):
+        for S in range(2 ** M):
+            if not S >> i & 1:
+                size = bin(S).count('1')
+                phi[i] += factorial(size) * factorial(M - size - 1) / factorial(M) * (v[S | 1 << i] - v[S])
+    return phi
+
+# Process-pool workers share one explainer, inherited or sent once per worker
+_worker_explainer = None
+
+def _initialize_worker(explainer):
+    global _worker_explainer
+    _worker_explainer = explainer
+
+def _explain_chunk(X):
+    return _worker_explainer.shap_values(X)
+
+def explain_batch(explainer, X, jobs=None, chunk_rows=SHAP_CHUNK_ROWS):
+    """shap_values in up to jobs processes (default: every core), one chunk of at most chunk_rows each at a time
+
+    Every chunk pays the fixed cost of the stabbing queries, so batches are
+    only split into as many chunks as chunk_rows requires, never to occupy
+    more processes.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = np.array_split(X, max(1, -(-len(X) // chunk_rows)))
+    jobs = max(1, min(jobs or os.cpu_count(), len(chunks)))
+    if jobs == 1:
+        return np.concatenate([explainer.shap_values(chunk) for chunk in chunks])
+    with ProcessPoolExecutor(jobs, initializer=_initialize_worker, initargs=(explainer,)) as pool:
+        return np.concatenate(list(pool.map(_explain_chunk, chunks)))
+
+def prediction_records(X, predictions, phi, feature_names, output_names):
+    """JubileePrediction-shaped dicts: outputs, plus raw inputs and contributions to jubileeProbability"""
+    column = output_names.index('jubileeProbability') if 'jubileeProbability' in output_names else 0
+    for row in range(len(X)):
+        # JubileePrediction names the probability output plainly
+        record = {
+            'probability' if name == 'jubileeProbability' else name: float(predictions[row, k])
+            for k, name in enumerate(output_names)
+        }
+        factors = {name: float(X[row, j]) for j, name in enumerate(feature_names)}
+        factors.update({f"{name}Contribution": float(phi[row, j, column]) for j, name in enumerate(feature_names)})
+        record['environmentalFactors'] = factors
+        yield record
+
+if __name__ == "__main__":
+    import argparse
+    import copy
+    import json
+    import time
+
+    import build_jubilee_model
+    import reference_evaluator
+    from build_jubilee_model import FEATURES, TARGETS
+    from compile_tree_gemm import forest_arrays
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cache-dir', default='.build_cache', help='build_jubilee_model stage cache to take the forests from')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='Build setting, as for build_jubilee_model')
+    parser.add_argument('--csv', help='Rows to explain (default: random rows within FEATURE_RANGES)')
+    parser.add_argument('-n', '--rows', type=int, default=100_000, help='Random rows to explain')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='Most worker processes, one per chunk of SHAP_CHUNK_ROWS rows')
+    parser.add_argument('--check', type=int, default=0, metavar='N', help='Compare N rows with brute-force subset enumeration')
+    parser.add_argument('-o', '--output', help='Write JubileePrediction records as JSON Lines')
+    parser.add_argument('--stabbed-features', type=int, default=MAX_STABBED_FEATURES,
+                        help='Largest feature subsets summed by stabbing queries (lower suits small batches)')
+    args = parser.parse_args()
+
+    config = copy.deepcopy(build_jubilee_model.DEFAULT_CONFIG)
+    for setting in args.set:
+        build_jubilee_model.parse_setting(setting, config)
+    if config['learner'] != 'random_forest':
+        parser.error("TreeSHAP needs the random_forest learner")
+    # Only the stages up to the forests, sharing cache entries with full builds
+    stages = build_jubilee_model.jubilee_build_graph().stages
+    train_stages = [f'train_{target}' for target in TARGETS]
+    graph = build_jubilee_model.BuildGraph([stages[name] for name in ['generate', 'split', *train_stages]])
+    load, _ = graph.run(config, build_jubilee_model.ArtifactCache(args.cache_dir))
+    forests = [load(name) for name in train_stages]
+
+    if args.csv:
+        import pandas as pd
+        X = pd.read_csv(args.csv)[FEATURES].values
+    else:
+        X = reference_evaluator.random_rows(args.rows)
+
+    trees = forest_arrays(forests)
+    started = time.perf_counter()
+    explainer = TreeShapExplainer(trees, args.stabbed_features)
+    print(f"Tables for {len(trees.roots)} trees, {len(explainer.values):,} leaves in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    phi = explain_batch(explainer, X, args.jobs)
+    seconds = time.perf_counter() - started
+    jobs = max(1, min(args.jobs, -(-len(X) // SHAP_CHUNK_ROWS)))
+    print(f"Explained {len(X):,} rows in {seconds:.1f}s ({len(X) / seconds:,.0f} rows/s, {jobs} processes)")
+
+    predictions = trees.predict(X)
+    gap = np.abs(explainer.expected_value + phi.sum(axis=1) - predictions).max()
+    print(f"Expected value: {', '.join(f'{name} {value:.4f}' for name, value in zip(TARGETS, explainer.expected_value))}")
+    print(f"Max |expected value + contributions - prediction|: {gap:.3g}")
+    for k, target in enumerate(TARGETS):
+        print(f"\nMean |contribution| to {target}:")
+        for j, name in enumerate(FEATURES):
+            print(f"  {name:<20} {np.abs(phi[:, j, k]).mean():.4f}")
+
+    if args.check:
+        difference = max(np.abs(brute_force_shap(trees, X[row]) - phi[row]).max() for row in range(min(args.check, len(X))))
+        print(f"\nMax difference vs brute force on {min(args.check, len(X))} rows: {difference:.3g}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            for record in prediction_records(X, predictions, phi, FEATURES, TARGETS):
+                f.write(json.dumps(record) + '\n')
+        print(f"\nRecords saved to: {args.output}")
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the JubileePredictor model pipeline
+Times every stage of the model scripts (data generation, dataset assembly,
+fitting, evaluation, conversion, spec save and batch inference with the
+reference evaluator) across sample sizes, appends the medians to a JSON
+history file and compares runs to flag regressions
+"""
+
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import build_jubilee_model
+from build_jubilee_model import FEATURES, TARGETS
+
+DEFAULT_SIZES = '1k,10k,100k'
+DEFAULT_HISTORY = 'benchmark_history.json'
+
+# Fitted models used by the evaluate/convert/save/inference cases train on at
+# most this many rows, so evaluate and inference scale with the rows
+# processed rather than with ever larger forests, and convert and save
+# (which process only the model) stop changing past it
+MODEL_TRAINING_ROWS = 100_000
+
+SEED = 42
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000"""
+    text = text.strip()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:].lower(), 1)
+    digits = text[:-1] if multiplier != 1 else text
+    return int(float(digits) * multiplier)
+
+def format_size(n):
+    for suffix, scale in (('M', 1_000_000), ('k', 1_000)):
+        if n >= scale and n % scale == 0:
+            return f"{n // scale}{suffix}"
+    return str(n)
+
+class Workload:
+    """Inputs for every case at one sample size, built on first use and untimed"""
+
+    def __init__(self, n_samples, scratch=None):
+        self.n_samples = n_samples
+        # Directory the save_* cases write to
+        self.scratch = scratch
+        self._cache = {}
+
+    def _memo(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    def frame(self):
+        from train_jubilee_model import generate_training_data
+        return self._memo('frame', lambda: generate_training_data(self.n_samples, seed=SEED))
+
+    def data(self):
+        return self._memo('data', lambda: assemble(self.frame()))
+
+    def rows(self):
+        """Every generated feature row, for inference"""
+        return self._memo('rows', lambda: np.ascontiguousarray(self.frame()[FEATURES].values))
+
+    def training_sample(self):
+        data = self.data()
+        return data['X_train'][:MODEL_TRAINING_ROWS], data['y_train'][:MODEL_TRAINING_ROWS]
+
+    def linear_model(self):
+        return self._memo('linear_model', lambda: fit_linear(*self.training_sample()))
+
+    def forest(self):
+        return self._memo('forest', lambda: fit_forests(*self.training_sample(), n_estimators=20, max_depth=5)[0])
+
+    def linear_spec(self):
+        return self._memo('linear_spec', lambda: convert_single(self.linear_model()))
+
+    def forest_spec(self):
+        return self._memo('forest_spec', lambda: convert_single(self.forest()))
+
+    def forest_gemm(self):
+        """(blocks, base, strict) matrix form of the forest"""
+        from compile_tree_gemm import forest_arrays
+        from export_batched_model import tree_gemm_blocks
+        return self._memo('forest_gemm', lambda: tree_gemm_blocks(forest_arrays(self.forest()), len(FEATURES)))
+
+    def neural_network_spec(self):
+        return self._memo('neural_network_spec', build_neural_network_spec)
+
+# Stage implementations, mirroring the model scripts
+
+def assemble(frame):
+    """DataFrame -> feature/target arrays -> train/test split"""
+    return build_jubilee_model.split(
+        {'test_size': 0.2, 'seed': SEED},
+        {'X': frame[FEATURES].values, 'y': frame[TARGETS].values}
+    )
+
+def fit_linear(X, y):
+    """create_minimal_model: one linear regression"""
+    from sklearn.linear_model import LinearRegression
+    return LinearRegression().fit(X, y[:, 0])
+
+def fit_forests(X, y, n_estimators, max_depth, targets=1):
+    """Random forests for the first `targets` target columns"""
+    from sklearn.ensemble import RandomForestRegressor
+    return [
+        RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=SEED, n_jobs=-1).fit(X, y[:, i])
+        for i in range(targets)
+    ]
+
+def evaluate_model(model, data):
+    from sklearn.metrics import mean_squared_error, r2_score
+    y_pred = model.predict(data['X_test'])
+    return mean_squared_error(data['y_test'][:, 0], y_pred), r2_score(data['y_test'][:, 0], y_pred)
+
+def convert_single(model):
+    """sklearn -> Core ML spec, as create_basic_model/create_minimal_model do"""
+    import coremltools as ct
+    return ct.converters.sklearn.convert(
+        model,
+        input_features=[(name, ct.models.datatypes.Double()) for name in FEATURES],
+        output_feature_names=TARGETS[0]
+    ).get_spec()
+
+def build_neural_network_spec():
+    from train_neural_network_model import build_neural_network
+    return build_neural_network().get_spec()
+
+def save_spec(spec, directory):
+    path = os.path.join(directory, 'JubileePredictor.mlmodel')
+    with open(path, 'wb') as f:
+        f.write(spec.SerializeToString())
+    return os.path.getsize(path)
+
+def infer(spec, X):
+    import reference_evaluator
+    return reference_evaluator.predict_batch(spec, X)
+
+# Cases: each setup builds its inputs untimed and returns the thunk to time
+
+def case_generate(workload):
+    return lambda: build_jubilee_model.generate({'n_samples': workload.n_samples, 'seed': SEED})
+
+def case_assemble(workload):
+    frame = workload.frame()
+    return lambda: assemble(frame)
+
+def case_fit_linear(workload):
+    data = workload.data()
+    return lambda: fit_linear(data['X_train'], data['y_train'])
+
+def case_fit_forest_basic(workload):
+    data = workload.data()
+    return lambda: fit_forests(data['X_train'], data['y_train'], n_estimators=20, max_depth=5)
+
+def case_fit_forest_simple(workload):
+    data = workload.data()
+    return lambda: fit_forests(data['X_train'], data['y_train'], n_estimators=10, max_depth=5, targets=2)
+
+def case_fit_forest_jubilee(workload):
+    data = workload.data()
+    # build_jubilee_model's depth-10 forests, not the unbounded train_jubilee_model ones
+    config = build_jubilee_model.DEFAULT_CONFIG
+    return lambda: fit_forests(
+        data['X_train'], data['y_train'], config['n_estimators'], config['max_depth'], targets=2
+    )
+
+def case_evaluate_linear(workload):
+    model, data = workload.linear_model(), workload.data()
+    return lambda: evaluate_model(model, data)
+
+def case_evaluate_forest(workload):
+    model, data = workload.forest(), workload.data()
+    return lambda: evaluate_model(model, data)
+
+def case_convert_linear(workload):
+    model = workload.linear_model()
+    return lambda: convert_single(model)
+
+def case_convert_forest(workload):
+    model = workload.forest()
+    return lambda: convert_single(model)
+
+def case_build_neural_network(workload):
+    return build_neural_network_spec
+
+def case_save_linear(workload):
+    spec = workload.linear_spec()
+    return lambda: save_spec(spec, workload.scratch)
+
+def case_save_forest(workload):
+    spec = workload.forest_spec()
+    return lambda: save_spec(spec, workload.scratch)
+
+def case_save_neural_network(workload):
+    spec = workload.neural_network_spec()
+    return lambda: save_spec(spec, workload.scratch)
+
+def case_infer_linear(workload):
+    spec, X = workload.linear_spec(), workload.rows()
+    return lambda: infer(spec, X)
+
+def case_infer_forest(workload):
+    spec, X = workload.forest_spec(), workload.rows()
+    return lambda: infer(spec, X)
+
+def case_infer_forest_gemm(workload):
+    from export_batched_model import gemm_predict
+    (blocks, base, strict), X = workload.forest_gemm(), workload.rows()
+    return lambda: gemm_predict(blocks, base, strict, X)
+
+def case_infer_neural_network(workload):
+    spec, X = workload.neural_network_spec(), workload.rows()
+    return lambda: infer(spec, X)
+
+# How a case depends on the size: 'rows' processes every row (timed per size,
+# with rows per second), 'model' processes only a model trained on up to
+# MODEL_TRAINING_ROWS rows (timed per size, absolute time only) and 'fixed'
+# runs once
+ROWS, MODEL, FIXED = 'rows', 'model', 'fixed'
+
+# name -> (setup, largest size it runs at by default, how it depends on the size)
+CASES = {
+    'generate': (case_generate, 10_000_000, ROWS),
+    'assemble': (case_assemble, 10_000_000, ROWS),
+    'fit_linear': (case_fit_linear, 10_000_000, ROWS),
+    'fit_forest_basic': (case_fit_forest_basic, 1_000_000, ROWS),
+    'fit_forest_simple': (case_fit_forest_simple, 1_000_000, ROWS),
+    'fit_forest_jubilee': (case_fit_forest_jubilee, 100_000, ROWS),
+    'evaluate_linear': (case_evaluate_linear, 10_000_000, ROWS),
+    'evaluate_forest': (case_evaluate_forest, 10_000_000, ROWS),
+    'convert_linear': (case_convert_linear, MODEL_TRAINING_ROWS, MODEL),
+    'convert_forest': (case_convert_forest, MODEL_TRAINING_ROWS, MODEL),
+    'build_neural_network': (case_build_neural_network, None, FIXED),
+    'save_linear': (case_save_linear, MODEL_TRAINING_ROWS, MODEL),
+    'save_forest': (case_save_forest, MODEL_TRAINING_ROWS, MODEL),
+    'save_neural_network': (case_save_neural_network, None, FIXED),
+    'infer_linear': (case_infer_linear, 10_000_000, ROWS),
+    'infer_forest': (case_infer_forest, 10_000_000, ROWS),
+    'infer_forest_gemm': (case_infer_forest_gemm, 1_000_000, ROWS),
+    'infer_neural_network': (case_infer_neural_network, 10_000_000, ROWS)
+}
+
+def time_thunk(thunk, warmup=1, repeats=5, budget=30.0):
+    """Median/min/max wall time of thunk()
+
+    Stops repeating early once the measured runs exceed budget seconds, but
+    always records at least one run.
+    """
+    for _ in range(warmup):
+        thunk()
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        thunk()
+        times.append(time.perf_counter() - started)
+        if sum(times) > budget:
+            break
+    return {'median': statistics.median(times), 'min': min(times), 'max': max(times), 'repeats': len(times)}
+
+def environment():
+    """Versions and machine details recorded with each run"""
+    import sklearn
+    info = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+    try:
+        import coremltools
+        info['coremltools'] = coremltools.__version__
+    except ImportError:
+        pass
+    try:
+        info['commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+def run_benchmarks(sizes, cases, warmup=1, repeats=5, budget=30.0, max_rows=None, log=print):
+    """Time each case at each size, returning {case: {size label: timing}}"""
+    max_rows = max_rows or {}
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for i, n in enumerate(sizes):
+            workload = Workload(n, scratch)
+            for name in cases:
+                setup, limit, kind = CASES[name]
+                limit = max_rows.get(name, limit)
+                if kind == FIXED and i > 0:
+                    continue
+                if limit is not None and n > limit:
+                    log(f"  {name:<24} {format_size(n):>6}  skipped (above {format_size(limit)} rows)")
+                    continue
+                timing = time_thunk(setup(workload), warmup, repeats, budget)
+                label = 'fixed' if kind == FIXED else format_size(n)
+                if kind == ROWS:
+                    timing['rows_per_second'] = n / timing['median'] if timing['median'] else None
+                results.setdefault(name, {})[label] = timing
+                log(f"  {name:<24} {label:>6}  {timing['median'] * 1000:>10.2f} ms median of {timing['repeats']}")
+    return results
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def append_history(path, run):
+    history = load_history(path)
+    history.append(run)
+    build_jubilee_model.write_atomic(path, json.dumps(history, indent=2).encode('utf-8'))
+    return len(history) - 1
+
+def compare_runs(baseline, current, threshold=0.10, min_seconds=1e-3):
+    """Rows of (case, size, baseline median, current median, ratio, regressed)
+
+    A case regresses when its median grows by more than threshold; timings
+    below min_seconds in both runs are too noisy to flag.
+    """
+    rows = []
+    for name, sizes in current['results'].items():
+        for label, timing in sizes.items():
+            base = baseline['results'].get(name, {}).get(label)
+            if base is None:
+                continue
+            ratio = timing['median'] / base['median'] if base['median'] else float('inf')
+            noisy = timing['median'] < min_seconds and base['median'] < min_seconds
+            rows.append((name, label, base['median'], timing['median'], ratio, ratio > 1 + threshold and not noisy))
+    return rows
+
+def select_run(history, selector):
+    """A run by index (negative from the end) or by commit prefix"""
+    try:
+        return history[int(selector)]
+    except ValueError:
+        for run in reversed(history):
+            if run['environment'].get('commit', '').startswith(selector):
+                return run
+    raise LookupError(f"No run matching {selector!r}")
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks and append the results to the history')
+    run_parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Comma-separated sample sizes, up to 10M (default: {DEFAULT_SIZES})')
+    run_parser.add_argument('--cases', help='Comma-separated cases to run (default: all)')
+    run_parser.add_argument('--warmup', type=int, default=1, help='Untimed runs before measuring')
+    run_parser.add_argument('--repeats', type=int, default=5, help='Timed runs per case and size')
+    run_parser.add_argument('--budget', type=float, default=30.0, help='Stop repeating a case after this many seconds')
+    run_parser.add_argument('--max-rows', action='append', default=[], metavar='CASE=SIZE',
+                            help='Raise or lower the largest size a case runs at, e.g. fit_forest_jubilee=1M')
+    run_parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON history file')
+    run_parser.add_argument('--label', help='Note stored with the run')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two runs from the history')
+    compare_parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON history file')
+    compare_parser.add_argument('--baseline', default='-2', help='Run index or commit prefix (default: previous run)')
+    compare_parser.add_argument('--current', default='-1', help='Run index or commit prefix (default: latest run)')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help='Flag slowdowns beyond this fraction')
+    compare_parser.add_argument('--min-seconds', type=float, default=1e-3, help='Ignore timings faster than this')
+
+    subparsers.add_parser('list', help='List the available cases')
+
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name, (_, limit, kind) in CASES.items():
+            if kind == FIXED:
+                print(f"{name:<24} size independent")
+            else:
+                per = 'rows' if kind == ROWS else f"rows (model trained on up to {format_size(MODEL_TRAINING_ROWS)})"
+                print(f"{name:<24} up to {format_size(limit)} {per}")
+        sys.exit(0)
+
+    if args.command == 'run':
+        sizes = [parse_size(size) for size in args.sizes.split(',')]
+        cases = args.cases.split(',') if args.cases else list(CASES)
+        unknown = [name for name in cases if name not in CASES]
+        if unknown:
+            parser.error(f"Unknown cases: {', '.join(unknown)}")
+        max_rows = {}
+        for setting in args.max_rows:
+            name, _, size = setting.partition('=')
+            max_rows[name] = parse_size(size)
+
+        print(f"Benchmarking {len(cases)} cases at {', '.join(format_size(n) for n in sizes)} rows")
+        results = run_benchmarks(sizes, cases, args.warmup, args.repeats, args.budget, max_rows)
+        run = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'label': args.label,
+            'environment': environment(),
+            'settings': {'sizes': sizes, 'warmup': args.warmup, 'repeats': args.repeats, 'budget': args.budget},
+            'results': results
+        }
+        index = append_history(args.history, run)
+        print(f"\nRun {index} appended to {args.history}")
+        sys.exit(0)
+
+    history = load_history(args.history)
+    try:
+        baseline, current = select_run(history, args.baseline), select_run(history, args.current)
+    except (LookupError, IndexError) as e:
+        sys.exit(f"Cannot compare: {e}")
+
+    rows = compare_runs(baseline, current, args.threshold, args.min_seconds)
+    print(f"{'Case':<24} {'Size':>6} {'Baseline ms':>12} {'Current ms':>12} {'Change':>8}")
+    for name, label, base, now, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<24} {label:>6} {base * 1000:>12.2f} {now * 1000:>12.2f} {ratio - 1:>+8.1%}{flag}")
+
+    regressions = [row for row in rows if row[-1]]
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
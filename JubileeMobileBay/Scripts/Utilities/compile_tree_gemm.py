@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+GEMM compilation of JubileePredictor forests into neural networks
+Turns a fitted scikit-learn forest or a treeEnsembleRegressor spec into
+matrix form -- feature-to-split matrix, threshold compare, leaf-path
+matrix and leaf values -- and emits it as a batched neuralNetwork spec,
+which Core ML can schedule on the GPU or Neural Engine. A NumPy evaluator
+of the matrix form checks it against the trees, and the forms are
+benchmarked for batch scoring
+
+The path matrices are dense (splits x leaves per block), so only
+depth-limited forests fit MAX_TREE_MATRIX_ENTRIES: the unbounded
+train_jubilee_model forest needs some 10^10 entries. Without a model the
+script trains on train_jubilee_model's synthetic data, either a 20-tree
+depth-5 jubileeProbability forest (the size create_basic_model uses) or
+the 100-trees-per-target jubilee forest cut to JUBILEE_GEMM_MAX_DEPTH
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import reference_evaluator
+from export_batched_model import GEMM_CHUNK_ROWS, BatchedModelBuilder, gemm_predict, output_layout, tree_gemm_blocks
+
+# Deepest 100-trees-per-target jubilee forest whose GEMM form stays within
+# MAX_TREE_MATRIX_ENTRIES (depth 8: ~42M entries; depth 10: ~152M)
+JUBILEE_GEMM_MAX_DEPTH = 8
+
+class ForestArrays(reference_evaluator.CompiledTreeEnsemble):
+    """CompiledTreeEnsemble node arrays read from scikit-learn trees
+
+    estimators is a list of (tree regressor, first output column, scale);
+    each forest passes 1 / its number of trees as the scale, so summing
+    every tree gives the forest averages side by side. cover holds the
+    training weight reaching each node, as TreeSHAP needs.
+    """
+
+    def __init__(self, estimators, n_outputs):
+        tree_ids, feature, threshold, true_child, false_child, is_leaf, values, cover = [], [], [], [], [], [], [], []
+        offset = 0
+        for tree_id, (estimator, column, scale) in enumerate(estimators):
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            tree_ids.append(np.full(n, tree_id, np.int64))
+            feature.append(np.where(leaf, 0, tree.feature).astype(np.int64))
+            threshold.append(np.where(leaf, 0.0, tree.threshold))
+            # scikit-learn sends x <= threshold to the left child
+            true_child.append(np.where(leaf, np.arange(n), tree.children_left) + offset)
+            false_child.append(np.where(leaf, np.arange(n), tree.children_right) + offset)
+            is_leaf.append(leaf)
+            value = np.zeros((n, n_outputs))
+            tree_values = tree.value[:, :, 0]
+            value[:, column:column + tree_values.shape[1]] = np.where(leaf[:, None], tree_values * scale, 0.0)
+            values.append(value)
+            cover.append(tree.weighted_n_node_samples)
+            offset += n
+
+        self.tree_ids = np.concatenate(tree_ids)
+        self.feature = np.concatenate(feature)
+        self.threshold = np.concatenate(threshold)
+        self.true_child = np.concatenate(true_child)
+        self.false_child = np.concatenate(false_child)
+        self.is_leaf = np.concatenate(is_leaf)
+        self.behavior = np.where(self.is_leaf, 6, 0)  # BranchOnValueLessThanEqual, LeafNode
+        self.leaf_values = np.concatenate(values)
+        self.cover = np.concatenate(cover)
+        self.roots = np.flatnonzero(np.diff(self.tree_ids, prepend=-1))
+        self.base = np.zeros(n_outputs)
+
+def forest_arrays(model):
+    """ForestArrays for a RandomForestRegressor, a MultiOutputRegressor of forests or a list of forests"""
+    if isinstance(model, (list, tuple)):
+        forests = model
+    elif all(hasattr(estimator, 'estimators_') for estimator in model.estimators_):
+        forests = model.estimators_  # MultiOutputRegressor: one forest per target
+    else:
+        forests = [model]
+
+    estimators, column = [], 0
+    for forest in forests:
+        width = getattr(forest, 'n_outputs_', 1)
+        estimators.extend((tree, column, 1.0 / len(forest.estimators_)) for tree in forest.estimators_)
+        column += width
+    return ForestArrays(estimators, column)
+
+def compile_trees(trees, input_names, output_names, max_block_entries=None):
+    """(spec, blocks, base, strict) for flat tree arrays: a batched neuralNetwork and its matrices"""
+    from coremltools.models.neural_network import flexible_shape_utils
+
+    from export_batched_model import BATCH_INPUT, BATCH_OUTPUT, MAX_TREE_BLOCK_ENTRIES
+
+    blocks, base, strict = tree_gemm_blocks(trees, len(input_names), max_block_entries or MAX_TREE_BLOCK_ENTRIES)
+    model = BatchedModelBuilder(input_names, len(output_names))
+    output = model.add_tree_blocks(blocks, base, strict, BATCH_INPUT)
+    final = model.builder.nn_spec.layers[-1]
+    if final.output[0] != output:
+        raise ValueError("Tree values are not produced by the last layer")
+    final.output[0] = BATCH_OUTPUT
+
+    spec = model.builder.spec
+    flexible_shape_utils.set_multiarray_ndshape_range(
+        spec, BATCH_INPUT, lower_bounds=[1, len(input_names)], upper_bounds=[-1, len(input_names)]
+    )
+    spec.description.metadata.userDefined['inputLayout'] = ','.join(input_names)
+    spec.description.metadata.userDefined['outputLayout'] = ','.join(output_names)
+    spec.description.input[0].shortDescription = f"Input rows of [{', '.join(input_names)}]"
+    spec.description.output[0].shortDescription = f"Prediction rows of [{', '.join(output_names)}]"
+    return spec, blocks, base, strict
+
+def gemm_cost(blocks):
+    """Matrix entries and multiply-adds per row of the GEMM form"""
+    entries = sum(A.size + C.size + V.size for A, B, C, D, V in blocks)
+    return {
+        'blocks': len(blocks),
+        'split_nodes': sum(len(B) for A, B, C, D, V in blocks),
+        'leaves': sum(len(D) for A, B, C, D, V in blocks),
+        'matrix_entries': entries,
+        'multiply_adds': entries
+    }
+
+def rows_per_second(function, X, repeats=3):
+    """Best of repeats, in rows per second"""
+    best = np.inf
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function(X)
+        best = min(best, time.perf_counter() - started)
+    return len(X) / best
+
+if __name__ == "__main__":
+    import argparse
+
+    from build_jubilee_model import FEATURES, TARGETS
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('model', nargs='?', help='treeEnsembleRegressor .mlmodel to compile (default: train a forest)')
+    parser.add_argument('--forest', choices=['basic', 'jubilee'], default='basic',
+                        help='Forest to train on train_jubilee_model data: 20 trees of depth 5 on '
+                             'jubileeProbability (basic) or 100 trees per target (jubilee)')
+    parser.add_argument('--max-depth', type=int,
+                        help='Depth limit of the trained forest (default: 5 for basic, '
+                             f'{JUBILEE_GEMM_MAX_DEPTH} for jubilee; dense GEMM only covers depth-limited forests)')
+    parser.add_argument('-n', '--samples', type=int, default=20000, help='Rows of training data')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows scored by the benchmark')
+    parser.add_argument('--block-entries', type=int, help='Largest path matrix per block')
+    parser.add_argument('-o', '--output', default='JubileePredictorGemm.mlmodel', help='Where to write the network')
+    args = parser.parse_args()
+
+    X = reference_evaluator.random_rows(args.rows)
+    forms = {}
+    if args.model:
+        source = reference_evaluator.load_spec(args.model)
+        trees = reference_evaluator.compiled_tree_ensemble(source.treeEnsembleRegressor.treeEnsemble)
+        input_names, output_names = [f.name for f in source.description.input], output_layout(source)
+        forms['tree ensemble spec'] = lambda rows: reference_evaluator.predict_batch(source, rows)
+    else:
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.multioutput import MultiOutputRegressor
+
+        from train_jubilee_model import generate_training_data
+
+        data = generate_training_data(n_samples=args.samples, seed=42)
+        if args.forest == 'basic':
+            forest = RandomForestRegressor(n_estimators=20, max_depth=args.max_depth or 5, random_state=42)
+            forest.fit(data[FEATURES].values, data['jubileeProbability'].values)
+            output_names = ['jubileeProbability']
+        else:
+            forest = MultiOutputRegressor(
+                RandomForestRegressor(n_estimators=100, max_depth=args.max_depth or JUBILEE_GEMM_MAX_DEPTH,
+                                      random_state=42, n_jobs=-1)
+            )
+            forest.fit(data[FEATURES].values, data[TARGETS].values)
+            output_names = TARGETS
+        trees, input_names = forest_arrays(forest), FEATURES
+        forms['scikit-learn'] = lambda rows: forest.predict(rows).reshape(len(rows), -1)
+        forms['tree arrays (NumPy)'] = lambda rows: trees.predict(rows)
+
+    try:
+        spec, blocks, base, strict = compile_trees(trees, input_names, output_names, args.block_entries)
+    except ValueError as e:
+        sys.exit(f"Cannot compile: {e}")
+    cost = gemm_cost(blocks)
+    forms['GEMM (NumPy)'] = lambda rows: gemm_predict(blocks, base, strict, rows)
+    forms['GEMM neuralNetwork spec'] = lambda rows: np.vstack([
+        reference_evaluator.predict_batch(spec, rows[start:start + GEMM_CHUNK_ROWS])
+        for start in range(0, len(rows), GEMM_CHUNK_ROWS)
+    ])
+
+    print(f"{len(trees.roots)} trees -> {cost['blocks']} blocks, {cost['split_nodes']:,} splits, "
+          f"{cost['leaves']:,} leaves, {cost['matrix_entries']:,} matrix entries "
+          f"({cost['multiply_adds']:,} multiply-adds per row)")
+
+    # Equivalence: rows exact in float32, since scikit-learn compares float32 copies of the inputs
+    X = X.astype(np.float32).astype(np.float64)
+    reference_name, reference = next(iter(forms.items()))
+    expected = reference(X)
+    print(f"\nMax difference vs {reference_name} on {len(X):,} rows:")
+    for name, function in list(forms.items())[1:]:
+        print(f"  {name:<26} {np.abs(function(X) - expected).max():.3g}")
+
+    print(f"\n{'Form':<28} {'Rows/s':>12}")
+    for name, function in forms.items():
+        print(f"{name:<28} {rows_per_second(function, X):>12,.0f}")
+
+    with open(args.output, 'wb') as f:
+        f.write(spec.SerializeToString())
+    print(f"\nNetwork ({len(spec.neuralNetwork.layers)} layers) saved to: {args.output}")
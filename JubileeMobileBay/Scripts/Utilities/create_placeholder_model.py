@@ -12,16 +12,17 @@ def create_placeholder_model():
     """Create a simple neural network model for jubilee prediction"""
     
     # Define input and output features
+    # Neural networks take MultiArray features, so each scalar is a 1-element array
     input_features = [
-        ('airTemperature', ct.models.datatypes.Double(), 'Air temperature in Fahrenheit'),
-        ('waterTemperature', ct.models.datatypes.Double(), 'Water temperature in Fahrenheit'),
-        ('windSpeed', ct.models.datatypes.Double(), 'Wind speed in miles per hour'),
-        ('dissolvedOxygen', ct.models.datatypes.Double(), 'Dissolved oxygen in mg/L')
+        ('airTemperature', ct.models.datatypes.Array(1)),
+        ('waterTemperature', ct.models.datatypes.Array(1)),
+        ('windSpeed', ct.models.datatypes.Array(1)),
+        ('dissolvedOxygen', ct.models.datatypes.Array(1))
     ]
     
     output_features = [
-        ('jubileeProbability', ct.models.datatypes.Double(), 'Probability of jubilee event (0.0-1.0)'),
-        ('confidenceScore', ct.models.datatypes.Double(), 'Model confidence score (0.0-1.0)')
+        ('jubileeProbability', ct.models.datatypes.Array(1)),
+        ('confidenceScore', ct.models.datatypes.Array(1))
     ]
     
     # Create a neural network builder
@@ -68,40 +69,44 @@ def create_placeholder_model():
     # Dissolved oxygen: 2-8 mg/L -> normalized to [-1, 1]
     
     # Add normalization layers for each input
-    builder.add_elementwise(
+    builder.add_activation(
         name='normalize_airTemp',
-        input_names=['airTemperature'],
+        non_linearity='LINEAR',
+        input_name='airTemperature',
         output_name='norm_airTemp',
-        mode='LINEAR',
-        alpha=(2.0 / 30.0),  # scale factor
-        beta=-80.0 * (2.0 / 30.0)  # offset to center at 80°F
+        params=[(2.0 / 30.0), -80.0 * (2.0 / 30.0)]  # scale factor, offset to center at 80°F
     )
     
-    builder.add_elementwise(
+    builder.add_activation(
         name='normalize_waterTemp',
-        input_names=['waterTemperature'],
+        non_linearity='LINEAR',
+        input_name='waterTemperature',
         output_name='norm_waterTemp',
-        mode='LINEAR',
-        alpha=(2.0 / 18.0),  # scale factor
-        beta=-79.0 * (2.0 / 18.0)  # offset to center at 79°F
+        params=[(2.0 / 18.0), -79.0 * (2.0 / 18.0)]  # scale factor, offset to center at 79°F
     )
     
-    builder.add_elementwise(
+    builder.add_activation(
         name='normalize_windSpeed',
-        input_names=['windSpeed'],
+        non_linearity='LINEAR',
+        input_name='windSpeed',
         output_name='norm_windSpeed',
-        mode='LINEAR',
-        alpha=(2.0 / 25.0),  # scale factor
-        beta=-12.5 * (2.0 / 25.0)  # offset to center at 12.5 mph
+        params=[(2.0 / 25.0), -12.5 * (2.0 / 25.0)]  # scale factor, offset to center at 12.5 mph
     )
     
-    builder.add_elementwise(
+    builder.add_activation(
         name='normalize_dissolvedOxygen',
-        input_names=['dissolvedOxygen'],
+        non_linearity='LINEAR',
+        input_name='dissolvedOxygen',
         output_name='norm_dissolvedOxygen',
-        mode='LINEAR',
-        alpha=(2.0 / 6.0),  # scale factor
-        beta=-5.0 * (2.0 / 6.0)  # offset to center at 5 mg/L
+        params=[(2.0 / 6.0), -5.0 * (2.0 / 6.0)]  # scale factor, offset to center at 5 mg/L
+    )
+    
+    # Combine the normalized inputs into one feature vector
+    builder.add_concat_nd(
+        name='combine_inputs',
+        input_names=['norm_airTemp', 'norm_waterTemp', 'norm_windSpeed', 'norm_dissolvedOxygen'],
+        output_name='norm_inputs',
+        axis=0
     )
     
     # Add hidden layer
@@ -112,7 +117,7 @@ def create_placeholder_model():
         input_channels=4,
         output_channels=8,
         has_bias=True,
-        input_name=['norm_airTemp', 'norm_waterTemp', 'norm_windSpeed', 'norm_dissolvedOxygen'],
+        input_name='norm_inputs',
         output_name='hidden_activation'
     )
     
@@ -150,7 +155,7 @@ def create_placeholder_model():
         name='extract_probability',
         input_name='sigmoid_output',
         output_name='jubileeProbability',
-        axis='C',
+        axis='channel',
         start_index=0,
         end_index=1
     )
@@ -160,7 +165,7 @@ def create_placeholder_model():
         name='extract_confidence',
         input_name='sigmoid_output',
         output_name='confidenceScore',
-        axis='C',
+        axis='channel',
         start_index=1,
         end_index=2
     )
@@ -174,6 +179,15 @@ def create_placeholder_model():
     model.version = '1.0.0'
     model.license = 'MIT'
     
+    # Set feature descriptions
+    spec = model._spec
+    spec.description.input[0].shortDescription = 'Air temperature in Fahrenheit'
+    spec.description.input[1].shortDescription = 'Water temperature in Fahrenheit'
+    spec.description.input[2].shortDescription = 'Wind speed in miles per hour'
+    spec.description.input[3].shortDescription = 'Dissolved oxygen in mg/L'
+    spec.description.output[0].shortDescription = 'Probability of jubilee event (0.0-1.0)'
+    spec.description.output[1].shortDescription = 'Model confidence score (0.0-1.0)'
+    
     return model
 
 if __name__ == "__main__":
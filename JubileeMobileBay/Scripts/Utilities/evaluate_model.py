@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Chunked evaluation engine for JubileePredictor models
+Streams a holdout set through a model in fixed-size chunks and keeps only
+running sums: MSE, MAE and R² per target, the Brier score and a binned
+reliability curve for jubileeProbability, and confusion counts over the
+app's RecommendationLevel buckets. Memory stays flat whatever the number
+of rows
+"""
+
+import numpy as np
+
+TARGETS = ['jubileeProbability', 'confidenceScore']
+PROBABILITY = 'jubileeProbability'
+DEFAULT_CHUNK_ROWS = 65536
+
+# JubileePrediction.recommendationLevel buckets, lowest first
+RECOMMENDATION_LEVELS = ['unlikely', 'poor', 'moderate', 'good', 'excellent']
+LEVEL_EDGES = [0.2, 0.4, 0.6, 0.8]
+
+def recommendation_levels(probability):
+    """Index into RECOMMENDATION_LEVELS of each probability, bucketed as the app does"""
+    probability = np.asarray(probability, dtype=np.float64)
+    levels = np.searchsorted(LEVEL_EDGES, probability, side='right')
+    # The Swift switch only matches 0.0...1.0; anything else, NaN included, is .unlikely
+    return np.where((probability >= 0.0) & (probability <= 1.0), levels, 0)
+
+class RunningRegression:
+    """MSE, MAE and R² per column from running sums
+
+    The target mean and sum of squares are merged chunk by chunk with Chan's
+    parallel update, so R² stays accurate on very large holdouts.
+    """
+
+    def __init__(self, n_columns):
+        self.n = 0
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.squared_error = np.zeros(n_columns)
+        self.absolute_error = np.zeros(n_columns)
+
+    def update(self, y_true, y_pred):
+        count = len(y_true)
+        if not count:
+            return
+        error = y_pred - y_true
+        self.squared_error += np.einsum('ij,ij->j', error, error)
+        self.absolute_error += np.abs(error).sum(axis=0)
+
+        chunk_mean = y_true.mean(axis=0)
+        centered = y_true - chunk_mean
+        chunk_m2 = np.einsum('ij,ij->j', centered, centered)
+        total = self.n + count
+        delta = chunk_mean - self.mean
+        self.m2 += chunk_m2 + delta * delta * self.n * count / total
+        self.mean += delta * count / total
+        self.n = total
+
+    def result(self, names):
+        metrics = {}
+        for i, name in enumerate(names):
+            mse = self.squared_error[i] / self.n if self.n else float('nan')
+            metrics[name] = {
+                'mse': float(mse),
+                'rmse': float(np.sqrt(mse)),
+                'mae': float(self.absolute_error[i] / self.n) if self.n else float('nan'),
+                'r2': float(1.0 - self.squared_error[i] / self.m2[i]) if self.m2[i] > 0 else float('nan')
+            }
+        return metrics
+
+class RunningCalibration:
+    """Brier score and an equal-width reliability curve for predicted probabilities
+
+    Outcomes may be 0/1 events or observed probabilities; with the latter the
+    Brier score is the mean squared error against them.
+    """
+
+    def __init__(self, n_bins=10):
+        self.n_bins = n_bins
+        self.n = 0
+        self.brier = 0.0
+        self.counts = np.zeros(n_bins, np.int64)
+        self.predicted = np.zeros(n_bins)
+        self.observed = np.zeros(n_bins)
+
+    def update(self, probability, outcome):
+        probability = np.clip(probability, 0.0, 1.0)
+        bins = np.minimum((probability * self.n_bins).astype(np.int64), self.n_bins - 1)
+        self.n += len(probability)
+        self.brier += float(np.sum((probability - outcome) ** 2))
+        self.counts += np.bincount(bins, minlength=self.n_bins)
+        self.predicted += np.bincount(bins, weights=probability, minlength=self.n_bins)
+        self.observed += np.bincount(bins, weights=outcome, minlength=self.n_bins)
+
+    def result(self):
+        filled = self.counts > 0
+        mean_predicted = np.divide(self.predicted, self.counts, out=np.zeros(self.n_bins), where=filled)
+        mean_observed = np.divide(self.observed, self.counts, out=np.zeros(self.n_bins), where=filled)
+        gap = np.abs(mean_predicted - mean_observed)
+        return {
+            'brier': self.brier / self.n if self.n else float('nan'),
+            'expected_calibration_error': float(np.sum(gap * self.counts) / self.n) if self.n else float('nan'),
+            'max_calibration_error': float(gap[filled].max()) if filled.any() else float('nan'),
+            'reliability': [
+                {
+                    'bin': [i / self.n_bins, (i + 1) / self.n_bins],
+                    'count': int(self.counts[i]),
+                    'mean_predicted': float(mean_predicted[i]) if filled[i] else None,
+                    'mean_observed': float(mean_observed[i]) if filled[i] else None
+                }
+                for i in range(self.n_bins)
+            ]
+        }
+
+class LevelConfusion:
+    """Counts of (actual, predicted) RecommendationLevel pairs"""
+
+    def __init__(self):
+        self.counts = np.zeros((len(RECOMMENDATION_LEVELS), len(RECOMMENDATION_LEVELS)), np.int64)
+
+    def update(self, actual_probability, predicted_probability):
+        size = len(RECOMMENDATION_LEVELS)
+        pairs = recommendation_levels(actual_probability) * size + recommendation_levels(predicted_probability)
+        self.counts += np.bincount(pairs, minlength=size * size).reshape(size, size)
+
+    def result(self):
+        total = int(self.counts.sum())
+        actual = self.counts.sum(axis=1)
+        predicted = self.counts.sum(axis=0)
+        diagonal = np.diag(self.counts)
+        return {
+            'levels': RECOMMENDATION_LEVELS,
+            'counts': self.counts.tolist(),
+            'accuracy': float(diagonal.sum() / total) if total else float('nan'),
+            'per_level': {
+                level: {
+                    'support': int(actual[i]),
+                    'predicted': int(predicted[i]),
+                    'precision': float(diagonal[i] / predicted[i]) if predicted[i] else None,
+                    'recall': float(diagonal[i] / actual[i]) if actual[i] else None
+                }
+                for i, level in enumerate(RECOMMENDATION_LEVELS)
+            }
+        }
+
+class EvaluationEngine:
+    """Accumulates every metric over (y_true, y_pred) chunks whose columns are `targets`"""
+
+    def __init__(self, targets=TARGETS, n_bins=10):
+        self.targets = list(targets)
+        self.regression = RunningRegression(len(self.targets))
+        self.probability = self.targets.index(PROBABILITY) if PROBABILITY in self.targets else None
+        self.calibration = RunningCalibration(n_bins) if self.probability is not None else None
+        self.confusion = LevelConfusion() if self.probability is not None else None
+
+    def update(self, y_true, y_pred, outcome=None):
+        """Add one chunk; outcome overrides the observed jubileeProbability for calibration (e.g. 0/1 events)"""
+        y_true = np.asarray(y_true, dtype=np.float64).reshape(len(y_true), -1)
+        y_pred = np.asarray(y_pred, dtype=np.float64).reshape(len(y_pred), -1)
+        self.regression.update(y_true, y_pred)
+        if self.probability is not None:
+            actual = y_true[:, self.probability]
+            predicted = y_pred[:, self.probability]
+            self.calibration.update(predicted, actual if outcome is None else np.asarray(outcome, dtype=np.float64))
+            self.confusion.update(actual, predicted)
+
+    def report(self):
+        report = {'rows': self.regression.n, 'targets': self.regression.result(self.targets)}
+        if self.probability is not None:
+            report['calibration'] = self.calibration.result()
+            report['recommendation_levels'] = self.confusion.result()
+        return report
+
+def evaluate(predict, chunks, targets=TARGETS, n_bins=10, events_seed=None):
+    """Stream (X, y) chunks through predict(X) -> (rows, len(targets)) and return the report
+
+    y holds the observed targets in TARGETS order. With events_seed, 0/1
+    jubilee events are drawn from the observed probability and used as the
+    calibration outcomes, as a real holdout of recorded events would be.
+    """
+    engine = EvaluationEngine(targets, n_bins)
+    columns = [TARGETS.index(target) for target in engine.targets]
+    rng = np.random.default_rng(events_seed) if events_seed is not None else None
+    for X, y in chunks:
+        y = np.asarray(y, dtype=np.float64)[:, columns]
+        outcome = None
+        if rng is not None and engine.probability is not None:
+            outcome = (rng.random(len(y)) < y[:, engine.probability]).astype(np.float64)
+        engine.update(y, predict(X), outcome)
+    return engine.report()
+
+# Chunk sources
+
+def array_chunks(X, y, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Views of in-memory arrays, chunk_rows at a time"""
+    for start in range(0, len(X), chunk_rows):
+        yield X[start:start + chunk_rows], y[start:start + chunk_rows]
+
+def synthetic_chunks(n_rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=1234):
+    """A synthetic holdout generated chunk by chunk (chunk i uses seed + i)"""
+    from train_jubilee_model import generate_training_data
+    from build_jubilee_model import FEATURES
+
+    for i, start in enumerate(range(0, n_rows, chunk_rows)):
+        data = generate_training_data(n_samples=min(chunk_rows, n_rows - start), seed=seed + i)
+        yield data[FEATURES].values, data[TARGETS].values
+
+def csv_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Rows of a CSV with feature and target columns, such as `jubilee_cli.py generate` writes"""
+    import pandas as pd
+    from build_jubilee_model import FEATURES
+
+    for data in pd.read_csv(path, chunksize=chunk_rows):
+        yield data[FEATURES].values, data[TARGETS].values
+
+def spec_predictor(spec):
+    """(predict, targets) for a Core ML spec evaluated with the reference evaluator"""
+    import reference_evaluator
+    from export_batched_model import output_layout
+
+    layout = output_layout(spec)
+    targets = [name for name in TARGETS if name in layout]
+    if not targets:
+        raise ValueError(f"Model outputs {', '.join(layout)} include none of {', '.join(TARGETS)}")
+    columns = [layout.index(name) for name in targets]
+    return (lambda X: reference_evaluator.predict_batch(spec, X)[:, columns]), targets
+
+# Output
+
+def print_report(report):
+    print(f"Rows evaluated: {report['rows']:,}")
+    for target, metrics in report['targets'].items():
+        print(f"\n{target}:")
+        print(f"  MSE: {metrics['mse']:.4f}")
+        print(f"  RMSE: {metrics['rmse']:.4f}")
+        print(f"  MAE: {metrics['mae']:.4f}")
+        print(f"  R² Score: {metrics['r2']:.4f}")
+
+    if 'calibration' not in report:
+        return
+    calibration = report['calibration']
+    print(f"\nCalibration ({PROBABILITY}):")
+    print(f"  Brier score: {calibration['brier']:.4f}")
+    print(f"  Expected calibration error: {calibration['expected_calibration_error']:.4f}")
+    print(f"  Max calibration error: {calibration['max_calibration_error']:.4f}")
+    print(f"  {'Bin':<11} {'Rows':>10} {'Predicted':>10} {'Observed':>10}")
+    for entry in calibration['reliability']:
+        if entry['count']:
+            low, high = entry['bin']
+            print(f"  {low:.2f}-{high:.2f}  {entry['count']:>10,} {entry['mean_predicted']:>10.3f} {entry['mean_observed']:>10.3f}")
+
+    levels = report['recommendation_levels']
+    print(f"\nRecommendationLevel accuracy: {levels['accuracy']:.1%}")
+    print(f"  {'actual / predicted':<20}" + ''.join(f"{level:>11}" for level in levels['levels']) + f"{'recall':>9}")
+    for level, row in zip(levels['levels'], levels['counts']):
+        recall = levels['per_level'][level]['recall']
+        print(f"  {level:<20}" + ''.join(f"{count:>11,}" for count in row)
+              + (f"{recall:>9.1%}" if recall is not None else f"{'-':>9}"))
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('model', nargs='?', default='JubileePredictor.mlmodel', help='Model to evaluate')
+    parser.add_argument('--csv', help='Holdout CSV (default: a synthetic holdout)')
+    parser.add_argument('-n', '--rows', type=int, default=100_000, help='Rows of synthetic holdout')
+    parser.add_argument('--seed', type=int, default=1234, help='Seed of the synthetic holdout')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Rows evaluated at a time')
+    parser.add_argument('--bins', type=int, default=10, help='Reliability curve bins')
+    parser.add_argument('--events', type=int, metavar='SEED',
+                        help='Calibrate against 0/1 events drawn from the observed probability')
+    parser.add_argument('--json', help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    import reference_evaluator
+
+    predict, targets = spec_predictor(reference_evaluator.load_spec(args.model))
+    if args.csv:
+        chunks = csv_chunks(args.csv, args.chunk_rows)
+    else:
+        chunks = synthetic_chunks(args.rows, args.chunk_rows, args.seed)
+    report = evaluate(predict, chunks, targets, args.bins, args.events)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.json}")
@@ -0,0 +1,794 @@
+#!/usr/bin/env python3
+"""
+Streaming inspector for .mlmodel files
+Reads a memory-mapped spec straight from the protobuf wire format and
+reports the model type, inputs, outputs, metadata, tree ensemble shape
+(per-tree node counts and depth histograms), neural network layers with
+parameter counts and the bytes taken by each component. Tree nodes are
+decoded in bulk with NumPy instead of one message at a time, and
+coremltools is never imported. Size limits make it usable as a CI check
+"""
+
+import mmap
+import os
+from collections import Counter
+
+from spec_wire import (
+    DESCRIPTION_INPUT, DESCRIPTION_METADATA, DESCRIPTION_OUTPUT, FEATURE_NAME, FEATURE_SHORT_DESCRIPTION,
+    METADATA_FIELDS, METADATA_USER_DEFINED, MODEL_DESCRIPTION, MODEL_SPECIFICATION_VERSION, WIRE_BYTES,
+    WIRE_FIXED32, WIRE_FIXED64, WIRE_VARINT, field_value, find_fields, iter_fields, read_string,
+    read_string_map, read_varint
+)
+
+# Model.Type oneof field numbers (Model.proto)
+MODEL_TYPES = {
+    200: 'pipelineClassifier', 201: 'pipelineRegressor', 202: 'pipeline',
+    300: 'glmRegressor', 301: 'supportVectorRegressor', 302: 'treeEnsembleRegressor',
+    303: 'neuralNetworkRegressor', 304: 'bayesianProbitRegressor',
+    400: 'glmClassifier', 401: 'supportVectorClassifier', 402: 'treeEnsembleClassifier',
+    403: 'neuralNetworkClassifier', 404: 'kNearestNeighborsClassifier',
+    500: 'neuralNetwork', 501: 'itemSimilarityRecommender', 502: 'mlProgram',
+    555: 'customModel', 556: 'linkedModel', 560: 'classConfidenceThresholding',
+    600: 'oneHotEncoder', 601: 'imputer', 602: 'featureVectorizer', 603: 'dictVectorizer',
+    604: 'scaler', 606: 'categoricalMapping', 607: 'normalizer', 609: 'arrayFeatureExtractor',
+    610: 'nonMaximumSuppression', 900: 'identity', 3000: 'serializedModel'
+}
+PIPELINE_TYPES = {'pipeline', 'pipelineRegressor', 'pipelineClassifier'}
+TREE_ENSEMBLE_TYPES = {'treeEnsembleRegressor', 'treeEnsembleClassifier'}
+NEURAL_NETWORK_TYPES = {'neuralNetwork', 'neuralNetworkRegressor', 'neuralNetworkClassifier'}
+
+# FeatureDescription.type and the FeatureType oneof
+FEATURE_TYPE = 3
+FEATURE_TYPES = {
+    1: 'int64', 2: 'double', 3: 'string', 4: 'image', 5: 'multiArray',
+    6: 'dictionary', 7: 'sequence', 8: 'state'
+}
+MULTIARRAY_SHAPE = 1
+MULTIARRAY_DATA_TYPE = 2
+ARRAY_DATA_TYPES = {65552: 'float16', 65568: 'float32', 65600: 'double', 131104: 'int32'}
+
+# Pipeline.models, and PipelineRegressor/PipelineClassifier.pipeline
+PIPELINE_MODELS = 1
+PIPELINE_MESSAGE = 1
+
+# TreeEnsembleRegressor/Classifier.treeEnsemble and TreeEnsembleParameters
+TREE_ENSEMBLE = 1
+ENSEMBLE_NODES = 1
+ENSEMBLE_DIMENSIONS = 2
+NODE_TAG = ENSEMBLE_NODES << 3 | WIRE_BYTES
+NODE_TREE_ID = 1
+NODE_ID = 2
+NODE_BEHAVIOR = 3
+NODE_FEATURE = 10
+NODE_TRUE_CHILD = 12
+NODE_FALSE_CHILD = 13
+LEAF_NODE = 6
+NODE_FIELDS = (NODE_TREE_ID, NODE_ID, NODE_BEHAVIOR, NODE_FEATURE, NODE_TRUE_CHILD, NODE_FALSE_CHILD)
+# Ensembles up to this many bytes are decoded one node at a time: importing
+# NumPy alone takes longer than that
+SMALL_ENSEMBLE_BYTES = 1 << 16
+
+# GLMRegressor: repeated DoubleArray weights (value = 1), repeated double offset
+GLM_WEIGHTS = 1
+GLM_OFFSET = 2
+
+# NeuralNetwork(Regressor/Classifier).layers and NeuralNetworkLayer
+NN_LAYERS = 1
+LAYER_NAME = 1
+LAYER_TYPES = {
+    100: 'convolution', 120: 'pooling', 130: 'activation', 140: 'innerProduct', 150: 'embedding',
+    160: 'batchnorm', 165: 'mvn', 170: 'l2normalize', 175: 'softmax', 180: 'lrn', 190: 'crop',
+    200: 'padding', 210: 'upsample', 211: 'resizeBilinear', 212: 'cropResize', 220: 'unary',
+    230: 'add', 231: 'multiply', 240: 'average', 245: 'scale', 250: 'bias', 260: 'max', 261: 'min',
+    270: 'dot', 280: 'reduce', 290: 'loadConstant', 300: 'reshape', 301: 'flatten', 310: 'permute',
+    320: 'concat', 330: 'split', 340: 'sequenceRepeat', 345: 'reorganizeData', 350: 'slice',
+    400: 'simpleRecurrent', 410: 'gru', 420: 'uniDirectionalLSTM', 430: 'biDirectionalLSTM',
+    500: 'custom', 600: 'copy', 605: 'branch', 615: 'loop', 620: 'loopBreak', 625: 'loopContinue',
+    635: 'rangeStatic', 640: 'rangeDynamic', 660: 'clip', 665: 'ceil', 670: 'floor', 680: 'sign',
+    685: 'round', 700: 'exp2', 710: 'sin', 715: 'cos', 720: 'tan', 730: 'asin', 735: 'acos',
+    740: 'atan', 750: 'sinh', 755: 'cosh', 760: 'tanh', 770: 'asinh', 775: 'acosh', 780: 'atanh',
+    790: 'erf', 795: 'gelu', 815: 'equal', 820: 'notEqual', 825: 'lessThan', 827: 'lessEqual',
+    830: 'greaterThan', 832: 'greaterEqual', 840: 'logicalOr', 845: 'logicalXor', 850: 'logicalNot',
+    855: 'logicalAnd', 865: 'modBroadcastable', 870: 'minBroadcastable', 875: 'maxBroadcastable',
+    880: 'addBroadcastable', 885: 'powBroadcastable', 890: 'divideBroadcastable',
+    895: 'floorDivBroadcastable', 900: 'multiplyBroadcastable', 905: 'subtractBroadcastable',
+    920: 'tile', 925: 'stack', 930: 'gather', 935: 'scatter', 940: 'gatherND', 945: 'scatterND',
+    950: 'softmaxND', 952: 'gatherAlongAxis', 954: 'scatterAlongAxis', 960: 'reverse',
+    965: 'reverseSeq', 975: 'splitND', 980: 'concatND', 985: 'transpose', 995: 'sliceStatic',
+    1000: 'sliceDynamic', 1005: 'slidingWindows', 1015: 'topK', 1020: 'argMin', 1025: 'argMax',
+    1040: 'embeddingND', 1045: 'batchedMatmul', 1065: 'getShape', 1070: 'loadConstantND',
+    1080: 'fillLike', 1085: 'fillStatic', 1090: 'fillDynamic', 1100: 'broadcastToLike',
+    1105: 'broadcastToStatic', 1110: 'broadcastToDynamic', 1120: 'squeeze', 1125: 'expandDims',
+    1130: 'flattenTo2D', 1135: 'reshapeLike', 1140: 'reshapeStatic', 1145: 'reshapeDynamic',
+    1150: 'rankPreservingReshape', 1155: 'constantPad', 1170: 'randomNormalLike',
+    1175: 'randomNormalStatic', 1180: 'randomNormalDynamic', 1190: 'randomUniformLike',
+    1195: 'randomUniformStatic', 1200: 'randomUniformDynamic', 1210: 'randomBernoulliLike',
+    1215: 'randomBernoulliStatic', 1220: 'randomBernoulliDynamic', 1230: 'categoricalDistribution',
+    1250: 'reduceL1', 1255: 'reduceL2', 1260: 'reduceMax', 1265: 'reduceMin', 1270: 'reduceSum',
+    1275: 'reduceProd', 1280: 'reduceMean', 1285: 'reduceLogSum', 1290: 'reduceSumSquare',
+    1295: 'reduceLogSumExp', 1313: 'whereNonZero', 1315: 'matrixBandPart', 1320: 'lowerTriangular',
+    1325: 'upperTriangular', 1330: 'whereBroadcastable', 1350: 'layerNormalization',
+    1400: 'NonMaximumSuppression', 1450: 'oneHot', 1455: 'cumSum', 1460: 'clampedReLU',
+    1461: 'argSort', 1465: 'pooling3d', 1466: 'globalPooling3d', 1470: 'sliceBySize',
+    1471: 'convolution3d'
+}
+
+# Field-number paths from each layer's params message to its WeightParams
+_LSTM_WEIGHTS = [(20, n) for n in (1, 2, 3, 4, 20, 21, 22, 23, 40, 41, 42, 43, 60, 61, 62)]
+LAYER_WEIGHTS = {
+    100: [(90,), (91,)], 130: [(25, 1), (71, 1), (71, 2)], 140: [(20,), (21,)], 150: [(20,), (21,)],
+    160: [(15,), (16,), (17,), (18,)], 245: [(2,), (5,)], 250: [(2,)], 290: [(2,)],
+    400: [(30,), (31,), (32,)], 410: [(n,) for n in (30, 31, 32, 50, 51, 52, 70, 71, 72)],
+    420: _LSTM_WEIGHTS, 430: _LSTM_WEIGHTS, 500: [(20,)], 1040: [(20,), (21,)], 1045: [(8,), (9,)],
+    1070: [(2,)], 1350: [(3,), (4,)], 1471: [(60,), (61,)]
+}
+
+# WeightParams and QuantizationParams
+WEIGHT_FLOAT = 1
+WEIGHT_FLOAT16 = 2
+WEIGHT_RAW = 30
+WEIGHT_INT8_RAW = 31
+WEIGHT_QUANTIZATION = 40
+QUANTIZATION_BITS = 1
+
+# Features and metadata
+
+def _packed_varints(data, fields):
+    values = []
+    for field in fields:
+        if field.wire_type == WIRE_BYTES:
+            value = field_value(data, field)
+            pos = 0
+            while pos < len(value):
+                number, pos = read_varint(value, pos)
+                values.append(number)
+        else:
+            values.append(field_value(data, field))
+    return values
+
+def feature_type_name(feature_type):
+    """Readable type of a serialized FeatureType, e.g. 'multiArray[2] double'"""
+    for field in iter_fields(feature_type):
+        name = FEATURE_TYPES.get(field.number)
+        if name is None:
+            continue
+        if name == 'multiArray':
+            params = field_value(feature_type, field)
+            shape = _packed_varints(params, find_fields(params, MULTIARRAY_SHAPE))
+            data_type = find_fields(params, MULTIARRAY_DATA_TYPE)
+            dtype = ARRAY_DATA_TYPES.get(field_value(params, data_type[-1]), 'unknown') if data_type else 'unknown'
+            return f"multiArray[{', '.join(map(str, shape)) or '?'}] {dtype}"
+        return name
+    return 'unknown'
+
+def describe_features(description, number):
+    """(name, type, shortDescription) of each input or output feature"""
+    features = []
+    for field in find_fields(description, number):
+        feature = field_value(description, field)
+        type_fields = find_fields(feature, FEATURE_TYPE)
+        features.append((
+            read_string(feature, FEATURE_NAME),
+            feature_type_name(field_value(feature, type_fields[-1])) if type_fields else 'unknown',
+            read_string(feature, FEATURE_SHORT_DESCRIPTION)
+        ))
+    return features
+
+# Tree ensembles
+
+def _decode_varints(buf, positions):
+    """Decode the varint at every offset in positions: (values, offsets just past each varint)"""
+    import numpy as np
+
+    last = len(buf) - 1
+    values = buf[np.minimum(positions, last)].astype(np.int64)
+    after = positions + 1
+    more = np.flatnonzero(values >= 0x80)
+    values[more] &= 0x7F
+    shift = 7
+    while len(more) and shift < 70:
+        byte = buf[np.minimum(after[more], last)].astype(np.int64)
+        values[more] |= (byte & 0x7F) << shift
+        after[more] += 1
+        more = more[byte >= 0x80]
+        shift += 7
+    return values, after
+
+def _field_run(buf, start, end, tag):
+    """Locate a run of consecutive length-delimited fields with a one-byte tag
+
+    Every byte equal to tag is a candidate field start, linked to the offset
+    just past its payload. The true fields form the chain of links from
+    start, found by pointer doubling over the candidates (each round doubles
+    the number of links followed), so no per-field Python loop is needed.
+    Returns (payload starts, payload ends, offset after the run).
+    """
+    import numpy as np
+
+    candidates = start + np.flatnonzero(buf[start:end] == tag)
+    length, payload = _decode_varints(buf, candidates + 1)
+    following = payload + length
+    n = len(candidates)
+    index = np.minimum(np.searchsorted(candidates, following), n - 1)
+    linked = (following < end) & (following >= payload) & (candidates[index] == following)
+    jump = np.append(np.where(linked, index, n), n)
+
+    on_chain = np.zeros(n + 1, bool)
+    on_chain[0] = True
+    count = 1
+    while True:
+        on_chain[jump[on_chain]] = True
+        new_count = int(on_chain[:n].sum())
+        if new_count == count:
+            break
+        count = new_count
+        jump = jump[jump]
+
+    chain = np.flatnonzero(on_chain[:n])
+    run_end = int(following[chain[-1]])
+    if run_end > end or length[chain[-1]] < 0:
+        raise ValueError(f"Field at byte {int(candidates[chain[-1]])} runs past the end of its message")
+    return payload[chain], following[chain], run_end
+
+def _decode_messages(buf, starts, ends, numbers):
+    """Varint fields of many small messages at once, decoded in lockstep
+
+    Returns {field number: int64 array}, 0 where a message omits the field.
+    """
+    import numpy as np
+
+    # Column of each wanted varint field, looked up by its (one or two byte) key
+    slot_of_key = np.full((max(numbers) << 3) + 2, -1, np.int64)
+    for column, number in enumerate(numbers):
+        slot_of_key[number << 3 | WIRE_VARINT] = column
+    values = np.zeros((len(numbers), len(starts)), np.int64)
+
+    index = np.flatnonzero(starts < ends)
+    cursor = starts[index]
+    limit = ends[index]
+    while len(index):
+        key, after = _decode_varints(buf, cursor)
+        # Decoded for every field; only meaningful for varints and lengths
+        value, value_end = _decode_varints(buf, after)
+        wire_type = key & 7
+        cursor = np.where(
+            wire_type == WIRE_VARINT, value_end,
+            np.where(wire_type == WIRE_BYTES, value_end + value, after + np.where(wire_type == WIRE_FIXED64, 8, 4))
+        )
+        bad = (wire_type > WIRE_BYTES) & (wire_type != WIRE_FIXED32) | (cursor > limit) | (cursor < after)
+        if bad.any():
+            raise ValueError(f"Malformed tree node field at byte {int(after[bad][0])}")
+        slot = slot_of_key[np.clip(key, 0, len(slot_of_key) - 1)]
+        wanted = slot >= 0
+        values[slot[wanted], index[wanted]] = value[wanted]
+        remaining = cursor < limit
+        index, cursor, limit = index[remaining], cursor[remaining], limit[remaining]
+    return dict(zip(numbers, values))
+
+def _small_tree_ensemble_stats(data, start, end):
+    """tree_ensemble_stats without NumPy, decoding and walking one node at a time"""
+    dimensions = 0
+    node_bytes = 0
+    nodes = []
+    for field in iter_fields(data, start, end):
+        if field.number == ENSEMBLE_NODES and field.wire_type == WIRE_BYTES:
+            node = dict.fromkeys(NODE_FIELDS, 0)
+            for sub in iter_fields(data, field.value_start, field.end):
+                if sub.number in node and sub.wire_type == WIRE_VARINT:
+                    node[sub.number] = field_value(data, sub)
+            nodes.append(node)
+            node_bytes += field.end - field.start
+        elif field.number == ENSEMBLE_DIMENSIONS and field.wire_type == WIRE_VARINT:
+            dimensions = field_value(data, field)
+
+    stats = {
+        'prediction_dimensions': dimensions,
+        'node_bytes': node_bytes,
+        'nodes': len(nodes),
+        'trees': 0,
+        'leaves': 0,
+        'max_depth': 0,
+        'mean_leaf_depth': 0.0,
+        'leaf_depth_histogram': [],
+        'feature_splits': {},
+        'issues': {},
+        'per_tree': []
+    }
+    if not nodes:
+        return stats
+
+    tree_ids = sorted({node[NODE_TREE_ID] for node in nodes})
+    tree_index = {tree_id: i for i, tree_id in enumerate(tree_ids)}
+    index = {}
+    for i, node in enumerate(nodes):
+        index[node[NODE_TREE_ID], node[NODE_ID]] = i
+    leaf = [node[NODE_BEHAVIOR] == LEAF_NODE for node in nodes]
+    children = [
+        (-1, -1) if leaf[i] else tuple(index.get((node[NODE_TREE_ID], node[child]), -1)
+                                       for child in (NODE_TRUE_CHILD, NODE_FALSE_CHILD))
+        for i, node in enumerate(nodes)
+    ]
+    has_parent = [False] * len(nodes)
+    for pair in children:
+        for child in pair:
+            if child >= 0:
+                has_parent[child] = True
+
+    # Breadth-first from the roots, one level per step
+    depth = [-1] * len(nodes)
+    frontier = [i for i, parented in enumerate(has_parent) if not parented]
+    level = 0
+    while frontier:
+        for i in frontier:
+            depth[i] = level
+        frontier = sorted({child for i in frontier for child in children[i] if child >= 0 and depth[child] < 0})
+        level += 1
+
+    roots = Counter(tree_index[nodes[i][NODE_TREE_ID]] for i, parented in enumerate(has_parent) if not parented)
+    issues = {
+        'duplicate_nodes': len(nodes) - len(index),
+        'missing_children': sum(not leaf[i] and min(pair) < 0 for i, pair in enumerate(children)),
+        'unreachable_nodes': depth.count(-1),
+        'trees_with_several_roots': sum(count > 1 for count in roots.values())
+    }
+
+    max_depth = max(max(depth), 0)
+    histograms = [[0] * (max_depth + 1) for _ in tree_ids]
+    nodes_per_tree = [0] * len(tree_ids)
+    features = Counter()
+    for i, node in enumerate(nodes):
+        tree = tree_index[node[NODE_TREE_ID]]
+        nodes_per_tree[tree] += 1
+        if not leaf[i]:
+            features[node[NODE_FEATURE]] += 1
+        elif depth[i] >= 0:
+            histograms[tree][depth[i]] += 1
+    total = [sum(column) for column in zip(*histograms)]
+    depth_per_tree = [max((d for d, count in enumerate(histogram) if count), default=0) for histogram in histograms]
+    ordered = sorted(nodes_per_tree)
+    middle = len(ordered) // 2
+
+    stats.update({
+        'trees': len(tree_ids),
+        'leaves': sum(leaf),
+        'max_depth': max_depth,
+        'mean_leaf_depth': sum(count * d for d, count in enumerate(total)) / max(sum(total), 1),
+        'leaf_depth_histogram': total,
+        'nodes_per_tree': {
+            'min': ordered[0],
+            'median': float(ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2),
+            'max': ordered[-1]
+        },
+        'feature_splits': dict(sorted(features.items())),
+        'issues': {name: count for name, count in issues.items() if count},
+        'per_tree': [
+            {
+                'tree_id': tree_id,
+                'nodes': nodes_count,
+                'leaves': sum(histogram),
+                'max_depth': tree_depth,
+                'leaf_depth_histogram': histogram[:tree_depth + 1]
+            }
+            for tree_id, nodes_count, tree_depth, histogram
+            in zip(tree_ids, nodes_per_tree, depth_per_tree, histograms)
+        ]
+    })
+    return stats
+
+def tree_ensemble_stats(data, start, end):
+    """Node counts and depth histograms of the TreeEnsembleParameters in data[start:end]
+
+    Depths count edges from the root, so a stump's leaves are at depth 1.
+    Small ensembles are walked in plain Python (see SMALL_ENSEMBLE_BYTES).
+    """
+    if end - start <= SMALL_ENSEMBLE_BYTES:
+        return _small_tree_ensemble_stats(data, start, end)
+
+    import numpy as np
+
+    buf = np.frombuffer(data, np.uint8)
+    dimensions = 0
+    runs = []
+    node_bytes = 0
+    pos = start
+    while pos < end:
+        field = next(iter_fields(data, pos, end))
+        if field.number == ENSEMBLE_NODES and field.wire_type == WIRE_BYTES:
+            starts, ends, run_end = _field_run(buf, pos, end, NODE_TAG)
+            runs.append((starts, ends))
+            node_bytes += run_end - pos
+            pos = run_end
+            continue
+        if field.number == ENSEMBLE_DIMENSIONS and field.wire_type == WIRE_VARINT:
+            dimensions = field_value(data, field)
+        pos = field.end
+
+    starts = np.concatenate([run[0] for run in runs]) if runs else np.zeros(0, np.int64)
+    ends = np.concatenate([run[1] for run in runs]) if runs else np.zeros(0, np.int64)
+    fields = _decode_messages(buf, starts, ends, NODE_FIELDS)
+    del buf
+    stats = {
+        'prediction_dimensions': dimensions,
+        'node_bytes': node_bytes,
+        'nodes': len(starts),
+        'trees': 0,
+        'leaves': 0,
+        'max_depth': 0,
+        'mean_leaf_depth': 0.0,
+        'leaf_depth_histogram': [],
+        'feature_splits': {},
+        'issues': {},
+        'per_tree': []
+    }
+    if not len(starts):
+        return stats
+
+    n = len(starts)
+    leaf = fields[NODE_BEHAVIOR] == LEAF_NODE
+    tree_id = fields[NODE_TREE_ID]
+    if tree_id.min() >= 0 and tree_id.max() < 4 * n:
+        present = np.bincount(tree_id) > 0
+        tree_ids = np.flatnonzero(present)
+        tree_index = (np.cumsum(present) - 1)[tree_id]
+    else:
+        tree_ids, tree_index = np.unique(tree_id, return_inverse=True)
+
+    # Index nodes by (tree, node id): a direct table when ids are dense, else a sorted search
+    width = int(fields[NODE_ID].max()) + 1
+    key = tree_index * width + fields[NODE_ID]
+    if len(tree_ids) * width <= 4 * n:
+        slots = np.full(len(tree_ids) * width, -1, np.int64)
+        slots[key] = np.arange(n)
+        duplicates = n - int(np.count_nonzero(slots >= 0))
+        find = slots.__getitem__
+    else:
+        order = np.argsort(key, kind='stable')
+        sorted_keys = key[order]
+        duplicates = int(np.sum(sorted_keys[1:] == sorted_keys[:-1]))
+
+        def find(child_key):
+            position = np.minimum(np.searchsorted(sorted_keys, child_key), n - 1)
+            return np.where(sorted_keys[position] == child_key, order[position], -1)
+
+    def lookup(child):
+        valid = ~leaf & (child >= 0) & (child < width)
+        found = np.full(n, -1, np.int64)
+        found[valid] = find(tree_index[valid] * width + child[valid])
+        return found
+
+    true_child = lookup(fields[NODE_TRUE_CHILD])
+    false_child = lookup(fields[NODE_FALSE_CHILD])
+    has_parent = np.zeros(n, bool)
+    has_parent[true_child[true_child >= 0]] = True
+    has_parent[false_child[false_child >= 0]] = True
+
+    # Breadth-first from the roots, one level per step
+    depth = np.full(n, -1, np.int64)
+    queued = np.zeros(n, bool)
+    frontier = np.flatnonzero(~has_parent)
+    level = 0
+    while len(frontier):
+        depth[frontier] = level
+        children = np.concatenate([true_child[frontier], false_child[frontier]])
+        children = children[children >= 0]
+        queued[children[depth[children] < 0]] = True
+        frontier = np.flatnonzero(queued)
+        queued[frontier] = False
+        level += 1
+
+    issues = {
+        'duplicate_nodes': duplicates,
+        'missing_children': int(np.sum(~leaf & ((true_child < 0) | (false_child < 0)))),
+        'unreachable_nodes': int(np.sum(depth < 0)),
+        'trees_with_several_roots': int(np.sum(np.bincount(tree_index[~has_parent], minlength=len(tree_ids)) > 1))
+    }
+
+    reached_leaf = leaf & (depth >= 0)
+    max_depth = max(int(depth.max()), 0)
+    histograms = np.bincount(
+        tree_index[reached_leaf] * (max_depth + 1) + depth[reached_leaf], minlength=len(tree_ids) * (max_depth + 1)
+    ).reshape(len(tree_ids), max_depth + 1)
+    nodes_per_tree = np.bincount(tree_index, minlength=len(tree_ids))
+    leaves_per_tree = histograms.sum(axis=1)
+    depth_per_tree = np.where(
+        leaves_per_tree > 0, max_depth - np.argmax(histograms[:, ::-1] > 0, axis=1), 0
+    )
+    total = histograms.sum(axis=0)
+    features, feature_counts = np.unique(fields[NODE_FEATURE][~leaf], return_counts=True)
+
+    stats.update({
+        'trees': len(tree_ids),
+        'leaves': int(leaf.sum()),
+        'max_depth': max_depth,
+        'mean_leaf_depth': float((total * np.arange(max_depth + 1)).sum() / max(total.sum(), 1)),
+        'leaf_depth_histogram': total.tolist(),
+        'nodes_per_tree': {
+            'min': int(nodes_per_tree.min()),
+            'median': float(np.median(nodes_per_tree)),
+            'max': int(nodes_per_tree.max())
+        },
+        'feature_splits': {int(f): int(c) for f, c in zip(features, feature_counts)},
+        'issues': {name: count for name, count in issues.items() if count},
+        'per_tree': [
+            {
+                'tree_id': int(tree_id),
+                'nodes': int(nodes),
+                'leaves': int(leaves),
+                'max_depth': int(tree_depth),
+                'leaf_depth_histogram': histogram[:tree_depth + 1].tolist()
+            }
+            for tree_id, nodes, leaves, tree_depth, histogram
+            in zip(tree_ids, nodes_per_tree, leaves_per_tree, depth_per_tree, histograms)
+        ]
+    })
+    return stats
+
+# Neural networks and GLMs
+
+def _weight_count(data, start, end):
+    """Number of weights stored in the WeightParams message data[start:end]"""
+    count = raw = 0
+    bits = None
+    for field in iter_fields(data, start, end):
+        size = field.end - field.value_start
+        if field.number == WEIGHT_FLOAT:
+            count += size // 4 if field.wire_type == WIRE_BYTES else 1
+        elif field.number == WEIGHT_FLOAT16:
+            count += size // 2
+        elif field.number == WEIGHT_INT8_RAW:
+            count += size
+        elif field.number == WEIGHT_RAW:
+            raw += size
+        elif field.number == WEIGHT_QUANTIZATION:
+            bits_fields = find_fields(data, QUANTIZATION_BITS, field.value_start, field.end)
+            bits = field_value(data, bits_fields[-1]) if bits_fields else None
+    return count + (raw * 8 // bits if bits else raw // 4)
+
+def _parameter_count(data, start, end, paths):
+    count = 0
+    for path in paths:
+        for field in find_fields(data, path[0], start, end):
+            if field.wire_type != WIRE_BYTES:
+                continue
+            if len(path) == 1:
+                count += _weight_count(data, field.value_start, field.end)
+            else:
+                count += _parameter_count(data, field.value_start, field.end, [path[1:]])
+    return count
+
+def layer_inventory(data, start, end):
+    """Name, type, parameter count and bytes of each layer of a neural network message"""
+    layers = []
+    for field in find_fields(data, NN_LAYERS, start, end):
+        layer = {'name': '', 'type': 'unknown', 'parameters': 0, 'bytes': field.end - field.start}
+        for sub in iter_fields(data, field.value_start, field.end):
+            if sub.number == LAYER_NAME:
+                layer['name'] = bytes(data[sub.value_start:sub.end]).decode('utf-8')
+            elif sub.number in LAYER_TYPES:
+                layer['type'] = LAYER_TYPES[sub.number]
+                layer['parameters'] = _parameter_count(
+                    data, sub.value_start, sub.end, LAYER_WEIGHTS.get(sub.number, ())
+                )
+        layers.append(layer)
+    return layers
+
+def glm_parameters(data, start, end):
+    """Weights plus offsets of a GLMRegressor message"""
+    count = 0
+    for field in iter_fields(data, start, end):
+        if field.number == GLM_WEIGHTS:
+            count += sum((f.end - f.value_start) // 8 for f in find_fields(data, 1, field.value_start, field.end))
+        elif field.number == GLM_OFFSET:
+            count += (field.end - field.value_start) // 8 if field.wire_type == WIRE_BYTES else 1
+    return count
+
+# Whole models
+
+def _inspect_model(data, start, end, path, report):
+    """Add the models and components of the Model message data[start:end] to report"""
+    for field in iter_fields(data, start, end):
+        size = field.end - field.start
+        if field.number == MODEL_DESCRIPTION:
+            report['components'].append((f"{path}description", size))
+        if field.number not in MODEL_TYPES:
+            continue
+
+        model_type = MODEL_TYPES[field.number]
+        name = f"{path}{model_type}"
+        model = {'path': name, 'type': model_type, 'bytes': size}
+        report['models'].append(model)
+
+        if model_type in PIPELINE_TYPES:
+            pipeline_start, pipeline_end = field.value_start, field.end
+            if model_type != 'pipeline':
+                pipelines = find_fields(data, PIPELINE_MESSAGE, pipeline_start, pipeline_end)
+                if not pipelines:
+                    continue
+                pipeline_start, pipeline_end = pipelines[-1].value_start, pipelines[-1].end
+            for i, stage in enumerate(find_fields(data, PIPELINE_MODELS, pipeline_start, pipeline_end)):
+                _inspect_model(data, stage.value_start, stage.end, f"{name}.models[{i}].", report)
+        elif model_type in TREE_ENSEMBLE_TYPES:
+            ensembles = find_fields(data, TREE_ENSEMBLE, field.value_start, field.end)
+            if ensembles:
+                model['trees'] = tree_ensemble_stats(data, ensembles[-1].value_start, ensembles[-1].end)
+                report['components'].append((f"{name}.treeEnsemble.nodes", model['trees']['node_bytes']))
+                report['components'].append((
+                    f"{name} (other fields)", size - model['trees']['node_bytes']
+                ))
+            else:
+                report['components'].append((name, size))
+        elif model_type in NEURAL_NETWORK_TYPES:
+            model['layers'] = layer_inventory(data, field.value_start, field.end)
+            layer_bytes = sum(layer['bytes'] for layer in model['layers'])
+            report['components'].append((f"{name}.layers", layer_bytes))
+            report['components'].append((f"{name} (other fields)", size - layer_bytes))
+        else:
+            if model_type == 'glmRegressor':
+                model['parameters'] = glm_parameters(data, field.value_start, field.end)
+            report['components'].append((name, size))
+
+def summarize(data):
+    """Everything the inspector reports about serialized spec bytes (bytes or mmap)"""
+    version = 0
+    model_type = None
+    description = b''
+    for field in iter_fields(data):
+        if field.number == MODEL_SPECIFICATION_VERSION:
+            version = field_value(data, field)
+        elif field.number == MODEL_DESCRIPTION:
+            description += field_value(data, field)
+        elif field.number in MODEL_TYPES:
+            model_type = MODEL_TYPES[field.number]
+
+    metadata_bytes = b''.join(field_value(description, f) for f in find_fields(description, DESCRIPTION_METADATA))
+    report = {
+        'specification_version': version,
+        'model_type': model_type,
+        'inputs': describe_features(description, DESCRIPTION_INPUT),
+        'outputs': describe_features(description, DESCRIPTION_OUTPUT),
+        'metadata': {
+            name: read_string(metadata_bytes, number)
+            for name, number in METADATA_FIELDS.items()
+            if read_string(metadata_bytes, number)
+        },
+        'user_defined': read_string_map(metadata_bytes, METADATA_USER_DEFINED),
+        'bytes': len(data),
+        'models': [],
+        'components': []
+    }
+    _inspect_model(data, 0, len(data), '', report)
+    return report
+
+def inspect_file(path):
+    """summarize() a .mlmodel file through a read-only memory map"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return summarize(b'')
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return summarize(data)
+    finally:
+        try:
+            data.close()
+        except BufferError:  # a NumPy view is still referenced by a traceback
+            pass
+
+def totals(report):
+    """Tree nodes, maximum tree depth and NN parameters summed over every model"""
+    result = {'bytes': report['bytes'], 'nodes': 0, 'max_depth': 0, 'parameters': 0}
+    for model in report['models']:
+        if 'trees' in model:
+            result['nodes'] += model['trees']['nodes']
+            result['max_depth'] = max(result['max_depth'], model['trees']['max_depth'])
+        result['parameters'] += model.get('parameters', 0)
+        result['parameters'] += sum(layer['parameters'] for layer in model.get('layers', ()))
+    return result
+
+# Output
+
+def _bar(count, largest, width=40):
+    return '#' * max(1, round(width * count / largest)) if count else ''
+
+def print_summary(report, path=None, per_tree=False):
+    title = f"{path}: " if path else ''
+    print(f"{title}{report['model_type'] or 'unknown model'} "
+          f"(specification version {report['specification_version']}, {report['bytes']:,} bytes)")
+    for label in ('inputs', 'outputs'):
+        print(f"\n{label.capitalize()}:")
+        for name, type_name, description in report[label]:
+            print(f"  {name:<24} {type_name:<24} {description}")
+    if report['metadata'] or report['user_defined']:
+        print("\nMetadata:")
+        for name, value in {**report['metadata'], **report['user_defined']}.items():
+            print(f"  {name}: {value}")
+
+    for model in report['models']:
+        if 'trees' in model:
+            trees = model['trees']
+            print(f"\n{model['path']}: {trees['trees']:,} trees, {trees['nodes']:,} nodes "
+                  f"({trees['leaves']:,} leaves), {trees['prediction_dimensions']} prediction dimensions")
+            if not trees['nodes']:
+                continue
+            per = trees['nodes_per_tree']
+            print(f"  Nodes per tree: min {per['min']:,}, median {per['median']:,.0f}, max {per['max']:,}")
+            print(f"  Depth: max {trees['max_depth']}, mean leaf depth {trees['mean_leaf_depth']:.1f}")
+            print("  Splits per feature: "
+                  + ', '.join(f"{feature}: {count:,}" for feature, count in trees['feature_splits'].items()))
+            for issue, count in trees['issues'].items():
+                print(f"  WARNING: {count:,} {issue.replace('_', ' ')}")
+            print("  Leaf depth histogram:")
+            largest = max(trees['leaf_depth_histogram'])
+            for depth, count in enumerate(trees['leaf_depth_histogram']):
+                if count:
+                    print(f"    {depth:>4} {count:>10,} {_bar(count, largest)}")
+            if per_tree:
+                print(f"  {'Tree':>6} {'Nodes':>9} {'Leaves':>9} {'Depth':>6}  Leaves per depth")
+                for tree in trees['per_tree']:
+                    print(f"  {tree['tree_id']:>6} {tree['nodes']:>9,} {tree['leaves']:>9,} {tree['max_depth']:>6}  "
+                          + ' '.join(map(str, tree['leaf_depth_histogram'])))
+        elif 'layers' in model:
+            layers = model['layers']
+            print(f"\n{model['path']}: {len(layers)} layers, "
+                  f"{sum(layer['parameters'] for layer in layers):,} parameters")
+            print(f"  {'Layer':<28} {'Type':<22} {'Parameters':>11} {'Bytes':>12}")
+            for layer in layers:
+                print(f"  {layer['name']:<28} {layer['type']:<22} {layer['parameters']:>11,} {layer['bytes']:>12,}")
+        elif 'parameters' in model:
+            print(f"\n{model['path']}: {model['parameters']:,} parameters")
+
+    print("\nBytes per component:")
+    for name, size in sorted(report['components'], key=lambda item: -item[1]):
+        share = size / report['bytes'] if report['bytes'] else 0.0
+        print(f"  {name:<60} {size:>12,} {share:>7.1%}")
+
+def check_limits(report, limits):
+    """Messages for every limit ({'bytes'|'nodes'|'max_depth'|'parameters': maximum}) the model exceeds"""
+    found = totals(report)
+    return [
+        f"{name.replace('_', ' ')} {found[name]:,} exceeds the limit of {maximum:,}"
+        for name, maximum in limits.items()
+        if maximum is not None and found[name] > maximum
+    ]
+
+def add_arguments(parser):
+    """Add the inspector's options to an argparse parser"""
+    parser.add_argument('models', nargs='+', help='.mlmodel files to inspect')
+    parser.add_argument('--trees', action='store_true', help='List every tree with its leaf depth histogram')
+    parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+    parser.add_argument('--max-bytes', type=int, help='Fail if a model file is larger than this')
+    parser.add_argument('--max-nodes', type=int, help='Fail if a model has more tree nodes than this')
+    parser.add_argument('--max-depth', type=int, help='Fail if a tree is deeper than this')
+    parser.add_argument('--max-parameters', type=int, help='Fail if a model has more weights than this')
+
+def run(args):
+    """Inspect args.models, printing reports; returns 1 if any limit was exceeded"""
+    import json
+
+    limits = {
+        'bytes': args.max_bytes, 'nodes': args.max_nodes,
+        'max_depth': args.max_depth, 'parameters': args.max_parameters
+    }
+    reports = {}
+    failures = []
+    for i, path in enumerate(args.models):
+        report = inspect_file(path)
+        reports[path] = report
+        failures += [f"{path}: {message}" for message in check_limits(report, limits)]
+        if not args.json:
+            if i:
+                print()
+            print_summary(report, path, per_tree=args.trees)
+
+    if args.json:
+        print(json.dumps(reports if len(reports) > 1 else reports[args.models[0]], indent=2))
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Field-level delta packaging for JubileePredictor model updates
+Diffs two serialized model specs at the protobuf field level and writes a
+compact delta that rebuilds the new spec byte for byte from the old one,
+so over-the-air updates only ship the trees and weights that changed
+"""
+
+import hashlib
+import zlib
+
+from spec_wire import (
+    WIRE_BYTES, WIRE_FIXED32, WIRE_FIXED64, WIRE_VARINT, encode_field, encode_varint, field_value, find_fields,
+    iter_fields, read_varint
+)
+
+MAGIC = b'JMDELTA1'
+DIGEST_SIZE = 32
+
+# Delta message fields: each op appends to the rebuilt message
+OP_COPY = 1      # varint start, varint count: copy a run of old fields verbatim
+OP_LITERAL = 2   # raw bytes of one or more new fields
+OP_PATCH = 3     # submessage: 1 = old field index, 2 = delta of its payload
+PATCH_INDEX = 1
+PATCH_DELTA = 2
+# Changed fields up to this size are only patched against an old field that
+# differs in just its first subfield (found by hash, e.g. a renumbered tree
+# node); otherwise a patch's headers and ops leave little to save, and
+# trying costs a recursive diff per field (tree nodes are 16-31 bytes)
+SMALL_FIELD_BYTES = 32
+
+class DeltaStats:
+    """Per field-path counts of copied, patched and literal fields"""
+
+    def __init__(self):
+        self.paths = {}
+
+    def add(self, path, kind, n_bytes=0):
+        entry = self.paths.setdefault(path, {'copied': 0, 'patched': 0, 'literal': 0, 'literal_bytes': 0})
+        entry[kind] += 1
+        entry['literal_bytes'] += n_bytes
+
+def _parse_fields(data):
+    """Fields of data if it parses as a message, else None"""
+    try:
+        return list(iter_fields(data))
+    except (ValueError, IndexError):
+        return None
+
+def _first_field_end(payload):
+    """Offset just past the first field of a message, or None"""
+    try:
+        key, pos = read_varint(payload, 0)
+        if key & 7 == WIRE_VARINT:
+            return read_varint(payload, pos)[1]
+        if key & 7 == WIRE_BYTES:
+            length, pos = read_varint(payload, pos)
+            return pos + length
+        if key & 7 in (WIRE_FIXED64, WIRE_FIXED32):
+            return pos + (8 if key & 7 == WIRE_FIXED64 else 4)
+    except IndexError:
+        pass
+    return None
+
+def _tail_key(number, payload):
+    """Field number and payload minus its first subfield, or None
+
+    Items of a repeated field that differ only in a leading identifier
+    (such as a renumbered treeId) share this key.
+    """
+    end = _first_field_end(payload)
+    if end is None or end >= len(payload):
+        return None
+    return number, bytes(payload[end:])
+
+def _first_field_delta(old, new, stats, path):
+    """diff_message ops for messages with the same _tail_key: the new first field, then the old rest
+
+    None if old does not parse as a message, as the applier needs its fields.
+    """
+    old_fields = _parse_fields(old)
+    if old_fields is None:
+        return None
+    end = _first_field_end(new)
+    first = next(iter_fields(new, 0, end))
+    stats.add(path + (first.number,), 'literal', end)
+    for field in old_fields[1:]:
+        stats.add(path + (field.number,), 'copied')
+    return (
+        encode_field(OP_LITERAL, WIRE_BYTES, bytes(new[:end]))
+        + encode_field(OP_COPY, WIRE_BYTES, encode_varint(1) + encode_varint(len(old_fields) - 1))
+    )
+
+def diff_message(old, new, stats=None, path=(), new_fields=None):
+    """Delta ops (as encoded bytes) that turn message bytes old into new
+
+    New fields identical to an old field are copied, extending the previous
+    copy run where possible. A changed length-delimited field is patched
+    recursively against the best of: the old field following the last one
+    reused, an old field that differs only in its first subfield, and the
+    old occurrence of the same field number at the same position. It is
+    sent literally when no patch is smaller. Together these keep repeated
+    fields aligned when items are edited, inserted or renumbered, e.g. when
+    a tree is added to an ensemble and the following trees get new ids.
+
+    Unchanged fields cost a hash lookup, and so does finding the old field
+    that differs only in its first subfield, whose patch needs no diff.
+    Other candidates are diffed again one level down, and only for fields
+    over SMALL_FIELD_BYTES and while they could still produce a smaller
+    patch. new_fields is the parsed new, when the caller has it.
+    """
+    stats = stats if stats is not None else DeltaStats()
+    old_fields = _parse_fields(old) or []
+    old_bytes = [bytes(old[f.start:f.end]) for f in old_fields]
+    positions = {}
+    for i, chunk in enumerate(old_bytes):
+        positions.setdefault(chunk, i)
+    by_number = {}
+    for i, field in enumerate(old_fields):
+        by_number.setdefault(field.number, []).append(i)
+    tails = None         # built on the first changed field that needs it
+
+    ops = []
+    copy_run = None      # [start, count]
+    literal = bytearray()
+    seen = {}
+    cursor = 0           # old field after the last one copied or patched
+
+    def flush():
+        nonlocal copy_run
+        if copy_run:
+            ops.append(encode_field(OP_COPY, WIRE_BYTES, encode_varint(copy_run[0]) + encode_varint(copy_run[1])))
+            copy_run = None
+        if literal:
+            ops.append(encode_field(OP_LITERAL, WIRE_BYTES, bytes(literal)))
+            literal.clear()
+
+    for field in (new_fields if new_fields is not None else iter_fields(new)):
+        chunk = bytes(new[field.start:field.end])
+        occurrence = seen.get(field.number, 0)
+        seen[field.number] = occurrence + 1
+        field_path = path + (field.number,)
+
+        # Exact copy, continuing the current run when the next old field matches
+        if copy_run and copy_run[0] + copy_run[1] < len(old_bytes) and old_bytes[copy_run[0] + copy_run[1]] == chunk:
+            copy_run[1] += 1
+            cursor = copy_run[0] + copy_run[1]
+            stats.add(field_path, 'copied')
+            continue
+        if chunk in positions:
+            flush()
+            copy_run = [positions[chunk], 1]
+            cursor = positions[chunk] + 1
+            stats.add(field_path, 'copied')
+            continue
+
+        patch = None
+        payload = field_value(new, field) if field.wire_type == WIRE_BYTES else None
+        # Only patch when the applier's re-encoded header matches exactly
+        payload_fields = None
+        if payload is not None and encode_field(field.number, WIRE_BYTES, payload) == chunk:
+            if tails is None:
+                tails = {}
+                for i, old_field in enumerate(old_fields):
+                    if old_field.wire_type == WIRE_BYTES:
+                        key = _tail_key(old_field.number, field_value(old, old_field))
+                        if key is not None:
+                            tails.setdefault(key, i)
+            # Small fields are only patched against an old field they differ from in the first subfield
+            large = len(chunk) > SMALL_FIELD_BYTES
+            candidates = []
+            if large and cursor < len(old_fields) and old_fields[cursor].number == field.number:
+                candidates.append(cursor)
+            tail = tails.get(_tail_key(field.number, payload))
+            if tail is not None:
+                candidates.append(tail)
+            same_number = by_number.get(field.number, [])
+            if large and occurrence < len(same_number):
+                candidates.append(same_number[occurrence])
+            if candidates:
+                payload_fields = _parse_fields(payload)
+        if payload_fields is not None:
+            best_stats = None
+            for index in dict.fromkeys(candidates):
+                old_field = old_fields[index]
+                # A patch carries at least its headers and one op
+                if old_field.wire_type != WIRE_BYTES or 8 + len(encode_varint(index)) >= len(patch or chunk):
+                    continue
+                sub_stats = DeltaStats()
+                if index == tail:
+                    # Same tail by hash: no need to diff
+                    sub_delta = _first_field_delta(field_value(old, old_field), payload, sub_stats, field_path)
+                    if sub_delta is None:
+                        continue
+                else:
+                    sub_delta = diff_message(field_value(old, old_field), payload, sub_stats, field_path, payload_fields)
+                candidate = encode_field(
+                    OP_PATCH, WIRE_BYTES,
+                    encode_field(PATCH_INDEX, WIRE_VARINT, encode_varint(index))
+                    + encode_field(PATCH_DELTA, WIRE_BYTES, sub_delta)
+                )
+                if len(candidate) < len(patch if patch is not None else chunk):
+                    patch, best_stats, best_index = candidate, sub_stats, index
+
+            if patch is not None:
+                cursor = best_index + 1
+                for sub_path, entry in best_stats.paths.items():
+                    merged = stats.paths.setdefault(sub_path, dict.fromkeys(entry, 0))
+                    for key, value in entry.items():
+                        merged[key] += value
+
+        if patch is not None:
+            flush()
+            ops.append(patch)
+            stats.add(field_path, 'patched')
+        else:
+            if copy_run:
+                flush()
+            literal.extend(chunk)
+            stats.add(field_path, 'literal', len(chunk))
+
+    flush()
+    return b''.join(ops)
+
+def apply_message_delta(old, delta):
+    """Rebuild message bytes from old message bytes and diff_message() ops"""
+    old_fields = list(iter_fields(old))
+    out = bytearray()
+    for op in iter_fields(delta):
+        value = field_value(delta, op)
+        if op.number == OP_COPY:
+            start, pos = read_varint(value, 0)
+            count, _ = read_varint(value, pos)
+            if start + count > len(old_fields):
+                raise ValueError("Delta copies fields beyond the end of the base message")
+            out += old[old_fields[start].start:old_fields[start + count - 1].end]
+        elif op.number == OP_LITERAL:
+            out += value
+        elif op.number == OP_PATCH:
+            index = field_value(value, find_fields(value, PATCH_INDEX)[0])
+            sub_delta = b''.join(field_value(value, f) for f in find_fields(value, PATCH_DELTA))
+            old_field = old_fields[index]
+            payload = apply_message_delta(field_value(old, old_field), sub_delta)
+            out += encode_field(old_field.number, WIRE_BYTES, payload)
+        else:
+            raise ValueError(f"Unknown delta op {op.number}")
+    return bytes(out)
+
+def create_delta(old_bytes, new_bytes):
+    """Package a delta: magic, SHA-256 of base and result, zlib-compressed ops"""
+    stats = DeltaStats()
+    ops = diff_message(old_bytes, new_bytes, stats)
+    package = (
+        MAGIC + hashlib.sha256(old_bytes).digest() + hashlib.sha256(new_bytes).digest()
+        + zlib.compress(ops, 9)
+    )
+    return package, stats
+
+def apply_delta(old_bytes, package):
+    """Rebuild the new spec bytes, checking both the base and the result digests"""
+    if not package.startswith(MAGIC):
+        raise ValueError("Not a model delta")
+    header = len(MAGIC)
+    base_digest = package[header:header + DIGEST_SIZE]
+    result_digest = package[header + DIGEST_SIZE:header + 2 * DIGEST_SIZE]
+    if hashlib.sha256(old_bytes).digest() != base_digest:
+        raise ValueError("Delta was made against a different base model")
+    new_bytes = apply_message_delta(old_bytes, zlib.decompress(package[header + 2 * DIGEST_SIZE:]))
+    if hashlib.sha256(new_bytes).digest() != result_digest:
+        raise ValueError("Rebuilt model does not match the delta's digest")
+    return new_bytes
+
+def field_path_names(paths):
+    """Map field-number paths to dotted Model.proto names where the schema is available"""
+    try:
+        from coremltools.proto import Model_pb2
+    except ImportError:
+        return {path: '.'.join(map(str, path)) for path in paths}
+
+    names = {}
+    for path in paths:
+        descriptor = Model_pb2.Model.DESCRIPTOR
+        parts = []
+        for number in path:
+            field = descriptor.fields_by_number.get(number) if descriptor else None
+            parts.append(field.name if field else str(number))
+            descriptor = field.message_type if field else None
+        names[path] = '.'.join(parts)
+    return names
+
+def size_report(old_bytes, new_bytes, package, stats, threshold=0.5):
+    """Delta vs full update sizes, with the cheaper choice
+
+    A delta is recommended when it is smaller than threshold times the
+    compressed full model, leaving headroom for the cost of applying it.
+    """
+    full_compressed = len(zlib.compress(new_bytes, 9))
+    changed = {path: entry for path, entry in stats.paths.items() if entry['patched'] or entry['literal']}
+    names = field_path_names(changed)
+    return {
+        'base_bytes': len(old_bytes),
+        'full_bytes': len(new_bytes),
+        'full_compressed_bytes': full_compressed,
+        'delta_bytes': len(package),
+        'delta_ratio': len(package) / full_compressed if full_compressed else 0.0,
+        'recommendation': 'delta' if len(package) < threshold * full_compressed else 'full',
+        'changed_fields': {names[path]: entry for path, entry in sorted(changed.items())}
+    }
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    diff_parser = subparsers.add_parser('diff', help='Create a delta from an old and a new model')
+    diff_parser.add_argument('old', help='Model currently on devices')
+    diff_parser.add_argument('new', help='Updated model')
+    diff_parser.add_argument('-o', '--output', default='JubileePredictor.mldelta', help='Where to write the delta')
+    diff_parser.add_argument('--threshold', type=float, default=0.5,
+                             help='Recommend the delta below this fraction of the compressed full size')
+    diff_parser.add_argument('--json', action='store_true', help='Print the size report as JSON')
+
+    apply_parser = subparsers.add_parser('apply', help='Rebuild the new model from the old one and a delta')
+    apply_parser.add_argument('old', help='Model currently on devices')
+    apply_parser.add_argument('delta', help='Delta created by diff')
+    apply_parser.add_argument('-o', '--output', required=True, help='Where to write the rebuilt model')
+
+    args = parser.parse_args()
+
+    with open(args.old, 'rb') as f:
+        old_bytes = f.read()
+
+    if args.command == 'diff':
+        with open(args.new, 'rb') as f:
+            new_bytes = f.read()
+        package, stats = create_delta(old_bytes, new_bytes)
+        if apply_delta(old_bytes, package) != new_bytes:
+            raise SystemExit("Delta does not rebuild the new model")
+        with open(args.output, 'wb') as f:
+            f.write(package)
+
+        report = size_report(old_bytes, new_bytes, package, stats, args.threshold)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f"Full model:  {report['full_bytes']:>10,} bytes ({report['full_compressed_bytes']:,} compressed)")
+            print(f"Delta:       {report['delta_bytes']:>10,} bytes ({report['delta_ratio']:.1%} of compressed full)")
+            print(f"Recommended: {report['recommendation']} update")
+            if report['changed_fields']:
+                print("\nChanged fields:")
+                for name, entry in report['changed_fields'].items():
+                    print(f"  {name}: {entry['patched']} patched, {entry['literal']} replaced "
+                          f"({entry['literal_bytes']:,} bytes), {entry['copied']} unchanged")
+            print(f"\nDelta saved to: {args.output}")
+    else:
+        with open(args.delta, 'rb') as f:
+            package = f.read()
+        new_bytes = apply_delta(old_bytes, package)
+        with open(args.output, 'wb') as f:
+            f.write(new_bytes)
+        print(f"Rebuilt model ({len(new_bytes):,} bytes) saved to: {args.output}")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Inference cost profiler for JubileePredictor model variants
+Estimates the static cost of each model artifact (node visits and
+multiply-adds per row, spec size) and measures single-row vs batched
+latency with the reference evaluator, printing one comparison table per
+model family (linear, forest, neural network)
+"""
+
+import statistics
+import time
+
+import numpy as np
+
+import reference_evaluator
+
+FAMILIES = {
+    'glmRegressor': 'linear',
+    'treeEnsembleRegressor': 'forest',
+    'neuralNetwork': 'neural network',
+    'neuralNetworkRegressor': 'neural network'
+}
+
+# Rows drawn from FEATURE_RANGES to estimate tree path lengths
+COST_SAMPLE_ROWS = 4096
+
+def create_minimal_spec():
+    from create_minimal_model import create_minimal_model
+    return create_minimal_model().get_spec()
+
+def create_glm_fallback_spec():
+    from train_neural_network_model import create_simple_coreml_model
+    return create_simple_coreml_model().get_spec()
+
+def create_basic_spec():
+    """A forest of create_basic_model's size (20 trees, depth 5, 1000 rows) on jubileeProbability
+
+    create_basic_model itself fails before returning its model, at the
+    confidenceScore output it declares. This stand-in trains on
+    train_jubilee_model's generate_training_data rather than the script's
+    own random rows, so it matches the model's cost but not its predictions.
+    """
+    import coremltools as ct
+    from sklearn.ensemble import RandomForestRegressor
+
+    from build_jubilee_model import FEATURES
+    from train_jubilee_model import generate_training_data
+
+    data = generate_training_data(n_samples=1000, seed=42)
+    forest = RandomForestRegressor(n_estimators=20, max_depth=5, random_state=42)
+    forest.fit(data[FEATURES].values, data['jubileeProbability'].values)
+    return ct.converters.sklearn.convert(
+        forest,
+        input_features=[(name, ct.models.datatypes.Double()) for name in FEATURES],
+        output_feature_names='jubileeProbability'
+    ).get_spec()
+
+def create_simple_spec():
+    from create_simple_model import create_simple_model
+    return create_simple_model().get_spec()
+
+def create_single_ensemble_spec():
+    from create_simple_model import create_single_ensemble_model
+    return create_single_ensemble_model().get_spec()
+
+def train_jubilee_spec(cache_dir=None):
+    """The train_jubilee_model forest (100 trees per target, no depth limit), built by build_jubilee_model
+
+    build_jubilee_model trains the same forests as train_jubilee_model
+    given the same data settings and no max_depth. Its stage cache lives in
+    cache_dir, or in a temporary directory that is removed afterwards.
+    """
+    import tempfile
+
+    import build_jubilee_model
+
+    config = dict(build_jubilee_model.DEFAULT_CONFIG, max_depth=None)
+    graph = build_jubilee_model.jubilee_build_graph()
+    with tempfile.TemporaryDirectory() as scratch:
+        load, _ = graph.run(config, build_jubilee_model.ArtifactCache(cache_dir or scratch))
+        return reference_evaluator.parse_spec(load('save'))
+
+def create_placeholder_spec():
+    from create_placeholder_model import create_placeholder_model
+    return create_placeholder_model().get_spec()
+
+def train_neural_network_spec():
+    from train_neural_network_model import build_neural_network
+    return build_neural_network().get_spec()
+
+# Artifact name -> builder, in table order
+ARTIFACTS = {
+    'create_minimal_model': create_minimal_spec,
+    'train_neural_network_model (GLM fallback)': create_glm_fallback_spec,
+    'create_basic_model-sized forest': create_basic_spec,
+    'create_simple_model': create_simple_spec,
+    'create_simple_model --single-ensemble': create_single_ensemble_spec,
+    'train_jubilee_model': train_jubilee_spec,
+    'create_placeholder_model': create_placeholder_spec,
+    'train_neural_network_model': train_neural_network_spec
+}
+
+def model_family(spec):
+    """Family of the models inside spec, looking through pipelines"""
+    model_type = spec.WhichOneof('Type')
+    if model_type in FAMILIES:
+        return FAMILIES[model_type]
+    if model_type in ('pipeline', 'pipelineRegressor', 'pipelineClassifier'):
+        families = {model_family(model) for model in reference_evaluator.pipeline_models(spec)} - {None}
+        return ' + '.join(sorted(families)) if families else None
+    return None
+
+def static_cost(spec, X=None):
+    """Per-row work implied by the spec itself
+
+    node_visits is the mean number of tree nodes visited per row (estimated
+    on rows drawn from FEATURE_RANGES, or X), max_node_visits the worst
+    case; multiply_adds counts GLM and neural network weights applied per
+    row. parameters counts tree nodes and weights.
+    """
+    if X is None:
+        X = reference_evaluator.random_rows(COST_SAMPLE_ROWS)
+    cost = {
+        'spec_bytes': spec.ByteSize(),
+        'trees': 0,
+        'node_visits': 0.0,
+        'max_node_visits': 0,
+        'multiply_adds': 0,
+        'layers': 0,
+        'parameters': 0
+    }
+    _accumulate_cost(spec, X, cost)
+    return cost
+
+def _accumulate_cost(spec, X, cost):
+    model_type = spec.WhichOneof('Type')
+    if model_type in ('pipeline', 'pipelineRegressor', 'pipelineClassifier'):
+        for model in reference_evaluator.pipeline_models(spec):
+            _accumulate_cost(model, X, cost)
+    elif model_type == 'treeEnsembleRegressor':
+        ensemble = reference_evaluator.compiled_tree_ensemble(spec.treeEnsembleRegressor.treeEnsemble)
+        depths = ensemble.node_depths()
+        visits = depths[ensemble.leaf_indices(X)].sum(axis=1)
+        cost['trees'] += len(ensemble.roots)
+        cost['node_visits'] += float(visits.mean())
+        cost['max_node_visits'] += int(sum(
+            depths[np.flatnonzero(ensemble.is_leaf & (ensemble.tree_ids == tree))].max()
+            for tree in np.unique(ensemble.tree_ids)
+        ))
+        cost['parameters'] += len(depths)
+    elif model_type == 'glmRegressor':
+        weights = sum(len(w.value) for w in spec.glmRegressor.weights)
+        cost['multiply_adds'] += weights
+        cost['parameters'] += weights + len(spec.glmRegressor.offset)
+    elif model_type in ('neuralNetwork', 'neuralNetworkRegressor'):
+        for layer in getattr(spec, model_type).layers:
+            cost['layers'] += 1
+            kind = layer.WhichOneof('layer')
+            if kind == 'innerProduct':
+                W, b = reference_evaluator.inner_product_weights(layer.innerProduct)
+                cost['multiply_adds'] += W.size
+                cost['parameters'] += W.size + (len(b) if layer.innerProduct.hasBias else 0)
+            elif kind == 'batchedMatmul' and len(layer.input) == 1:
+                W, b = reference_evaluator.batched_matmul_weights(layer.batchedMatmul)
+                cost['multiply_adds'] += W.size
+                cost['parameters'] += W.size + (len(b) if layer.batchedMatmul.hasBias else 0)
+
+def _median_seconds(function, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+def measure_latency(spec, single_rows=200, batch_rows=4096, repeats=5, seed=0):
+    """Median seconds per row for one-row calls and for one batched call"""
+    X = reference_evaluator.random_rows(batch_rows, seed)
+    singles = X[:single_rows]
+
+    def single():
+        for i in range(len(singles)):
+            reference_evaluator.predict_batch(spec, singles[i:i + 1])
+
+    reference_evaluator.predict_batch(spec, X)  # warm up
+    single_seconds = _median_seconds(single, repeats) / len(singles)
+    batch_seconds = _median_seconds(lambda: reference_evaluator.predict_batch(spec, X), repeats) / len(X)
+    return {'single_row_seconds': single_seconds, 'batched_row_seconds': batch_seconds, 'batch_rows': batch_rows}
+
+def profile_spec(name, spec, **latency_options):
+    profile = {'name': name, 'family': model_family(spec) or spec.WhichOneof('Type')}
+    profile.update(static_cost(spec))
+    profile.update(measure_latency(spec, **latency_options))
+    return profile
+
+def print_tables(profiles):
+    """One comparison table per model family"""
+    families = {}
+    for profile in profiles:
+        families.setdefault(profile['family'], []).append(profile)
+
+    for family, rows in families.items():
+        print(f"\n== {family} ==")
+        print(f"{'Model':<44} {'Spec KB':>8} {'Visits/row':>10} {'MACs/row':>9} "
+              f"{'Single µs':>10} {'Batch µs':>9} {'Speedup':>8}")
+        for p in rows:
+            single = p['single_row_seconds'] * 1e6
+            batched = p['batched_row_seconds'] * 1e6
+            print(f"{p['name']:<44} {p['spec_bytes'] / 1024:>8.1f} {p['node_visits']:>10.1f} "
+                  f"{p['multiply_adds']:>9} {single:>10.1f} {batched:>9.2f} {single / batched:>7.0f}x")
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('models', nargs='*', help='.mlmodel files to profile (default: every model script)')
+    parser.add_argument('--artifacts', help=f"Comma-separated built-in artifacts: {', '.join(ARTIFACTS)}")
+    parser.add_argument('--batch', type=int, default=4096, help='Rows per batched call')
+    parser.add_argument('--single', type=int, default=200, help='One-row calls to time')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats (median is reported)')
+    parser.add_argument('--json', help='Also write the profiles to this JSON file')
+    parser.add_argument('--cache-dir', help='Stage cache for the train_jubilee_model build (default: a temporary one)')
+    args = parser.parse_args()
+
+    specs = []
+    for path in args.models:
+        specs.append((path, reference_evaluator.load_spec(path)))
+    if args.artifacts or not args.models:
+        names = args.artifacts.split(',') if args.artifacts else list(ARTIFACTS)
+        unknown = [name for name in names if name not in ARTIFACTS]
+        if unknown:
+            parser.error(f"Unknown artifacts: {', '.join(unknown)}")
+        for name in names:
+            print(f"Building {name}...")
+            if ARTIFACTS[name] is train_jubilee_spec:
+                specs.append((name, train_jubilee_spec(args.cache_dir)))
+            else:
+                specs.append((name, ARTIFACTS[name]()))
+
+    profiles = [
+        profile_spec(name, spec, single_rows=args.single, batch_rows=args.batch, repeats=args.repeats)
+        for name, spec in specs
+    ]
+    print_tables(profiles)
+    print("\nLatencies are from the NumPy reference evaluator on this machine; compare them")
+    print("relative to each other. Visits/row and MACs/row carry over to Core ML on device.")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(profiles, f, indent=2)
+        print(f"Profiles saved to: {args.json}")
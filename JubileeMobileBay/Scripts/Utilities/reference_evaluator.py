@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Reference evaluator for JubileePredictor Core ML specs
+Evaluates model specs with NumPy so models can be checked on Linux, where
+coremltools cannot run predictions
+"""
+
+import numpy as np
+
+# Bounded ranges of the four model inputs (see the training scripts)
+FEATURE_RANGES = {
+    'airTemperature': (65.0, 95.0),    # Fahrenheit
+    'waterTemperature': (70.0, 88.0),  # Fahrenheit
+    'windSpeed': (0.0, 25.0),          # mph
+    'dissolvedOxygen': (2.0, 8.0)      # mg/L
+}
+
+TEST_CASES = [
+    {
+        'name': 'Optimal conditions',
+        'input': {
+            'airTemperature': 80.0,
+            'waterTemperature': 82.0,
+            'windSpeed': 3.0,
+            'dissolvedOxygen': 3.5
+        }
+    },
+    {
+        'name': 'Poor conditions',
+        'input': {
+            'airTemperature': 65.0,
+            'waterTemperature': 70.0,
+            'windSpeed': 20.0,
+            'dissolvedOxygen': 7.0
+        }
+    },
+    {
+        'name': 'Average conditions',
+        'input': {
+            'airTemperature': 75.0,
+            'waterTemperature': 78.0,
+            'windSpeed': 10.0,
+            'dissolvedOxygen': 5.0
+        }
+    }
+]
+
+# Rows evaluated at once by tree ensembles, bounding the (rows x trees) index arrays
+TREE_CHUNK_ROWS = 65536
+
+def parse_spec(data):
+    """Parse serialized .mlmodel bytes into a Model protobuf"""
+    from coremltools.proto import Model_pb2
+
+    spec = Model_pb2.Model()
+    spec.ParseFromString(data)
+    return spec
+
+def load_spec(path):
+    """Read a .mlmodel file into a Model protobuf"""
+    with open(path, 'rb') as f:
+        return parse_spec(f.read())
+
+def feature_width(feature_type):
+    """Number of columns a feature contributes to a row"""
+    kind = feature_type.WhichOneof('Type')
+    if kind in ('doubleType', 'int64Type'):
+        return 1
+    if kind == 'multiArrayType':
+        return int(np.prod(feature_type.multiArrayType.shape)) if feature_type.multiArrayType.shape else 1
+    raise NotImplementedError(f"Unsupported feature type: {kind}")
+
+def as_columns(value):
+    """View a batch of feature values as a (rows, columns) float array"""
+    array = np.asarray(value, dtype=np.float64)
+    if array.ndim == 0:
+        return array.reshape(1, 1)
+    if array.ndim == 1:
+        return array.reshape(-1, 1)
+    return array.reshape(array.shape[0], -1)
+
+def stack_inputs(description, features):
+    """Concatenate the model inputs into one (rows, columns) matrix"""
+    return np.hstack([as_columns(features[f.name]) for f in description.input])
+
+def format_output(feature, value):
+    """Shape a (rows, columns) result to match the output feature type"""
+    value = as_columns(value)
+    if feature.type.WhichOneof('Type') in ('doubleType', 'int64Type'):
+        return value[:, 0]
+    return value
+
+def random_inputs(spec, n_samples, seed=0):
+    """Draw uniform input rows within FEATURE_RANGES for a model's inputs"""
+    rng = np.random.default_rng(seed)
+    inputs = {}
+    for feature in spec.description.input:
+        low, high = FEATURE_RANGES.get(feature.name, (0.0, 1.0))
+        width = feature_width(feature.type)
+        values = rng.uniform(low, high, (n_samples, width))
+        inputs[feature.name] = values[:, 0] if feature.type.WhichOneof('Type') == 'doubleType' else values
+    return inputs
+
+# Tree ensembles
+
+class CompiledTreeEnsemble:
+    """Flat node arrays for a TreeEnsembleParameters message"""
+
+    def __init__(self, ensemble):
+        nodes = list(ensemble.nodes)
+        index = {(node.treeId, node.nodeId): i for i, node in enumerate(nodes)}
+        n_nodes = len(nodes)
+        n_dims = max(ensemble.numPredictionDimensions, 1)
+
+        self.tree_ids = np.array([node.treeId for node in nodes], dtype=np.int64)
+        self.feature = np.zeros(n_nodes, dtype=np.int64)
+        self.threshold = np.zeros(n_nodes)
+        self.behavior = np.zeros(n_nodes, dtype=np.int64)
+        self.true_child = np.arange(n_nodes)
+        self.false_child = np.arange(n_nodes)
+        self.leaf_values = np.zeros((n_nodes, n_dims))
+
+        for i, node in enumerate(nodes):
+            self.behavior[i] = node.nodeBehavior
+            if node.nodeBehavior == node.LeafNode:
+                for info in node.evaluationInfo:
+                    self.leaf_values[i, info.evaluationIndex] += info.evaluationValue
+            else:
+                self.feature[i] = node.branchFeatureIndex
+                self.threshold[i] = node.branchFeatureValue
+                self.true_child[i] = index[(node.treeId, node.trueChildNodeId)]
+                self.false_child[i] = index[(node.treeId, node.falseChildNodeId)]
+
+        self.is_leaf = self.behavior == nodes[0].LeafNode if nodes else np.zeros(0, dtype=bool)
+        self.roots = np.array(sorted(i for (tree, node), i in index.items() if node == 0), dtype=np.int64)
+        base = list(ensemble.basePredictionValue) or [0.0]
+        self.base = np.resize(np.asarray(base, dtype=np.float64), n_dims)
+
+    def node_depths(self):
+        """Nodes visited from the root to reach each node, counting both ends"""
+        depth = np.zeros(len(self.behavior), dtype=np.int64)
+        depth[self.roots] = 1
+        frontier = self.roots
+        while len(frontier):
+            internal = frontier[~self.is_leaf[frontier]]
+            children = np.concatenate([self.true_child[internal], self.false_child[internal]])
+            depth[children] = np.concatenate([depth[internal] + 1, depth[internal] + 1])
+            frontier = children
+        return depth
+
+    def leaf_indices(self, X):
+        """Return the (rows, trees) leaf node index reached by every row"""
+        idx = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        while True:
+            at_leaf = self.is_leaf[idx]
+            if at_leaf.all():
+                return idx
+            x = np.take_along_axis(X, self.feature[idx], axis=1)
+            t = self.threshold[idx]
+            behavior = self.behavior[idx]
+            go_true = np.select(
+                [behavior == 0, behavior == 1, behavior == 2, behavior == 3, behavior == 4, behavior == 5],
+                [x <= t, x < t, x >= t, x > t, x == t, x != t],
+                default=False
+            )
+            step = np.where(go_true, self.true_child[idx], self.false_child[idx])
+            idx = np.where(at_leaf, idx, step)
+
+    def predict(self, X):
+        """Sum the leaf values of every tree on top of the base prediction"""
+        out = np.empty((X.shape[0], len(self.base)))
+        for start in range(0, X.shape[0], TREE_CHUNK_ROWS):
+            chunk = X[start:start + TREE_CHUNK_ROWS]
+            out[start:start + len(chunk)] = self.base + self.leaf_values[self.leaf_indices(chunk)].sum(axis=1)
+        return out
+
+# Compiled ensembles are reused across calls, as a compiled .mlmodelc would be.
+# Entries hold the message itself so its id stays unique; copy a spec before
+# editing its trees after evaluating it.
+COMPILED_CACHE_SIZE = 16
+_compiled_ensembles = {}
+
+def compiled_tree_ensemble(ensemble):
+    """CompiledTreeEnsemble for a TreeEnsembleParameters message, cached per message"""
+    entry = _compiled_ensembles.get(id(ensemble))
+    if entry is None or entry[0] is not ensemble:
+        if len(_compiled_ensembles) >= COMPILED_CACHE_SIZE:
+            del _compiled_ensembles[next(iter(_compiled_ensembles))]
+        entry = (ensemble, CompiledTreeEnsemble(ensemble))
+        _compiled_ensembles[id(ensemble)] = entry
+    return entry[1]
+
+def evaluate_tree_ensemble(spec, features):
+    """Evaluate a treeEnsembleRegressor spec"""
+    params = spec.treeEnsembleRegressor
+    result = compiled_tree_ensemble(params.treeEnsemble).predict(stack_inputs(spec.description, features))
+    if params.postEvaluationTransform == 2:  # Regression_Logistic
+        result = 1.0 / (1.0 + np.exp(-result))
+    return {spec.description.output[0].name: result}
+
+# GLM regressors
+
+def evaluate_glm(spec, features):
+    """Evaluate a glmRegressor spec: y = W x + offset"""
+    params = spec.glmRegressor
+    W = np.array([list(w.value) for w in params.weights])
+    offset = np.array(list(params.offset))
+    X = stack_inputs(spec.description, features)
+    if W.shape != (len(offset), X.shape[1]):
+        raise ValueError(
+            f"GLM weights {W.shape} do not match {len(offset)} outputs x {X.shape[1]} inputs"
+        )
+    result = X @ W.T + offset
+    if params.postEvaluationTransform == 1:  # Logit
+        result = 1.0 / (1.0 + np.exp(-result))
+    elif params.postEvaluationTransform == 2:  # Probit
+        from math import erf
+        result = 0.5 * (1.0 + np.vectorize(erf)(result / np.sqrt(2.0)))
+    return {spec.description.output[0].name: result}
+
+# Feature vectorizer
+
+def evaluate_feature_vectorizer(spec, features):
+    """Concatenate the listed input columns into one vector"""
+    columns = [as_columns(features[item.inputColumn]) for item in spec.featureVectorizer.inputList]
+    return {spec.description.output[0].name: np.hstack(columns)}
+
+# Neural networks
+
+def activation(params, x):
+    """Apply an ActivationParams non-linearity"""
+    kind = params.WhichOneof('NonlinearityType')
+    if kind == 'linear':
+        return params.linear.alpha * x + params.linear.beta
+    if kind == 'ReLU':
+        return np.maximum(x, 0.0)
+    if kind == 'leakyReLU':
+        return np.where(x >= 0, x, params.leakyReLU.alpha * x)
+    if kind == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-x))
+    if kind == 'tanh':
+        return np.tanh(x)
+    if kind == 'scaledTanh':
+        return params.scaledTanh.alpha * np.tanh(params.scaledTanh.beta * x)
+    if kind == 'sigmoidHard':
+        return np.clip(params.sigmoidHard.alpha * x + params.sigmoidHard.beta, 0.0, 1.0)
+    if kind == 'softplus':
+        return np.log1p(np.exp(x))
+    raise NotImplementedError(f"Unsupported activation: {kind}")
+
+def weight_values(weights):
+    """Values of a WeightParams, stored as float32 or float16"""
+    if weights.float16Value:
+        return np.frombuffer(weights.float16Value, dtype='<f2').astype(np.float64)
+    return np.array(weights.floatValue, dtype=np.float64)
+
+def inner_product_weights(params):
+    """Return (W, b) of an innerProduct layer with W shaped (out, in)"""
+    W = weight_values(params.weights).reshape(params.outputChannels, params.inputChannels)
+    b = weight_values(params.bias) if params.hasBias else np.zeros(params.outputChannels)
+    return W, b
+
+def batched_matmul_weights(params):
+    """Return (W, b) of a one-input batchedMatmul layer with W shaped (out, in)"""
+    W = weight_values(params.weights).reshape(params.weightMatrixSecondDimension, params.weightMatrixFirstDimension)
+    b = weight_values(params.bias) if params.hasBias else np.zeros(W.shape[0])
+    return W, b
+
+COMPARISONS = {
+    'lessThan': np.less,
+    'lessEqual': np.less_equal,
+    'greaterThan': np.greater,
+    'greaterEqual': np.greater_equal,
+    'equal': np.equal,
+    'notEqual': np.not_equal
+}
+
+BROADCASTABLE = {
+    'addBroadcastable': np.add,
+    'subtractBroadcastable': np.subtract,
+    'multiplyBroadcastable': np.multiply,
+    'minBroadcastable': np.minimum,
+    'maxBroadcastable': np.maximum
+}
+
+def static_slice(params, rank):
+    """Build the index tuple of a sliceStatic layer"""
+    if len(params.beginIds) != rank:
+        raise NotImplementedError(f"sliceStatic of rank {len(params.beginIds)} on a rank {rank} blob")
+    index = []
+    for axis in range(rank):
+        begin = None if params.beginMasks[axis] else params.beginIds[axis]
+        end = None if params.endMasks[axis] else params.endIds[axis]
+        index.append(slice(begin, end, params.strides[axis] or 1))
+    return tuple(index)
+
+def evaluate_layer(layer, blobs):
+    """Evaluate one layer over (rows, channels) blobs, returning its outputs"""
+    kind = layer.WhichOneof('layer')
+    inputs = [blobs[name] for name in layer.input]
+
+    if kind == 'activation':
+        return [activation(layer.activation, inputs[0])]
+    if kind == 'innerProduct':
+        W, b = inner_product_weights(layer.innerProduct)
+        return [inputs[0] @ W.T + b]
+    if kind in ('concat', 'concatND'):
+        return [np.hstack(inputs)]
+    if kind == 'slice':
+        params = layer.slice
+        if params.axis != 0:  # CHANNEL_AXIS
+            raise NotImplementedError("Only channel-axis slices are supported")
+        end = params.endIndex if params.endIndex != -1 else None
+        return [inputs[0][:, params.startIndex:end:params.stride or 1]]
+    if kind in ('split', 'splitND'):
+        if kind == 'split':
+            sizes = [inputs[0].shape[1] // layer.split.nOutputs] * layer.split.nOutputs
+        else:
+            sizes = list(layer.splitND.splitSizes) or (
+                [inputs[0].shape[1] // layer.splitND.numSplits] * layer.splitND.numSplits
+            )
+        return np.split(inputs[0], np.cumsum(sizes)[:-1], axis=1)
+    if kind == 'add':
+        return [sum(inputs) + (layer.add.alpha if len(inputs) == 1 else 0.0)]
+    if kind == 'multiply':
+        result = inputs[0]
+        for other in inputs[1:]:
+            result = result * other
+        return [result * layer.multiply.alpha if len(inputs) == 1 else result]
+    if kind == 'copy':
+        return [inputs[0]]
+    if kind == 'batchedMatmul':
+        params = layer.batchedMatmul
+        if len(inputs) == 2:
+            a = np.swapaxes(inputs[0], -1, -2) if params.transposeA else inputs[0]
+            b = np.swapaxes(inputs[1], -1, -2) if params.transposeB else inputs[1]
+            return [a @ b]
+        W, b = batched_matmul_weights(params)
+        return [inputs[0] @ W.T + b]
+    if kind in COMPARISONS:
+        params = getattr(layer, kind)
+        other = inputs[1] if len(inputs) == 2 else params.alpha
+        return [COMPARISONS[kind](inputs[0], other).astype(np.float64)]
+    if kind == 'sliceStatic':
+        return [inputs[0][static_slice(layer.sliceStatic, inputs[0].ndim)]]
+    if kind in BROADCASTABLE:
+        result = inputs[0]
+        for other in inputs[1:]:
+            result = BROADCASTABLE[kind](result, other)
+        return [result]
+    if kind == 'loadConstantND':
+        params = layer.loadConstantND
+        return [weight_values(params.data).reshape(tuple(params.shape))]
+    if kind == 'clip':
+        return [np.clip(inputs[0], layer.clip.minVal, layer.clip.maxVal)]
+    if kind == 'floor':
+        return [np.floor(inputs[0])]
+    if kind == 'gather':
+        # Core ML passes indices as floats; they are whole numbers here
+        return [np.take(inputs[0], inputs[1].astype(np.int64), axis=layer.gather.axis)]
+    if kind == 'gatherAlongAxis':
+        return [np.take_along_axis(inputs[0], inputs[1].astype(np.int64), axis=layer.gatherAlongAxis.axis)]
+    if kind == 'expandDims':
+        return [np.expand_dims(inputs[0], tuple(layer.expandDims.axes))]
+    if kind == 'reduceSum':
+        params = layer.reduceSum
+        axes = None if params.reduceAll else tuple(params.axes)
+        return [np.sum(inputs[0], axis=axes, keepdims=params.keepDims)]
+    raise NotImplementedError(f"Unsupported neural network layer: {kind} ({layer.name})")
+
+def evaluate_neural_network(spec, features):
+    """Run a neuralNetwork spec layer by layer on rank-1 (per row) tensors"""
+    blobs = {f.name: as_columns(features[f.name]) for f in spec.description.input}
+    for layer in spec.neuralNetwork.layers:
+        for name, value in zip(layer.output, evaluate_layer(layer, blobs)):
+            blobs[name] = value
+    return {f.name: blobs[f.name] for f in spec.description.output}
+
+# Pipelines
+
+def pipeline_models(spec):
+    """Stages of a pipeline, pipelineRegressor or pipelineClassifier spec"""
+    model_type = spec.WhichOneof('Type')
+    if model_type == 'pipeline':
+        return spec.pipeline.models
+    return getattr(spec, model_type).pipeline.models
+
+def evaluate_pipeline(spec, features):
+    """Run each pipeline stage, feeding it the features produced so far"""
+    available = dict(features)
+    for model_spec in pipeline_models(spec):
+        available.update(evaluate_spec(model_spec, available, raw=True))
+    return {f.name: available[f.name] for f in spec.description.output}
+
+EVALUATORS = {
+    'treeEnsembleRegressor': evaluate_tree_ensemble,
+    'glmRegressor': evaluate_glm,
+    'featureVectorizer': evaluate_feature_vectorizer,
+    'neuralNetwork': evaluate_neural_network,
+    'neuralNetworkRegressor': evaluate_neural_network,
+    'pipeline': evaluate_pipeline,
+    'pipelineRegressor': evaluate_pipeline
+}
+
+def evaluate_spec(spec, features, raw=False):
+    """Evaluate a model spec on a batch of inputs
+
+    features maps each input name to an array of rows. Double outputs are
+    returned with shape (rows,) and MultiArray outputs as (rows, columns).
+    """
+    model_type = spec.WhichOneof('Type')
+    if model_type not in EVALUATORS:
+        raise NotImplementedError(f"Unsupported model type: {model_type}")
+    if model_type == 'neuralNetworkRegressor':
+        spec = _as_neural_network(spec)
+    outputs = EVALUATORS[model_type](spec, features)
+    if raw:
+        return outputs
+    return {f.name: format_output(f, outputs[f.name]) for f in spec.description.output}
+
+def _as_neural_network(spec):
+    """View a neuralNetworkRegressor as a plain neuralNetwork spec"""
+    from coremltools.proto import Model_pb2
+
+    plain = Model_pb2.Model()
+    plain.description.CopyFrom(spec.description)
+    plain.neuralNetwork.layers.extend(spec.neuralNetworkRegressor.layers)
+    return plain
+
+def predict(spec, input_dict):
+    """Single-row prediction with the same shape as MLModel.predict"""
+    batch = {name: np.array([value]) for name, value in input_dict.items()}
+    outputs = evaluate_spec(spec, batch)
+    return {name: value[0] for name, value in outputs.items()}
+
+def is_batched(spec):
+    """True for models that take all inputs as one (rows, features) MultiArray"""
+    inputs = spec.description.input
+    return (
+        len(inputs) == 1 and inputs[0].type.WhichOneof('Type') == 'multiArrayType'
+        and len(inputs[0].type.multiArrayType.shape) == 2
+    )
+
+def predict_batch(spec, X):
+    """Predict a (rows, features) matrix with scalar-input or batched models
+
+    Returns a (rows, outputs) matrix. For scalar-input models the columns of
+    X follow the order of the model inputs and the result columns follow the
+    order of the model outputs, matching the batched export layout.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if is_batched(spec):
+        features = {spec.description.input[0].name: X}
+    else:
+        features = {f.name: X[:, i] for i, f in enumerate(spec.description.input)}
+    outputs = evaluate_spec(spec, features)
+    return np.hstack([as_columns(outputs[f.name]) for f in spec.description.output])
+
+def random_rows(n_samples, seed=0):
+    """Draw (rows, features) inputs within FEATURE_RANGES in the standard input order"""
+    rng = np.random.default_rng(seed)
+    low, high = np.array(list(FEATURE_RANGES.values())).T
+    return rng.uniform(low, high, (n_samples, len(FEATURE_RANGES)))
+
+def max_abs_difference(spec_a, spec_b, n_samples=1000, seed=0):
+    """Largest per-output absolute difference between two specs on random inputs"""
+    if is_batched(spec_a) or is_batched(spec_b):
+        X = random_rows(n_samples, seed)
+        difference = np.abs(predict_batch(spec_a, X) - predict_batch(spec_b, X))
+        return {f'column {i}': float(value) for i, value in enumerate(difference.max(axis=0))}
+    inputs = random_inputs(spec_a, n_samples, seed)
+    outputs_a = evaluate_spec(spec_a, inputs)
+    outputs_b = evaluate_spec(spec_b, inputs)
+    return {
+        name: float(np.max(np.abs(as_columns(outputs_a[name]) - as_columns(outputs_b[name]))))
+        for name in outputs_a
+    }
+
+if __name__ == "__main__":
+    import sys
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'JubileePredictor.mlmodel'
+    spec = load_spec(model_path)
+    print(f"Evaluating {model_path} ({spec.WhichOneof('Type')})")
+
+    if is_batched(spec):
+        X = np.array([list(test['input'].values()) for test in TEST_CASES])
+        predictions = predict_batch(spec, X)
+        print(f"\nBatch of {len(X)} rows:")
+        for test, row in zip(TEST_CASES, predictions):
+            print(f"  {test['name']}: {np.round(row, 3)}")
+        sys.exit(0)
+
+    for test in TEST_CASES:
+        prediction = predict(spec, test['input'])
+        print(f"\n{test['name']}:")
+        print(f"  Input: {test['input']}")
+        for name, value in prediction.items():
+            print(f"  {name}: {np.round(value, 3)}")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Restore source files from the JubileeMobileBay backup tree
+Scans the backup and target trees in parallel into a manifest of relative
+paths, sizes and content hashes, then copies the files that are missing
+from the target on a thread pool. Files that differ from the backup are
+reported and kept, since the target usually holds newer work; --overwrite
+reverts them to the backup too.
+A backup file found at another path in the target (same content, or the
+only file with its name, e.g. Models/X.swift now in Models/Domain/) is
+matched there instead of being copied again. Hashes are cached by size and
+mtime, so re-running on an up-to-date tree only stats files
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_VERSION = 1
+HASH_BLOCK_BYTES = 1 << 20
+# Names never restored or scanned
+SKIPPED_NAMES = {'.DS_Store', '.git', '.build_cache', 'xcuserdata', '__pycache__'}
+
+def scan_tree(root, include):
+    """{relative path: (size, mtime_ns)} of the files under root's include subtrees"""
+    files = {}
+    prefix = len(os.path.join(root, ''))
+    pending = [os.path.join(root, name) for name in include]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for entry in entries:
+            if entry.name in SKIPPED_NAMES or entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files[entry.path[prefix:].replace(os.sep, '/')] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+class HashCache:
+    """SHA-256 of files keyed by absolute path, valid while size and mtime are unchanged"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('version') == MANIFEST_VERSION:
+                self.entries = stored['files']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def lookup(self, path, signature):
+        entry = self.entries.get(path)
+        return entry[2] if entry and (entry[0], entry[1]) == tuple(signature) else None
+
+    def store(self, path, signature, digest):
+        self.entries[path] = [signature[0], signature[1], digest]
+        self.dirty = True
+
+    def hashes(self, root, files, executor):
+        """{relative path: digest} for {relative path: signature} under root, hashing only those not cached"""
+        root = os.path.join(os.path.abspath(root), '')
+        result, missing = {}, []
+        for path, signature in files.items():
+            digest = self.lookup(root + path, signature)
+            if digest is None:
+                missing.append((path, signature))
+            else:
+                result[path] = digest
+        for (path, signature), digest in zip(missing, executor.map(file_hash, [root + path for path, _ in missing])):
+            self.store(root + path, signature, digest)
+            result[path] = digest
+        return result
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+def plan_restore(backup_root, target_root, backup, target, cache, executor):
+    """(copies, unchanged, relocated) for scanned backup and target manifests
+
+    copies lists (source, destination, reason) with reason 'missing' or
+    'changed'. Files are compared by size first and by hash only when
+    sizes match. relocated maps backup paths to the target path they were
+    matched to.
+    """
+    by_name = defaultdict(list)
+    for path in target:
+        by_name[os.path.basename(path)].append(path)
+
+    destinations = {}
+    relocated = {}
+    unplaced = []
+    for path in backup:
+        if path in target:
+            destinations[path] = path
+            continue
+        # The only target file with this name, unless the backup has its own copy at that path
+        candidates = [candidate for candidate in by_name.get(os.path.basename(path), ()) if candidate not in backup]
+        if len(candidates) == 1:
+            destinations[path] = relocated[path] = candidates[0]
+        else:
+            unplaced.append(path)
+
+    # Same-size pairs need hashes; so do unplaced files, which may sit elsewhere under another name
+    sizes = defaultdict(list)
+    for path, (size, _) in target.items():
+        sizes[size].append(path)
+    backup_files, target_files = {}, {}
+    for path, destination in destinations.items():
+        if backup[path][0] == target[destination][0]:
+            backup_files[path] = backup[path]
+            target_files[destination] = target[destination]
+    for path in unplaced:
+        if sizes.get(backup[path][0]):
+            backup_files[path] = backup[path]
+            target_files.update((candidate, target[candidate]) for candidate in sizes[backup[path][0]])
+    backup_hashes = cache.hashes(backup_root, backup_files, executor)
+    target_hashes = cache.hashes(target_root, target_files, executor)
+    by_hash = defaultdict(list)
+    for path, digest in target_hashes.items():
+        by_hash[digest].append(path)
+
+    copies, unchanged = [], []
+    for path in sorted(backup):
+        destination = destinations.get(path)
+        if destination is None:
+            moved = by_hash.get(backup_hashes.get(path), ())
+            if moved:
+                relocated[path] = moved[0]
+                unchanged.append(path)
+            else:
+                copies.append((path, path, 'missing'))
+        elif backup[path][0] == target[destination][0] and backup_hashes[path] == target_hashes[destination]:
+            unchanged.append(path)
+        else:
+            copies.append((path, destination, 'changed'))
+    return copies, unchanged, relocated
+
+def copy_file(source, destination):
+    """Copy with metadata through a temporary file, so an interrupted copy never leaves a partial file"""
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+    temp_path = f"{destination}.restore-tmp"
+    shutil.copy2(source, temp_path)
+    os.replace(temp_path, destination)
+    return os.path.getsize(destination)
+
+def restore(backup_root, target_root, include, jobs=None, dry_run=False, overwrite=False, manifest=None):
+    """Restore target_root from backup_root; a JSON-serializable report
+
+    Only missing files are copied unless overwrite, when files that differ
+    from the backup are replaced too. A dry run writes nothing, not even the
+    hash cache.
+    """
+    started = time.perf_counter()
+    cache = HashCache(manifest or os.path.join(target_root, '.build_cache', 'restore_manifest.json'))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        backup_scan = executor.submit(scan_tree, backup_root, include)
+        target_scan = executor.submit(scan_tree, target_root, include)
+        backup, target = backup_scan.result(), target_scan.result()
+        scanned = time.perf_counter()
+
+        copies, unchanged, relocated = plan_restore(backup_root, target_root, backup, target, cache, executor)
+        kept = [] if overwrite else [destination for _, destination, reason in copies if reason == 'changed']
+        if kept:
+            copies = [copy for copy in copies if copy[2] != 'changed']
+        restored = []
+        if not dry_run:
+            sizes = executor.map(lambda copy: copy_file(os.path.join(backup_root, copy[0]), os.path.join(target_root, copy[1])),
+                                 copies)
+            for (source, destination, reason), size in zip(copies, sizes):
+                restored.append({'path': destination, 'source': source, 'reason': reason, 'bytes': size})
+                # The copy has the backup's content, so its hash is known without reading it back
+                digest = cache.lookup(os.path.abspath(os.path.join(backup_root, source)), backup[source])
+                if digest:
+                    copied = os.path.abspath(os.path.join(target_root, destination))
+                    stat = os.stat(copied)
+                    cache.store(copied, (stat.st_size, stat.st_mtime_ns), digest)
+    if not dry_run:
+        cache.save()
+
+    return {
+        'backup': backup_root,
+        'target': target_root,
+        'dry_run': dry_run,
+        'scanned': {'backup': len(backup), 'target': len(target)},
+        'restored': restored if not dry_run else [
+            {'path': destination, 'source': source, 'reason': reason, 'bytes': backup[source][0]}
+            for source, destination, reason in copies
+        ],
+        'unchanged': len(unchanged),
+        'kept': kept,
+        'relocated': relocated,
+        'seconds': {'scan': round(scanned - started, 3), 'total': round(time.perf_counter() - started, 3)}
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backup', default='../JubileeMobileBay_backup_20250720_220632', help='Backup tree to restore from')
+    parser.add_argument('--target', default='.', help='Project tree to restore into')
+    parser.add_argument('--include', nargs='+', default=['JubileeMobileBay', 'JubileeMobileBayTests'],
+                        help='Subtrees of the backup to restore')
+    parser.add_argument('-j', '--jobs', type=int, help='Threads for scanning, hashing and copying')
+    parser.add_argument('--overwrite', action='store_true', help='Also replace target files that differ from the backup')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would be restored without copying')
+    parser.add_argument('--manifest', help='Hash cache (default: .build_cache/restore_manifest.json in the target)')
+    parser.add_argument('--report', help='Write the JSON report here')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.backup):
+        parser.error(f"Backup tree not found: {args.backup}")
+    report = restore(args.backup, args.target, args.include, args.jobs, args.dry_run, args.overwrite, args.manifest)
+
+    for entry in report['restored']:
+        source = f"  (from {entry['source']})" if entry['source'] != entry['path'] else ''
+        print(f"  {entry['reason']:<8} {entry['path']}{source}")
+    verb = "Would restore" if args.dry_run else "Restored"
+    print(f"\n{verb} {len(report['restored'])} files "
+          f"({sum(entry['bytes'] for entry in report['restored']):,} bytes); "
+          f"{report['unchanged']} up to date, {len(report['kept'])} changed but kept, "
+          f"{len(report['relocated'])} matched at another path; "
+          f"{report['scanned']['backup']} backup and {report['scanned']['target']} target files scanned "
+          f"in {report['seconds']['total']:.2f}s")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {args.report}")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Protobuf wire-format helpers for .mlmodel specs
+Reads and edits serialized Core ML specs field by field without importing
+coremltools or deserializing the whole model, which keeps small edits
+(metadata, descriptions) fast on large tree ensembles
+"""
+
+from collections import namedtuple
+
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_BYTES = 2
+WIRE_FIXED32 = 5
+
+# Field numbers from Model.proto
+MODEL_SPECIFICATION_VERSION = 1
+MODEL_DESCRIPTION = 2
+DESCRIPTION_INPUT = 1
+DESCRIPTION_OUTPUT = 10
+DESCRIPTION_METADATA = 100
+FEATURE_NAME = 1
+FEATURE_SHORT_DESCRIPTION = 2
+METADATA_FIELDS = {'shortDescription': 1, 'versionString': 2, 'author': 3, 'license': 4}
+METADATA_USER_DEFINED = 100
+
+# One field occurrence: data[start:value_start] is the tag (and length), data[value_start:end] the value
+Field = namedtuple('Field', ['number', 'wire_type', 'start', 'value_start', 'end'])
+
+def read_varint(data, pos):
+    """Decode the varint at data[pos], returning (value, next position)"""
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def encode_varint(value):
+    """Encode a non-negative integer as a varint"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def iter_fields(data, start=0, end=None):
+    """Yield every top-level Field of the message in data[start:end]"""
+    pos = start
+    end = len(data) if end is None else end
+    while pos < end:
+        field_start = pos
+        key, pos = read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == WIRE_VARINT:
+            _, value_end = read_varint(data, pos)
+        elif wire_type == WIRE_FIXED64:
+            value_end = pos + 8
+        elif wire_type == WIRE_BYTES:
+            length, pos = read_varint(data, pos)
+            value_end = pos + length
+        elif wire_type == WIRE_FIXED32:
+            value_end = pos + 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type} at byte {field_start}")
+        if value_end > end:
+            raise ValueError(f"Field {number} at byte {field_start} runs past the end of the message")
+        yield Field(number, wire_type, field_start, pos, value_end)
+        pos = value_end
+
+def find_fields(data, number, start=0, end=None):
+    """Every occurrence of field `number` in the message"""
+    return [field for field in iter_fields(data, start, end) if field.number == number]
+
+def field_value(data, field):
+    """Raw value bytes of a length-delimited field, or the integer of a varint"""
+    if field.wire_type == WIRE_VARINT:
+        return read_varint(data, field.value_start)[0]
+    return bytes(data[field.value_start:field.end])
+
+def read_string(data, number, default=''):
+    """Last value of a string field, as protobuf parsing would keep it"""
+    fields = find_fields(data, number)
+    return field_value(data, fields[-1]).decode('utf-8') if fields else default
+
+def read_string_map(data, number):
+    """Decode a map<string, string> field"""
+    result = {}
+    for field in find_fields(data, number):
+        entry = field_value(data, field)
+        result[read_string(entry, 1)] = read_string(entry, 2)
+    return result
+
+def encode_field(number, wire_type, payload):
+    """Encode one field; payload is the value bytes (without length prefix)"""
+    key = encode_varint(number << 3 | wire_type)
+    if wire_type == WIRE_BYTES:
+        return key + encode_varint(len(payload)) + payload
+    return key + payload
+
+def encode_string(number, text):
+    """Encode a string field, omitting it when empty as proto3 does"""
+    return encode_field(number, WIRE_BYTES, text.encode('utf-8')) if text else b''
+
+def encode_string_map(number, mapping):
+    """Encode a map<string, string> field with entries in key order"""
+    return b''.join(
+        encode_field(number, WIRE_BYTES, encode_string(1, key) + encode_string(2, value))
+        for key, value in sorted(mapping.items())
+    )
+
+def replace_fields(data, number, encoded):
+    """Replace every occurrence of field `number` with already-encoded bytes
+
+    The replacement goes where the first occurrence was or, when the field
+    is absent, before the first higher-numbered field, so the result keeps
+    the field order protobuf serializers emit.
+    """
+    kept = []
+    insert_at = None
+    for field in iter_fields(data):
+        if field.number == number:
+            if insert_at is None:
+                insert_at = len(kept)
+            continue
+        if insert_at is None and field.number > number:
+            insert_at = len(kept)
+        kept.append(data[field.start:field.end])
+    if insert_at is None:
+        insert_at = len(kept)
+    kept.insert(insert_at, encoded)
+    return b''.join(bytes(part) for part in kept)
+
+def edit_message(data, path, edit):
+    """Apply edit(bytes) -> bytes to the singular submessage at a field-number path
+
+    Repeated occurrences of a singular submessage are merged by protobuf, so
+    their payloads are concatenated before editing. Missing submessages are
+    created empty.
+    """
+    if not path:
+        return edit(bytes(data))
+    number = path[0]
+    current = b''.join(field_value(data, field) for field in find_fields(data, number))
+    updated = edit_message(current, path[1:], edit)
+    return replace_fields(data, number, encode_field(number, WIRE_BYTES, updated))
+
+def map_repeated(data, number, edit):
+    """Apply edit(bytes) -> bytes to each occurrence of a repeated submessage field"""
+    parts = []
+    for field in iter_fields(data):
+        if field.number == number:
+            parts.append(encode_field(number, WIRE_BYTES, edit(field_value(data, field))))
+        else:
+            parts.append(bytes(data[field.start:field.end]))
+    return b''.join(parts)
+
+def set_metadata(spec_bytes, metadata=None, user_defined=None, descriptions=None):
+    """Return spec bytes with metadata and feature descriptions updated
+
+    metadata maps Metadata string fields (author, license, shortDescription,
+    versionString) to values; user_defined entries are merged into
+    metadata.userDefined; descriptions maps input/output feature names to
+    their shortDescription.
+    """
+    metadata = metadata or {}
+    descriptions = descriptions or {}
+
+    def edit_metadata(message):
+        for name, value in metadata.items():
+            number = METADATA_FIELDS[name]
+            message = replace_fields(message, number, encode_string(number, value))
+        if user_defined:
+            merged = read_string_map(message, METADATA_USER_DEFINED)
+            merged.update(user_defined)
+            message = replace_fields(message, METADATA_USER_DEFINED, encode_string_map(METADATA_USER_DEFINED, merged))
+        return message
+
+    def edit_feature(message):
+        name = read_string(message, FEATURE_NAME)
+        if name not in descriptions:
+            return message
+        return replace_fields(
+            message, FEATURE_SHORT_DESCRIPTION, encode_string(FEATURE_SHORT_DESCRIPTION, descriptions[name])
+        )
+
+    def edit_description(message):
+        if metadata or user_defined:
+            message = edit_message(message, [DESCRIPTION_METADATA], edit_metadata)
+        if descriptions:
+            message = map_repeated(message, DESCRIPTION_INPUT, edit_feature)
+            message = map_repeated(message, DESCRIPTION_OUTPUT, edit_feature)
+        return message
+
+    return edit_message(spec_bytes, [MODEL_DESCRIPTION], edit_description)
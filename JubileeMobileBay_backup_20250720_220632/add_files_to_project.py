@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Bulk add files to an Xcode project
+Adds any number of files to project.pbxproj in one rewrite, instead of
+dragging them in one by one:
+- A PBXFileReference per file, listed in the group for its folder; groups
+  missing on the way are created under the nearest existing one
+- A PBXBuildFile in the Sources or Resources phase of the file's target,
+  chosen by file type
+- Files the project already references are skipped, so re-running the
+  same list adds nothing
+- New UUIDs are derived from the file path and checked against every UUID
+  in the project
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from bisect import bisect_right
+from collections import defaultdict
+
+from backup_store import BackupStore
+from pbxproj import ELEMENT_TAIL_PATTERN, ParseError, ProjectGraph, file_path, quote, resolve_path, validate_graph
+
+SECTION_BEGIN_PATTERN = re.compile(r'^/\* Begin (\w+) section \*/\n', re.MULTILINE)
+SECTION_END_PATTERN = re.compile(r'^/\* End (\w+) section \*/\n', re.MULTILINE)
+
+# Extension -> (lastKnownFileType, build phase or None)
+FILE_TYPES = {
+    'swift': ('sourcecode.swift', 'Sources'),
+    'm': ('sourcecode.c.objc', 'Sources'),
+    'mm': ('sourcecode.cpp.objcpp', 'Sources'),
+    'c': ('sourcecode.c.c', 'Sources'),
+    'cpp': ('sourcecode.cpp.cpp', 'Sources'),
+    'metal': ('sourcecode.metal', 'Sources'),
+    'mlmodel': ('file.mlmodel', 'Sources'),
+    'mlpackage': ('folder.mlpackage', 'Sources'),
+    'h': ('sourcecode.c.h', None),
+    'playground': ('file.playground', None),
+    'xcassets': ('folder.assetcatalog', 'Resources'),
+    'storyboard': ('file.storyboard', 'Resources'),
+    'xib': ('file.xib', 'Resources'),
+    'strings': ('text.plist.strings', 'Resources'),
+    'xcstrings': ('text.json.xcstrings', 'Resources'),
+    'json': ('text.json', 'Resources'),
+    'png': ('image.png', 'Resources'),
+    'jpg': ('image.jpeg', 'Resources'),
+    'jpeg': ('image.jpeg', 'Resources'),
+    'pdf': ('image.pdf', 'Resources'),
+    'ttf': ('file', 'Resources'),
+    'otf': ('file', 'Resources'),
+    'bundle': ('wrapper.plug-in', 'Resources'),
+    # Info.plist and entitlements are build settings inputs, not bundle resources
+    'plist': ('text.plist.xml', None),
+    'entitlements': ('text.plist.entitlements', None),
+    'md': ('net.daringfireball.markdown', None),
+    'py': ('text.script.python', None),
+    'sh': ('text.script.sh', None),
+    'txt': ('text', None),
+}
+# Directories Xcode treats as a single file
+PACKAGE_EXTENSIONS = {'xcassets', 'mlpackage', 'bundle', 'playground'}
+# Directories that need objects this tool does not create
+UNSUPPORTED_EXTENSIONS = {'xcdatamodeld', 'xcodeproj', 'xcworkspace', 'lproj', 'framework', 'xcframework'}
+SKIPPED_NAMES = {'.DS_Store', '.git', 'xcuserdata'}
+
+def file_type(name):
+    """(lastKnownFileType, build phase or None) for a file name"""
+    return FILE_TYPES.get(os.path.splitext(name)[1].lstrip('.').lower(), ('file', None))
+
+def expand_paths(paths):
+    """paths with directories replaced by the files under them (packages such as .xcassets stay whole)"""
+    for path in paths:
+        path = os.path.normpath(path)
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if not os.path.isdir(path) or extension in PACKAGE_EXTENSIONS or extension in UNSUPPORTED_EXTENSIONS:
+            yield path
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            kept = []
+            for name in sorted(subdirectories):
+                if name in SKIPPED_NAMES or name.startswith('.'):
+                    continue
+                extension = os.path.splitext(name)[1].lstrip('.').lower()
+                if extension in PACKAGE_EXTENSIONS or extension in UNSUPPORTED_EXTENSIONS:
+                    yield os.path.join(directory, name)
+                else:
+                    kept.append(name)
+            subdirectories[:] = kept
+            for name in sorted(files):
+                if name not in SKIPPED_NAMES and not name.startswith('.'):
+                    yield os.path.join(directory, name)
+
+def project_path(path):
+    """A resolved group or file path relative to the project folder, or None when it is under another source tree"""
+    if path.startswith('SOURCE_ROOT'):
+        path = path[len('SOURCE_ROOT'):].lstrip('/')
+    elif path.startswith(('<absolute>', 'BUILT_PRODUCTS_DIR', 'SDKROOT', 'DEVELOPER_DIR')):
+        return None
+    return os.path.normpath(path) if path else ''
+
+class FileInserter:
+    """Collects the objects and array entries for a batch of new files, then splices them in with one pass
+
+    Existing file references and groups are indexed by their resolved path,
+    so add() is a few dict lookups per file. New objects go into their
+    section in UUID order, as Xcode keeps them; entries for existing groups
+    and build phases are appended to their arrays. Nothing is written until
+    apply(), which builds the new text from the old text and the sorted
+    insertions.
+    """
+
+    def __init__(self, graph, target_name=None):
+        self.graph = graph
+        self.text = graph.text
+        self.target_name = target_name
+        self.used = set(graph.objects) | {reference.target for reference in graph.references}
+
+        cache = {}
+        self.files = {}
+        for isa in ('PBXFileReference', 'PBXVariantGroup', 'XCVersionGroup'):
+            for obj in graph.by_isa[isa]:
+                path = project_path(file_path(obj.uuid, graph.objects, graph.parents, cache))
+                if path is not None:
+                    self.files.setdefault(path, obj.uuid)
+        # Groups with a path of their own win over name-only groups resolving to the same folder
+        self.groups = {'': graph.main_group.uuid}
+        for obj in sorted(graph.by_isa['PBXGroup'], key=lambda obj: 'path' not in obj.properties):
+            path = project_path(resolve_path(obj.uuid, graph.objects, graph.parents, cache))
+            if path is not None and (obj.uuid in graph.parents or obj is graph.main_group):
+                self.groups.setdefault(path, obj.uuid)
+
+        # (object, property) -> references held in that array property
+        self.members = defaultdict(list)
+        for reference in graph.references:
+            if reference.in_array:
+                self.members[reference.source, reference.key].append(reference)
+        # isa -> (sorted UUIDs, objects in that order), for placing new objects
+        self.by_uuid = {}
+        for isa, objects in graph.by_isa.items():
+            ordered = sorted(objects, key=lambda obj: obj.uuid)
+            self.by_uuid[isa] = ([obj.uuid for obj in ordered], ordered)
+
+        self.targets = list(graph.by_isa['PBXNativeTarget'])
+        self.new_objects = defaultdict(list)  # isa -> [(uuid, text)] of one-line objects
+        self.new_groups = {}  # uuid -> {'name', 'children'}
+        self.new_phases = {}  # uuid -> {'isa', 'name', 'files'}
+        self.appended = defaultdict(list)  # (uuid, key) -> [(entry, comment)] for existing objects
+        self.phases = {}  # (target uuid, phase name) -> phase uuid
+        self.report = {'added': [], 'existing': [], 'groups': [], 'skipped': []}
+
+    def new_uuid(self, kind, key):
+        """A UUID for the object of this kind made for key, unused anywhere in the project"""
+        for attempt in range(1 << 16):
+            uuid = hashlib.blake2b(f"{kind}\0{key}\0{attempt}".encode('utf-8'), digest_size=12).hexdigest().upper()
+            if uuid not in self.used:
+                self.used.add(uuid)
+                return uuid
+        raise RuntimeError(f"No free UUID for {kind} {key}")
+
+    def target_for(self, path):
+        """The target named on the command line, else the one named like the file's top folder, else the app"""
+        if self.target_name:
+            candidates = [target for target in self.targets if target.name == self.target_name]
+            if not candidates:
+                raise LookupError(f"No target named {self.target_name!r}")
+            return candidates[0]
+        top = path.split('/', 1)[0]
+        for target in self.targets:
+            if target.name == top:
+                return target
+        for target in self.targets:
+            if target.properties.get('productType') == 'com.apple.product-type.application':
+                return target
+        return self.targets[0] if self.targets else None
+
+    def append(self, container, key, uuid, comment):
+        """List uuid in an array property of a new group or phase, or queue it for an existing object's array"""
+        if container in self.new_groups:
+            self.new_groups[container]['children'].append((uuid, comment))
+        elif container in self.new_phases:
+            self.new_phases[container]['files'].append((uuid, comment))
+        else:
+            self.appended[container, key].append((uuid, comment))
+
+    def group_for(self, folder):
+        """UUID of the group for a project folder, creating it (and its missing parents)"""
+        if folder in self.groups:
+            return self.groups[folder]
+        parent = self.group_for(os.path.dirname(folder))
+        name = os.path.basename(folder)
+        uuid = self.new_uuid('PBXGroup', folder)
+        self.new_groups[uuid] = {'name': name, 'children': []}
+        self.append(parent, 'children', uuid, name)
+        self.groups[folder] = uuid
+        self.report['groups'].append(folder)
+        return uuid
+
+    def phase_for(self, target, phase):
+        """UUID of the target's Sources or Resources phase, creating it if the target has none"""
+        key = (target.uuid, phase)
+        if key not in self.phases:
+            isa = f"PBX{phase}BuildPhase"
+            existing = [uuid for uuid in target.properties.get('buildPhases', ())
+                        if uuid in self.graph.objects and self.graph.objects[uuid].isa == isa]
+            if existing:
+                self.phases[key] = existing[0]
+            else:
+                uuid = self.new_uuid(isa, target.uuid)
+                self.new_phases[uuid] = {'isa': isa, 'name': phase, 'files': []}
+                self.append(target.uuid, 'buildPhases', uuid, phase)
+                self.phases[key] = uuid
+        return self.phases[key]
+
+    def add(self, path):
+        """Queue one file, given relative to the project folder; 'added' or 'existing'"""
+        if path in self.files:
+            self.report['existing'].append(path)
+            return 'existing'
+        folder, name = os.path.split(path)
+        group = self.group_for(folder)
+        file_ref = self.new_uuid('PBXFileReference', path)
+        last_known_type, phase = file_type(name)
+        self.new_objects['PBXFileReference'].append((file_ref, (
+            f"\t\t{file_ref} /* {name} */ = {{isa = PBXFileReference; lastKnownFileType = {quote(last_known_type)}; "
+            f"path = {quote(name)}; sourceTree = \"<group>\"; }};\n"
+        )))
+        self.append(group, 'children', file_ref, name)
+
+        target = self.target_for(path) if phase else None
+        if target is not None:
+            build_file = self.new_uuid('PBXBuildFile', f"{target.uuid}/{path}")
+            self.new_objects['PBXBuildFile'].append((build_file, (
+                f"\t\t{build_file} /* {name} in {phase} */ = {{isa = PBXBuildFile; fileRef = {file_ref} /* {name} */; }};\n"
+            )))
+            self.append(self.phase_for(target, phase), 'files', build_file, f"{name} in {phase}")
+        self.files[path] = file_ref
+        self.report['added'].append({'path': path, 'fileRef': file_ref, 'target': target.name if target else None,
+                                     'phase': phase if target else None})
+        return 'added'
+
+    def object_offset(self, isa, uuid):
+        """Where a new object goes: before the first object of its isa with a larger UUID, else after the last"""
+        uuids, existing = self.by_uuid.get(isa, ([], []))
+        index = bisect_right(uuids, uuid)
+        if index < len(existing):
+            return self.text.rfind('\n', 0, existing[index].start) + 1
+        if existing:
+            last = max(existing, key=lambda obj: obj.end)
+            line_end = self.text.find('\n', last.end)
+            return len(self.text) if line_end < 0 else line_end + 1
+        return None
+
+    def section_insertion(self, isa, body):
+        """(offset, text) of a new section for an isa the project has no objects of, in alphabetical place"""
+        for match in SECTION_BEGIN_PATTERN.finditer(self.text):
+            if match.group(1) > isa:
+                return match.start(), f"/* Begin {isa} section */\n{body}/* End {isa} section */\n\n"
+        ends = list(SECTION_END_PATTERN.finditer(self.text))
+        if not ends:
+            raise ValueError("Project has no object sections to add to")
+        return ends[-1].end(), f"\n/* Begin {isa} section */\n{body}/* End {isa} section */\n"
+
+    def array_insertion(self, uuid, key, entries):
+        """(offset, text) appending UUID /* comment */ entries to an existing object's array property"""
+        obj = self.graph.objects[uuid]
+        lines = self.entry_lines(entries)
+        inline = ''.join(f" {entry} /* {comment} */," for entry, comment in entries)
+        members = self.members.get((uuid, key))
+        if members:
+            last = max(members, key=lambda reference: reference.end)
+            tail = ELEMENT_TAIL_PATTERN.match(self.text, last.end)
+            if tail is None:
+                return last.end, ',' + inline.rstrip(',')
+            position = tail.end()
+        else:
+            opening = re.compile(rf'\b{key}\s*=\s*\(').search(self.text, obj.start, obj.end)
+            if opening is None:
+                raise ValueError(f"{obj.isa} {uuid} has no {key} array")
+            position = opening.end()
+        closing = re.compile(r'[ \t]*\n([ \t]*)\)').match(self.text, position)
+        if closing:
+            return closing.start(1), lines
+        return position, inline
+
+    @staticmethod
+    def entry_lines(entries):
+        return ''.join(f"\t\t\t\t{entry} /* {comment} */,\n" for entry, comment in entries)
+
+    def group_text(self, uuid):
+        group = self.new_groups[uuid]
+        return (
+            f"\t\t{uuid} /* {group['name']} */ = {{\n"
+            f"\t\t\tisa = PBXGroup;\n"
+            f"\t\t\tchildren = (\n"
+            f"{self.entry_lines(group['children'])}"
+            f"\t\t\t);\n"
+            f"\t\t\tpath = {quote(group['name'])};\n"
+            f"\t\t\tsourceTree = \"<group>\";\n"
+            f"\t\t}};\n"
+        )
+
+    def phase_text(self, uuid):
+        phase = self.new_phases[uuid]
+        return (
+            f"\t\t{uuid} /* {phase['name']} */ = {{\n"
+            f"\t\t\tisa = {phase['isa']};\n"
+            f"\t\t\tbuildActionMask = 2147483647;\n"
+            f"\t\t\tfiles = (\n"
+            f"{self.entry_lines(phase['files'])}"
+            f"\t\t\t);\n"
+            f"\t\t\trunOnlyForDeploymentPostprocessing = 0;\n"
+            f"\t\t}};\n"
+        )
+
+    def apply(self):
+        """The project text with every queued object and entry in place"""
+        insertions = []
+        objects = defaultdict(list, {isa: list(entries) for isa, entries in self.new_objects.items()})
+        objects['PBXGroup'].extend((uuid, self.group_text(uuid)) for uuid in self.new_groups)
+        for uuid, phase in self.new_phases.items():
+            objects[phase['isa']].append((uuid, self.phase_text(uuid)))
+
+        for isa, entries in objects.items():
+            orphans = []
+            for uuid, text in sorted(entries):
+                offset = self.object_offset(isa, uuid)
+                if offset is None:
+                    orphans.append(text)
+                else:
+                    insertions.append((offset, uuid, text))
+            if orphans:
+                offset, text = self.section_insertion(isa, ''.join(orphans))
+                insertions.append((offset, '', text))
+        for (uuid, key), entries in self.appended.items():
+            offset, text = self.array_insertion(uuid, key, entries)
+            insertions.append((offset, '', text))
+
+        parts, position = [], 0
+        for offset, _, text in sorted(insertions, key=lambda insertion: (insertion[0], insertion[1])):
+            parts.append(self.text[position:offset])
+            parts.append(text)
+            position = offset
+        parts.append(self.text[position:])
+        return ''.join(parts)
+
+def issue_keys(graph):
+    return {(issue.kind, issue.uuid, issue.message) for issue in validate_graph(graph) if issue.severity == 'error'}
+
+def add_files(project_file, paths, target=None, dry_run=False):
+    """Add paths (relative to the current directory) to project_file; a JSON-serializable report"""
+    with open(project_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    graph = ProjectGraph(content)
+    inserter = FileInserter(graph, target)
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(project_file)))
+
+    for path in expand_paths(paths):
+        relative = os.path.relpath(os.path.abspath(path), project_root)
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if relative.startswith('..'):
+            inserter.report['skipped'].append({'path': path, 'reason': 'outside the project folder'})
+        elif not os.path.exists(path):
+            inserter.report['skipped'].append({'path': path, 'reason': 'not found'})
+        elif extension in UNSUPPORTED_EXTENSIONS:
+            inserter.report['skipped'].append({'path': path, 'reason': f'.{extension} is not supported'})
+        else:
+            inserter.add(relative.replace(os.sep, '/'))
+
+    report = inserter.report
+    report.update({'project': project_file, 'written': False, 'backup': None})
+    if not report['added']:
+        return report
+
+    updated = inserter.apply()
+    # The result must parse, resolve every new file to its path and add no integrity errors
+    new_graph = ProjectGraph(updated)
+    errors = issue_keys(new_graph) - issue_keys(graph)
+    if errors:
+        raise ValueError(f"Adding files would leave {len(errors)} integrity errors, first: {sorted(errors)[0][2]}")
+    for entry in report['added']:
+        if project_path(new_graph.path(entry['fileRef'])) != entry['path']:
+            raise ValueError(f"{entry['path']} would resolve to {new_graph.path(entry['fileRef'])}")
+    if dry_run:
+        return report
+
+    report['backup'] = BackupStore.for_project(project_file).snapshot(
+        project_file, f"before adding {len(report['added'])} files")['id']
+    with open(project_file, 'w', encoding='utf-8') as f:
+        f.write(updated)
+    report['written'] = True
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', help='Files or folders to add (folders add every file under them)')
+    parser.add_argument('--project', default="JubileeMobileBay.xcodeproj/project.pbxproj", help='project.pbxproj to add to')
+    parser.add_argument('--from', dest='list_file', help="Read paths from this file, one per line ('-' for stdin)")
+    parser.add_argument('--target', help='Target to build the files in (default: the target named like their top folder, else the app)')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would be added without writing anything')
+    parser.add_argument('--report', help='Write a JSON report here')
+    args = parser.parse_args()
+
+    paths = list(args.paths)
+    if args.list_file:
+        handle = sys.stdin if args.list_file == '-' else open(args.list_file, 'r', encoding='utf-8')
+        with handle:
+            paths.extend(line.strip() for line in handle if line.strip() and not line.startswith('#'))
+    if not paths:
+        parser.error('no files to add')
+    if not os.path.exists(args.project):
+        print(f"❌ Error: Project file not found: {args.project}")
+        sys.exit(1)
+
+    print(f"📎 Adding files to {args.project}")
+    print("=" * 50)
+    try:
+        report = add_files(args.project, paths, args.target, args.dry_run)
+    except (ParseError, LookupError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    for entry in report['added']:
+        destination = f"{entry['target']} ({entry['phase']})" if entry['target'] else "no build phase"
+        print(f"  ➕ {entry['path']} -> {destination}")
+    for folder in report['groups']:
+        print(f"  📁 New group: {folder}")
+    for entry in report['skipped']:
+        print(f"  ⏭️  {entry['path']}: {entry['reason']}")
+    print(f"\n{len(report['added'])} added, {len(report['existing'])} already in the project, "
+          f"{len(report['skipped'])} skipped, {len(report['groups'])} new groups")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📋 Report written to: {args.report}")
+    if report['written']:
+        print(f"\n✅ Project updated. Backup saved as snapshot: {report['backup']}")
+    elif report['added']:
+        print("\n📋 Dry run: nothing was written.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Content-addressed backup store for project.pbxproj
+Snapshots are stored as content-defined chunks named by their SHA-256:
+- A chunk ends after a line whose CRC hits the boundary mask, so an edit
+  only changes the chunks around it and every other chunk is shared with
+  earlier snapshots
+- A snapshot is a small JSON list of chunk hashes, so near-identical
+  backups cost a few compressed chunks each
+- Restores rebuild the file from its chunks, check its hash and replace
+  the project atomically
+- gc drops snapshots outside the retention policy, then every chunk no
+  remaining snapshot uses
+"""
+
+import os
+import sys
+import json
+import zlib
+import glob
+import hashlib
+import tempfile
+import shutil
+import argparse
+from datetime import datetime, timedelta
+
+STORE_VERSION = 1
+# A chunk ends after a line whose CRC is 0 modulo this, so chunks average
+# about this many lines past MIN_CHUNK_BYTES (10-20 KiB of project.pbxproj,
+# a few KiB once compressed, about one filesystem block)
+CHUNK_LINES = 128
+# Boundaries are ignored in a chunk's first MIN_CHUNK_BYTES, so runs of
+# identical short lines (e.g. '\t\t\t);') do not cut tiny chunks, and a
+# chunk is cut anyway at MAX_CHUNK_BYTES
+MIN_CHUNK_BYTES = 4 << 10
+MAX_CHUNK_BYTES = 1 << 20
+# Retention gc applies unless told otherwise
+DEFAULT_KEEP_LAST = 10
+DEFAULT_KEEP_DAILY = 7
+
+def chunk_boundaries(data):
+    """End offsets of the content-defined chunks of data"""
+    boundaries = []
+    start = position = 0
+    size = len(data)
+    while position < size:
+        end = data.find(b'\n', position)
+        end = size if end < 0 else end + 1
+        # Very long lines (or files without newlines) are cut at MAX_CHUNK_BYTES
+        end = min(end, start + MAX_CHUNK_BYTES)
+        if (end - start >= MAX_CHUNK_BYTES or end == size
+                or (end - start >= MIN_CHUNK_BYTES and zlib.crc32(data[position:end]) % CHUNK_LINES == 0)):
+            boundaries.append(end)
+            start = end
+        position = end
+    return boundaries
+
+def chunk_digest(chunk):
+    return hashlib.sha256(chunk).hexdigest()
+
+def default_store_path(project_file):
+    """xcuserdata/backups inside the .xcodeproj, per-user (this repo tracks xcuserdata, so .gitignore lists backups/)"""
+    return os.path.join(os.path.dirname(os.path.abspath(project_file)), 'xcuserdata', 'backups')
+
+def write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+class BackupStore:
+    """Snapshots of project files, deduplicated by chunk
+
+    The store is a directory with chunks/<2 hex>/<sha256> (zlib-compressed
+    chunk bytes) and snapshots/<id>.json, each recording the project path,
+    creation time, label, size, SHA-256 and chunk list of one snapshot.
+    Snapshot ids start with their creation time to the second.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.chunk_dir = os.path.join(path, 'chunks')
+        self.snapshot_dir = os.path.join(path, 'snapshots')
+
+    @classmethod
+    def for_project(cls, project_file, store_path=None):
+        return cls(store_path or default_store_path(project_file))
+
+    def chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def snapshot_path(self, snapshot_id):
+        return os.path.join(self.snapshot_dir, f"{snapshot_id}.json")
+
+    def snapshot(self, project_file, label='', created=None, source=None):
+        """Store the current content of project_file (or of source, a copy of it); its snapshot record
+
+        Only chunks the store does not have yet are written. created
+        defaults to now (import passes a legacy copy's mtime).
+        """
+        with open(source or project_file, 'rb') as f:
+            data = f.read()
+        created = created or datetime.now()
+        digest = hashlib.sha256(data).hexdigest()
+        snapshot_id = f"{created.strftime('%Y%m%d_%H%M%S')}_{digest[:8]}"
+        if os.path.exists(self.snapshot_path(snapshot_id)):
+            return self.load(snapshot_id)
+
+        chunks = []
+        new_bytes = 0
+        start = 0
+        for end in chunk_boundaries(data):
+            chunk = data[start:end]
+            chunk_hash = chunk_digest(chunk)
+            path = self.chunk_path(chunk_hash)
+            if not os.path.exists(path):
+                compressed = zlib.compress(chunk, 6)
+                write_atomically(path, compressed)
+                new_bytes += len(compressed)
+            chunks.append(chunk_hash)
+            start = end
+
+        record = {
+            'version': STORE_VERSION,
+            'id': snapshot_id,
+            'project': os.path.abspath(project_file),
+            'created': created.isoformat(timespec='microseconds'),
+            'label': label,
+            'size': len(data),
+            'sha256': digest,
+            'chunks': chunks,
+            'new_bytes': new_bytes
+        }
+        write_atomically(self.snapshot_path(snapshot_id), json.dumps(record, indent=1).encode('utf-8'))
+        return record
+
+    def load(self, snapshot_id):
+        with open(self.snapshot_path(snapshot_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def snapshots(self):
+        """Every snapshot record, oldest first"""
+        try:
+            names = sorted(os.listdir(self.snapshot_dir))
+        except FileNotFoundError:
+            return []
+        records = [self.load(name[:-len('.json')]) for name in names if name.endswith('.json')]
+        return sorted(records, key=lambda record: record['created'])
+
+    def resolve(self, snapshot_id=None):
+        """The snapshot with this id or unique id prefix, or the latest one"""
+        snapshots = self.snapshots()
+        if not snapshots:
+            raise LookupError(f"No snapshots in {self.path}")
+        if snapshot_id is None:
+            return snapshots[-1]
+        matches = [record for record in snapshots if record['id'].startswith(snapshot_id)]
+        if len(matches) != 1:
+            raise LookupError(f"{len(matches) or 'No'} snapshots match {snapshot_id!r}")
+        return matches[0]
+
+    def read(self, record):
+        """The bytes of a snapshot, checked against its SHA-256"""
+        parts = []
+        for chunk_hash in record['chunks']:
+            with open(self.chunk_path(chunk_hash), 'rb') as f:
+                parts.append(zlib.decompress(f.read()))
+        data = b''.join(parts)
+        if hashlib.sha256(data).hexdigest() != record['sha256']:
+            raise ValueError(f"Snapshot {record['id']} is corrupt: its chunks do not match its hash")
+        return data
+
+    def restore(self, record, project_file):
+        """Write a snapshot over project_file
+
+        The path the snapshot was taken from is only informational: the
+        checkout may have moved, and a shared store holds other checkouts'
+        snapshots. The file is replaced atomically. Unless it already matches the
+        snapshot, its current content is snapshotted first, so a restore
+        can itself be undone. Returns that snapshot, or None.
+        """
+        data = self.read(record)
+        previous = None
+        if os.path.exists(project_file):
+            with open(project_file, 'rb') as f:
+                current = hashlib.sha256(f.read()).hexdigest()
+            if current == record['sha256']:
+                return None
+            previous = self.snapshot(project_file, f"before restoring {record['id']}")
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(project_file)), prefix='.restore-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+            if os.path.exists(project_file):
+                shutil.copymode(project_file, temp_path)
+            os.replace(temp_path, project_file)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return previous
+
+    def retained(self, keep_last=DEFAULT_KEEP_LAST, keep_daily=DEFAULT_KEEP_DAILY, keep_days=None, now=None):
+        """Ids of the snapshots a retention policy keeps
+
+        keep_last newest snapshots, the newest snapshot of each of the
+        keep_daily most recent days that have any, and every snapshot less
+        than keep_days old. The newest snapshot is always kept.
+        """
+        snapshots = self.snapshots()
+        keep = {record['id'] for record in snapshots[-max(keep_last, 1):]}
+        days = {}
+        for record in reversed(snapshots):
+            days.setdefault(record['created'][:10], record['id'])
+        keep.update(list(days.values())[:keep_daily])
+        if keep_days is not None:
+            cutoff = ((now or datetime.now()) - timedelta(days=keep_days)).isoformat(timespec='microseconds')
+            keep.update(record['id'] for record in snapshots if record['created'] >= cutoff)
+        return keep
+
+    def gc(self, keep_last=DEFAULT_KEEP_LAST, keep_daily=DEFAULT_KEEP_DAILY, keep_days=None, dry_run=False):
+        """Delete snapshots the retention policy does not keep, then unreferenced chunks; a report"""
+        keep = self.retained(keep_last, keep_daily, keep_days)
+        snapshots = self.snapshots()
+        removed = [record['id'] for record in snapshots if record['id'] not in keep]
+        used = {chunk_hash for record in snapshots if record['id'] in keep for chunk_hash in record['chunks']}
+
+        report = {'snapshots_removed': removed, 'snapshots_kept': len(snapshots) - len(removed),
+                  'chunks_removed': 0, 'bytes_freed': 0}
+        for snapshot_id in removed:
+            if not dry_run:
+                os.unlink(self.snapshot_path(snapshot_id))
+        for path in glob.glob(os.path.join(self.chunk_dir, '*', '*')):
+            if os.path.basename(path) in used or os.path.basename(path).startswith('.tmp-'):
+                continue
+            report['chunks_removed'] += 1
+            report['bytes_freed'] += os.path.getsize(path)
+            if not dry_run:
+                os.unlink(path)
+        return report
+
+    def stats(self):
+        """Bytes the snapshots hold against bytes the store takes on disk"""
+        snapshots = self.snapshots()
+        chunks = glob.glob(os.path.join(self.chunk_dir, '*', '*'))
+        return {
+            'snapshots': len(snapshots),
+            'chunks': len(chunks),
+            'logical_bytes': sum(record['size'] for record in snapshots),
+            'stored_bytes': sum(os.path.getsize(path) for path in chunks)
+        }
+
+def legacy_backups(project_file):
+    """Full-copy backups made before the store existed, oldest first"""
+    paths = glob.glob(f"{glob.escape(project_file)}.backup*")
+    return sorted(paths, key=os.path.getmtime)
+
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--project', default="JubileeMobileBay.xcodeproj/project.pbxproj", help='project.pbxproj the store backs up')
+    parser.add_argument('--store', help='Store directory (default: xcuserdata/backups in the .xcodeproj)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    snapshot = commands.add_parser('snapshot', help='Back up the project now')
+    snapshot.add_argument('-m', '--label', default='manual', help='Note stored with the snapshot')
+    commands.add_parser('list', help='List snapshots, oldest first')
+    restore = commands.add_parser('restore', help='Restore a snapshot over --project')
+    restore.add_argument('snapshot', nargs='?', help='Snapshot id or unique prefix (default: the latest)')
+    restore.add_argument('-o', '--output', help='Write the snapshot here instead of over the project')
+    restore.add_argument('-y', '--yes', action='store_true', help='Do not ask for confirmation')
+    gc = commands.add_parser('gc', help='Drop snapshots outside the retention policy and unused chunks')
+    gc.add_argument('--keep-last', type=int, default=DEFAULT_KEEP_LAST, help='Newest snapshots to keep')
+    gc.add_argument('--keep-daily', type=int, default=DEFAULT_KEEP_DAILY, help='Days to keep the newest snapshot of')
+    gc.add_argument('--keep-days', type=float, help='Keep every snapshot younger than this many days')
+    gc.add_argument('--dry-run', action='store_true', help='Report what would be removed')
+    legacy = commands.add_parser('import', help='Store the project.pbxproj.backup* copies made before the store existed')
+    legacy.add_argument('paths', nargs='*', help='Backup copies to import (default: the project\'s .backup* files)')
+    args = parser.parse_args()
+
+    store = BackupStore.for_project(args.project, args.store)
+
+    if args.command == 'snapshot':
+        record = store.snapshot(args.project, args.label)
+        print(f"✅ Snapshot {record['id']} ({format_size(record['size'])}, {format_size(record['new_bytes'])} new)")
+
+    elif args.command == 'import':
+        paths = args.paths or legacy_backups(args.project)
+        if not paths:
+            print("✅ No legacy backups to import")
+        for path in paths:
+            created = datetime.fromtimestamp(os.path.getmtime(path))
+            record = store.snapshot(args.project, os.path.basename(path), created, source=path)
+            print(f"  📥 {path} -> {record['id']} ({format_size(record['new_bytes'])} new)")
+        if paths:
+            print("\n   The copies can now be deleted.")
+
+    elif args.command == 'list':
+        snapshots = store.snapshots()
+        if not snapshots:
+            print(f"No snapshots in {store.path}")
+            return
+        for record in snapshots:
+            print(f"  {record['id']}  {record['created'][:19].replace('T', ' ')}  {format_size(record['size']):>10}  "
+                  f"{len(record['chunks']):>5} chunks  {record['label']}")
+        stats = store.stats()
+        print(f"\n{stats['snapshots']} snapshots, {format_size(stats['logical_bytes'])} of project files "
+              f"in {format_size(stats['stored_bytes'])} ({stats['chunks']} chunks)")
+
+    elif args.command == 'restore':
+        try:
+            record = store.resolve(args.snapshot)
+        except LookupError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        target = args.output or args.project
+        print(f"✅ Found snapshot {record['id']} ({record['label'] or 'no label'}, {record['created'][:19].replace('T', ' ')})")
+        if record['project'] != os.path.abspath(target):
+            print(f"   Taken from {record['project']}")
+        if not args.yes and not args.output:
+            print(f"\n⚠️  This will restore {target} from the snapshot.")
+            print("   Its current content is snapshotted first.")
+            if input("Continue? (yes/no): ").strip().lower() != 'yes':
+                print("❌ Cancelled.")
+                return
+        previous = store.restore(record, target)
+        print(f"✅ Restored {target}")
+        if previous:
+            print(f"   Previous content saved as snapshot {previous['id']}")
+
+    elif args.command == 'gc':
+        report = store.gc(args.keep_last, args.keep_daily, args.keep_days, args.dry_run)
+        verb = "Would remove" if args.dry_run else "Removed"
+        print(f"🧹 {verb} {len(report['snapshots_removed'])} snapshots and {report['chunks_removed']} chunks "
+              f"({format_size(report['bytes_freed'])}), {report['snapshots_kept']} snapshots kept")
+
+if __name__ == "__main__":
+    main()
@@ -10,225 +10,1175 @@ Based on lessons learned:
 - Provide detailed logging for debugging
 """
 
+import io
 import re
 import os
 import sys
+import json
+import mmap
+import zlib
+import hashlib
+import time
+import shlex
 import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from bisect import bisect_right
 from datetime import datetime
-from collections import defaultdict, OrderedDict
+from itertools import accumulate, repeat
+from collections import Counter, defaultdict, OrderedDict
+from typing import NamedTuple
+
+from backup_store import BackupStore
+from pbxproj import ParseError, PBXObject, ProjectGraph, file_path, unescape, validate_graph
+
+# UUID /* comment */ tokens, e.g. 0A1B... /* Foo.swift */, are found as the comments
+# a UUID precedes: led by the /* literal, the scan is several times faster than
+# one led by the UUID. Group 2 is set when the token opens the object's entry
+COMMENT_PATTERN = re.compile(r'/\*\s*(.*?)\s*\*/(\s*=\s*\{)?')
+UUID_PATTERN = re.compile(r'[A-F0-9]{24}')
+SECTION_PATTERN = re.compile(r'/\* (Begin|End) (\w+) section \*/')
+DEFINITION_PATTERN = re.compile(r'\s*=\s*\{')
+# Any object UUID, with the /* comment */ that follows it if there is one
+UUID_TOKEN_PATTERN = re.compile(r'(?<![0-9A-Za-z])([0-9A-F]{24})(?![0-9A-Za-z])(?:\s*/\*\s*(.*?)\s*\*/)?')
+# Comments that name a file, used when the project has no file sections
+FILENAME_PATTERN = re.compile(r'[^/]*\.[\w+-]+')
+
+# Sections whose objects are files on disk
+FILE_SECTIONS = {'PBXFileReference', 'PBXVariantGroup', 'XCVersionGroup'}
+GROUP_SECTIONS = {'PBXGroup', 'PBXVariantGroup', 'XCVersionGroup'}
+REQUIRED_SECTIONS = [
+    '/* Begin PBXBuildFile section */',
+    '/* End PBXBuildFile section */',
+    '/* Begin PBXFileReference section */',
+    '/* End PBXFileReference section */',
+    '/* Begin PBXGroup section */',
+    '/* End PBXGroup section */',
+    '/* Begin PBXProject section */',
+    '/* End PBXProject section */'
+]
+
+# Streaming mode works on the memory-mapped bytes. Xcode writes PBXBuildFile
+# and PBXFileReference entries on one line and groups over several; the
+# patterns start at the isa so the regex engine can skip ahead to it, and
+# the UUID is read back from the start of the line
+LINE_OBJECT_BYTES = re.compile(rb' = \{isa = (PBXBuildFile|PBXFileReference);(.*?)\};[ \t]*$', re.M)
+GROUP_OBJECT_BYTES = re.compile(rb' = \{\s*isa = (PBXGroup|PBXVariantGroup|XCVersionGroup);(.*?)^[ \t]*\};', re.M | re.S)
+OBJECT_UUID_BYTES = re.compile(rb'[ \t]*([0-9A-F]{24})\b')
+PROPERTY_BYTES = re.compile(rb'(\w+) = ("(?:[^"\\]|\\.)*"|[^\s;(){}]+)(?: /\*[^\n]*?\*/)?;')
+FILE_REF_BYTES = re.compile(rb'fileRef = ([0-9A-F]{24})\b')
+CHILDREN_BYTES = re.compile(rb'children = \((.*?)\);', re.S)
+UUID_BYTES = re.compile(rb'\b[0-9A-F]{24}\b')
+COMMENT_BYTES = re.compile(rb'[ \t]*/\*[ \t]*([^\n]*?)[ \t]*\*/')
+SECTION_BYTES = re.compile(SECTION_PATTERN.pattern.encode())
+# A line opening an object's entry (group 3 matched) or holding just an
+# array entry, e.g. a group child or build phase file; group 2 is the
+# comment naming the object. Matching from the newline lets the regex
+# engine skip ahead to line starts
+DROPPABLE_LINE_BYTES = re.compile(
+    rb'\n[ \t]*([0-9A-F]{24})(?:[ \t]*/\*[ \t]*([^\n]*?)[ \t]*\*/)?[ \t]*(?:(=)[ \t]*\{|,[ \t]*$)', re.M
+)
+STREAM_CHUNK_BYTES = 1 << 20
+# Projects at least this large are cleaned in streaming mode
+STREAM_THRESHOLD_BYTES = 64 << 20
+
+# Directories batch mode does not search for projects
+SKIPPED_DIRECTORIES = {'build', 'DerivedData', 'Pods', 'Carthage', 'node_modules'}
+POLICIES = ('ask', 'dry-run', 'apply')
+
+# Sections watch mode indexes: file objects and the groups that give them their paths
+WATCHED_SECTIONS = FILE_SECTIONS | GROUP_SECTIONS
+# The line opening any object's entry, with or without a comment
+OBJECT_HEAD_PATTERN = re.compile(r'^[ \t]*([0-9A-F]{24})(?: /\*.*?\*/)? = \{', re.MULTILINE)
+# Watched sections are split into blocks starting at objects whose UUID
+# hashes to 0 modulo this, so an edit re-parses about this many objects
+# and inserting or deleting objects does not shift the other blocks
+BLOCK_OBJECTS = 32
+INDEX_VERSION = 1
 
 def create_backup(project_file):
-    """Create timestamped backup of project file"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = f"{project_file}.backup_{timestamp}"
-    shutil.copy2(project_file, backup_path)
-    print(f"✅ Created backup: {backup_path}")
-    return backup_path
+    """Snapshot the project file into its backup store; the snapshot id"""
+    store = BackupStore.for_project(project_file)
+    snapshot = store.snapshot(project_file, 'before duplicate cleanup')
+    print(f"✅ Created backup: snapshot {snapshot['id']} in {store.path} ({snapshot['new_bytes']:,} new bytes)")
+    return snapshot['id']
 
-def parse_file_references(content):
-    """Parse all file references with their UUIDs and contexts"""
-    # Pattern to match file references: UUID /* filename */
-    file_pattern = r'([A-F0-9]{24})\s*/\*\s*([^*]+\.(swift|m|h|storyboard|xib))\s*\*/'
+class FileReference(NamedTuple):
+    """One UUID /* name */ token in project.pbxproj"""
+    uuid: str
+    filename: str
+    line: int
+    section: str  # Object section the token is in, e.g. 'PBXBuildFile' ('' if none)
+    definition: bool  # The token opens the object's own entry
+    full_match: str
+
+    @property
+    def file_type(self):
+        return os.path.splitext(self.filename)[1].lstrip('.')
+
+def line_starts(content):
+    """Offset of the first character of every line"""
+    return list(accumulate((len(line) + 1 for line in content.split('\n')), initial=0))[:-1]
+
+def section_boundaries(content):
+    """(offset, section name) of every section marker; the name is '' after an End marker"""
+    return [(match.start(), match.group(2) if match.group(1) == 'Begin' else '')
+            for match in SECTION_PATTERN.finditer(content)]
+
+def scan_references(content):
+    """(uuid, offset, comment match) of every UUID /* comment */ token, in one pass over content"""
+    for match in COMMENT_PATTERN.finditer(content):
+        end = match.start()
+        while end and content[end - 1].isspace():
+            end -= 1
+        if UUID_PATTERN.fullmatch(content, end - 24, end):
+            yield content[end - 24:end], end - 24, match
+
+def references_at(content, tokens, boundaries=None):
+    """FileReferences of scan_references tokens, in order
     
-    file_refs = []
-    for match in re.finditer(file_pattern, content):
-        uuid = match.group(1)
-        filename = match.group(2)
-        # Find the line number for context
-        line_start = content.rfind('\n', 0, match.start()) + 1
-        line_num = content[:line_start].count('\n') + 1
-        file_refs.append({
-            'uuid': uuid,
-            'filename': filename,
-            'line': line_num,
-            'full_match': match.group(0)
-        })
-    
-    return file_refs
-
-def find_file_sections(lines):
-    """Find where each UUID appears in different sections"""
-    sections = {
-        'PBXBuildFile': [],
-        'PBXFileReference': [],
-        'PBXGroup': [],
-        'PBXSourcesBuildPhase': [],
-        'PBXResourcesBuildPhase': []
-    }
+    Line numbers are counted between consecutive tokens and sections found
+    by bisecting the section offsets.
+    """
+    boundaries = boundaries if boundaries is not None else section_boundaries(content)
+    offsets = [offset for offset, _ in boundaries]
+    line, counted = 1, 0
+    for uuid, position, match in tokens:
+        line += content.count('\n', counted, position)
+        counted = position
+        boundary = bisect_right(offsets, position) - 1
+        yield FileReference(
+            uuid,
+            match.group(1),
+            line,
+            boundaries[boundary][1] if boundary >= 0 else '',
+            match.group(2) is not None,
+            content[position:match.end() if match.group(2) is None else match.start(2)]
+        )
+
+def tokenize_references(content, uuids=None):
+    """Every UUID /* comment */ token as a FileReference, in one pass over content
     
-    current_section = None
-    for i, line in enumerate(lines):
-        # Detect section starts
-        for section in sections:
-            if f"/* Begin {section} section */" in line:
-                current_section = section
-            elif f"/* End {section} section */" in line:
-                current_section = None
-        
-        if current_section:
-            sections[current_section].append(i)
+    With uuids, only tokens of those objects are returned.
+    """
+    tokens = scan_references(content)
+    if uuids is not None:
+        tokens = (token for token in tokens if token[0] in uuids)
+    return references_at(content, tokens)
+
+def parse_file_references(content):
+    """Parse every reference to a file object, of any file type, with its context
+    
+    The file objects are those defined in a file section, collected in the
+    same pass over content as the tokens; without file sections, those whose
+    comment names a file.
+    """
+    boundaries = section_boundaries(content)
+    offsets = [offset for offset, _ in boundaries]
+    tokens = []
+    files = set()
+    for token in scan_references(content):
+        tokens.append(token)
+        if token[2].group(2) is not None:
+            boundary = bisect_right(offsets, token[1]) - 1
+            if boundary >= 0 and boundaries[boundary][1] in FILE_SECTIONS:
+                files.add(token[0])
+    if not files:
+        files = {uuid for uuid, _, match in tokens if FILENAME_PATTERN.fullmatch(match.group(1))}
+    return list(references_at(content, (token for token in tokens if token[0] in files), boundaries))
+
+def file_paths(content):
+    """Resolved path of every file object and the fileRef of every PBXBuildFile, from a line index of content
     
-    return sections
+    Uses the streaming scanner, so it works on projects the graph parser
+    rejects (e.g. an object defined twice by a bad merge).
+    """
+    objects, parents, build_files = scan_project_stream(content.encode('utf-8'))
+    cache = {}
+    return {uuid: file_path(uuid, objects, parents, cache)
+            for uuid, obj in objects.items() if obj.isa in FILE_SECTIONS}, build_files
 
-def analyze_duplicates(file_refs):
-    """Analyze which files have duplicates and determine which to keep"""
+def analyze_duplicates(file_refs, paths):
+    """Analyze which files have duplicates and determine which to keep
+    
+    Files are grouped by their resolved path in paths (see file_paths), so
+    same-named files in different folders are not duplicates; references to
+    files without a resolved path are never removed.
+    """
     file_groups = defaultdict(list)
     
-    for ref in file_refs:
-        file_groups[ref['filename']].append(ref)
+    # One entry per file object: its definition, or its first reference if it has none
+    seen = set()
+    for ref in sorted(file_refs, key=lambda x: not x.definition):
+        if ref.uuid not in seen and ref.uuid in paths:
+            seen.add(ref.uuid)
+            file_groups[paths[ref.uuid]].append(ref)
     
     duplicates = {}
-    for filename, refs in file_groups.items():
+    for path, refs in file_groups.items():
         if len(refs) > 1:
             # Sort by line number - keep the first occurrence
-            refs.sort(key=lambda x: x['line'])
-            duplicates[filename] = {
+            refs.sort(key=lambda x: x.line)
+            duplicates[path] = {
                 'keep': refs[0],
                 'remove': refs[1:]
             }
     
     return duplicates
 
-def get_uuid_dependencies(content, uuid):
-    """Find all lines that reference a given UUID"""
-    lines = content.split('\n')
-    dependent_lines = []
+def analyze_graph_duplicates(graph):
+    """Find file objects that resolve to the same path through their groups (see file_path), keeping the first defined"""
+    file_groups = defaultdict(list)
+    for isa in sorted(FILE_SECTIONS):
+        for obj in graph.by_isa.get(isa, ()):
+            file_groups[graph.file_path(obj.uuid)].append(obj)
+    
+    duplicates = {}
+    for path, objects in file_groups.items():
+        if len(objects) > 1:
+            objects.sort(key=lambda x: x.start)
+            duplicates[path] = {
+                'keep': objects[0],
+                'remove': objects[1:]
+            }
+    
+    return duplicates
+
+def get_uuid_dependencies(graph, uuid):
+    """Find all objects that reference a given UUID"""
+    return graph.referenced_by(uuid)
+
+def remove_uuid_lines(content, uuids):
+    """Drop every line naming one of uuids, in one pass over content
+    
+    Each UUID token is checked against the set once, so the cost is linear
+    in the file size however many UUIDs go. Returns the cleaned content and
+    a report: lines removed, and per removed UUID its name, section and the
+    1-based lines it was on.
+    """
+    starts = line_starts(content)
+    boundaries = section_boundaries(content)
+    offsets = [offset for offset, _ in boundaries]
     
-    for i, line in enumerate(lines):
-        if uuid in line:
-            dependent_lines.append(i)
+    lines_to_remove = set()
+    objects = {}
+    for match in UUID_TOKEN_PATTERN.finditer(content):
+        uuid = match.group(1)
+        if uuid not in uuids:
+            continue
+        position = match.start()
+        line = bisect_right(starts, position) - 1
+        lines_to_remove.add(line)
+        entry = objects.setdefault(uuid, {'name': '', 'section': '', 'lines': []})
+        entry['name'] = entry['name'] or match.group(2) or ''
+        if not entry['lines'] or entry['lines'][-1] != line + 1:
+            entry['lines'].append(line + 1)
+        if DEFINITION_PATTERN.match(content, match.end()):
+            boundary = bisect_right(offsets, position) - 1
+            entry['section'] = boundaries[boundary][1] if boundary >= 0 else ''
+    
+    # Copy the kept runs of lines
+    kept = []
+    position = 0
+    for line in sorted(lines_to_remove):
+        kept.append(content[position:starts[line]])
+        position = starts[line + 1] if line + 1 < len(starts) else len(content)
+    kept.append(content[position:])
     
-    return dependent_lines
+    return ''.join(kept), {'lines_removed': len(lines_to_remove), 'objects': objects}
 
-def remove_duplicate_references(content, duplicates):
-    """Remove duplicate file references and all their associated entries"""
-    lines = content.split('\n')
-    sections = find_file_sections(lines)
+def remove_duplicate_references(content, duplicates, graph=None, build_files=None):
+    """Remove duplicate file references and all their associated entries
     
+    With the project graph, removal cascades through the object graph and
+    the later definitions of objects defined more than once go too;
+    without it (the file does not parse), every line naming a UUID goes,
+    including the PBXBuildFiles of the removed files when build_files maps
+    build file UUIDs to their fileRef (see file_paths).
+    Returns the cleaned content and a removal report (see remove_uuid_lines).
+    """
     # Collect all UUIDs to remove
     uuids_to_remove = set()
     for filename, dup_info in duplicates.items():
         for ref in dup_info['remove']:
-            uuids_to_remove.add(ref['uuid'])
+            uuids_to_remove.add(ref.uuid)
     
-    # Track lines to remove
-    lines_to_remove = set()
+    if graph is None:
+        # The build files go too, so build phases lose their entries
+        uuids_to_remove.update(uuid for uuid, file_ref in (build_files or {}).items() if file_ref in uuids_to_remove)
+        return remove_uuid_lines(content, uuids_to_remove)
+    
+    cleaned_content, removed = graph.remove(uuids_to_remove, drop_duplicates=True)
+    starts = line_starts(content)
+    objects = {
+        obj.uuid: {'name': obj.name, 'section': obj.isa, 'lines': [bisect_right(starts, obj.start)]}
+        for obj in removed
+    }
+    lines_removed = content.count('\n') - cleaned_content.count('\n')
+    return cleaned_content, {'lines_removed': lines_removed, 'objects': objects,
+                             'duplicate_definitions': [uuid for uuid, _, _ in graph.duplicate_definitions]}
+
+def print_removal_report(report, limit=10):
+    """Summarize a removal report: totals per section and the first few objects"""
+    objects = report['objects']
+    print(f"  Removed {len(objects)} objects ({report['lines_removed']} lines)")
+    if report.get('duplicate_definitions'):
+        print(f"    Later definitions of objects defined twice: {len(report['duplicate_definitions'])}")
+    for section, count in Counter(entry['section'] or 'references only' for entry in objects.values()).most_common():
+        print(f"    {section}: {count}")
+    for uuid, entry in list(objects.items())[:limit]:
+        print(f"    - {uuid} {entry['name']} (line {entry['lines'][0]})")
+    if len(objects) > limit:
+        print(f"    ... and {len(objects) - limit} more")
+
+def byte_properties(body):
+    """Scalar properties of an object body as str -> str"""
+    properties = {}
+    for key, value in PROPERTY_BYTES.findall(body):
+        value = value.decode('utf-8', 'replace')
+        properties[key.decode('ascii')] = unescape(value) if value.startswith('"') else value
+    return properties
+
+def object_uuid(mm, position):
+    """(UUID, offset) of the object whose entry opens on the line containing position, or None"""
+    match = OBJECT_UUID_BYTES.match(mm, mm.rfind(b'\n', 0, position) + 1, position)
+    return (match.group(1).decode('ascii'), match.start(1)) if match else None
+
+def scan_project_stream(mm):
+    """Index the files, groups and build files of a memory-mapped project
     
-    # Find all lines containing UUIDs to remove
-    for uuid in uuids_to_remove:
-        for i, line in enumerate(lines):
-            if uuid in line:
-                lines_to_remove.add(i)
+    Returns (objects, parents, build_files): file and group PBXObjects by
+    UUID (with byte offsets as spans), the group listing each child, and
+    the fileRef of each PBXBuildFile. Memory grows with the number of
+    objects, not with the size of the file text.
+    """
+    objects = {}
+    parents = {}
+    build_files = {}
     
-    # Create filtered content
-    filtered_lines = []
-    removed_count = 0
+    for match in LINE_OBJECT_BYTES.finditer(mm):
+        found = object_uuid(mm, match.start())
+        if found is None:
+            continue
+        uuid, start = found
+        if match.group(1) == b'PBXBuildFile':
+            file_ref = FILE_REF_BYTES.search(match.group(2))
+            if file_ref:
+                build_files[uuid] = file_ref.group(1).decode('ascii')
+            continue
+        properties = byte_properties(match.group(2))
+        properties['isa'] = 'PBXFileReference'
+        objects[uuid] = PBXObject(uuid, properties, start, match.end())
     
-    for i, line in enumerate(lines):
-        if i in lines_to_remove:
-            print(f"  Removing line {i + 1}: {line.strip()[:80]}...")
-            removed_count += 1
+    for match in GROUP_OBJECT_BYTES.finditer(mm):
+        found = object_uuid(mm, match.start())
+        if found is None:
+            continue
+        uuid, start = found
+        body = match.group(2)
+        children = CHILDREN_BYTES.search(body)
+        if children:
+            for child in UUID_BYTES.findall(children.group(1)):
+                parents.setdefault(child.decode('ascii'), uuid)
+            body = body[:children.start()] + body[children.end():]
+        properties = byte_properties(body)
+        properties['isa'] = match.group(1).decode('ascii')
+        objects[uuid] = PBXObject(uuid, properties, start, match.end())
+    
+    return objects, parents, build_files
+
+def analyze_stream_duplicates(objects, parents):
+    """analyze_graph_duplicates over a scan_project_stream index"""
+    file_groups = defaultdict(list)
+    paths = {}
+    for obj in objects.values():
+        if obj.isa in FILE_SECTIONS:
+            file_groups[file_path(obj.uuid, objects, parents, paths)].append(obj)
+    
+    duplicates = {}
+    for path, group in file_groups.items():
+        if len(group) > 1:
+            group.sort(key=lambda x: x.start)
+            duplicates[path] = {
+                'keep': group[0],
+                'remove': group[1:]
+            }
+    
+    return duplicates
+
+def stream_drop_ranges(mm, uuids, spans=None):
+    """Byte ranges of the entries defining or listing one of uuids, and a removal report (see remove_uuid_lines)
+    
+    As with the project graph, an object's whole entry is dropped, as is
+    any line that is just an array entry naming one; scalar properties such
+    as productReference are left for Xcode to report. spans maps the UUIDs
+    of multi-line objects (groups) to their PBXObject from
+    scan_project_stream, whose end closes the entry; other entries end with
+    their line. One regex pass over the line starts of the mapped file;
+    line numbers are counted as it goes.
+    """
+    boundaries = [(match.start(), match.group(2).decode('ascii') if match.group(1) == b'Begin' else '')
+                  for match in SECTION_BYTES.finditer(mm)]
+    offsets = [offset for offset, _ in boundaries]
+    wanted = {uuid.encode('ascii') for uuid in uuids}
+    spans = spans or {}
+    
+    ranges = []
+    objects = {}
+    lines_removed = 0
+    line = 1
+    counted = 0
+    dropped_to = 0
+    for match in DROPPABLE_LINE_BYTES.finditer(mm):
+        uuid = match.group(1)
+        if uuid not in wanted:
+            continue
+        start = match.start() + 1
+        if start < dropped_to:
+            continue  # Inside an entry already dropped
+        uuid = uuid.decode('ascii')
+        definition = match.group(3) is not None
+        if definition and uuid in spans and spans[uuid].end > match.end():
+            end = mm.find(b'\n', spans[uuid].end)
+            lines_removed += mm[start:end].count(b'\n')
         else:
-            filtered_lines.append(line)
-    
-    return '\n'.join(filtered_lines), removed_count
-
-def validate_project_file(content):
-    """Basic validation to ensure project file structure is intact"""
-    required_sections = [
-        '/* Begin PBXBuildFile section */',
-        '/* End PBXBuildFile section */',
-        '/* Begin PBXFileReference section */',
-        '/* End PBXFileReference section */',
-        '/* Begin PBXGroup section */',
-        '/* End PBXGroup section */',
-        '/* Begin PBXProject section */',
-        '/* End PBXProject section */'
-    ]
-    
-    for section in required_sections:
+            end = mm.find(b'\n', match.end())
+        end = len(mm) if end < 0 else end + 1
+        ranges.append((start, end))
+        lines_removed += 1
+        dropped_to = end
+        line += mm[counted:start].count(b'\n')
+        counted = start
+        
+        entry = objects.get(uuid)
+        if entry is None:
+            name = match.group(2)
+            entry = objects[uuid] = {'name': name.decode('utf-8', 'replace') if name else '', 'section': '', 'lines': []}
+        entry['lines'].append(line)
+        if definition:
+            boundary = bisect_right(offsets, start) - 1
+            entry['section'] = boundaries[boundary][1] if boundary >= 0 else ''
+    
+    return ranges, {'lines_removed': lines_removed, 'objects': objects}
+
+def kept_chunks(mm, ranges):
+    """The bytes outside ranges, in chunks of at most STREAM_CHUNK_BYTES"""
+    position = 0
+    for start, end in ranges + [(len(mm), len(mm))]:
+        for offset in range(position, start, STREAM_CHUNK_BYTES):
+            yield mm[offset:min(offset + STREAM_CHUNK_BYTES, start)]
+        position = end
+
+def write_kept_ranges(mm, ranges, project_file):
+    """Copy everything outside ranges to a temporary file beside project_file
+    
+    Returns the temporary path and the brace balance of what was written;
+    the caller renames it over project_file (or deletes it).
+    """
+    directory = os.path.dirname(os.path.abspath(project_file))
+    fd, temp_path = tempfile.mkstemp(prefix='.project.pbxproj.', dir=directory)
+    balance = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in kept_chunks(mm, ranges):
+                balance += chunk.count(b'{') - chunk.count(b'}')
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        shutil.copymode(project_file, temp_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, balance
+
+def validate_project_file(content, baseline=()):
+    """Check the project parses and every reference in it resolves
+    
+    Only error issues from validate_graph fail validation, and only those
+    not already in baseline -- the issue keys of the project before
+    cleaning -- so damage a project already had does not block a cleanup
+    that did not cause it.
+    """
+    for section in REQUIRED_SECTIONS:
         if section not in content:
             return False, f"Missing required section: {section}"
     
-    # Check that braces are balanced
-    open_braces = content.count('{')
-    close_braces = content.count('}')
-    if open_braces != close_braces:
-        return False, f"Unbalanced braces: {open_braces} open, {close_braces} close"
+    try:
+        graph = ProjectGraph(content, allow_duplicates=True)
+    except ParseError as e:
+        return False, f"Project file does not parse: {e}"
     
+    baseline = set(baseline)
+    errors = [issue for issue in validate_graph(graph) if issue.severity == 'error' and issue_key(issue) not in baseline]
+    if errors:
+        return False, f"{len(errors)} integrity errors, first: {errors[0].message}"
     return True, "OK"
 
-def main():
-    # Path to your project file
-    project_file = "JubileeMobileBay.xcodeproj/project.pbxproj"
+def validate_structure(content, baseline_balance=0):
+    """Check the required sections are present and the braces balance as they did before cleaning
     
-    if not os.path.exists(project_file):
-        print(f"❌ Error: Project file not found: {project_file}")
-        print("Please run this script from the project root directory.")
-        sys.exit(1)
+    The check for projects the graph parser rejects: line-based removal
+    can only break them by dropping a section marker or part of an entry.
+    baseline_balance is the brace balance of the project before cleaning.
+    """
+    for section in REQUIRED_SECTIONS:
+        if section not in content:
+            return False, f"Missing required section: {section}"
+    balance = content.count('{') - content.count('}')
+    if balance != baseline_balance:
+        return False, f"Unbalanced braces ({balance - baseline_balance:+d})"
+    return True, "OK"
+
+def issue_key(issue):
+    """What identifies an issue across validations of the same project"""
+    return issue.kind, issue.uuid, issue.message
+
+def print_issues(issues, limit=10):
+    """Integrity issues grouped by kind, errors first"""
+    by_kind = {}
+    for issue in sorted(issues, key=lambda issue: (issue.severity != 'error', issue.kind)):
+        by_kind.setdefault((issue.severity, issue.kind), []).append(issue)
+    for (severity, kind), group in by_kind.items():
+        icon = "❌" if severity == 'error' else "⚠️ "
+        print(f"  {icon} {kind}: {len(group)}")
+        for issue in group[:limit]:
+            print(f"      {issue.message}")
+        if len(group) > limit:
+            print(f"      ... and {len(group) - limit} more")
+
+def print_duplicates(duplicates, duplicate_definitions=0):
+    """List the duplicates and what removing them takes"""
+    print(f"\n⚠️  Found {len(duplicates)} files with duplicate references:")
+    for filename, dup_info in sorted(duplicates.items()):
+        print(f"  - {filename}: {len(dup_info['remove']) + 1} references (keeping first)")
     
-    print("🔍 Xcode Project Duplicate File Reference Cleanup")
-    print("=" * 50)
+    print(f"\n🗑️  {sum(len(d['remove']) for d in duplicates.values())} duplicate references to remove.")
+    if duplicate_definitions:
+        print(f"   Also {duplicate_definitions} later definitions of objects defined twice.")
+
+def confirm_removal():
+    """Ask before removing the listed duplicates"""
+    response = input("\n❓ Continue? (yes/no): ").strip().lower()
     
-    # Step 1: Create backup
-    backup_path = create_backup(project_file)
+    if response != 'yes':
+        print("\n❌ Cancelled by user.")
+        return False
+    return True
+
+def cleanup_result(project_file, mode):
+    """The JSON-serializable outcome of cleaning one project
+    
+    status is 'clean' (no duplicates), 'cancelled', 'dry-run' (duplicates
+    found and removable, nothing written), 'invalid' (the cleaned project
+    failed validation), 'cleaned' or 'error'.
+    """
+    return {
+        'project': project_file,
+        'mode': mode,
+        'status': 'clean',
+        'message': '',
+        'duplicates': {},
+        'removal': None,
+        'backup': None
+    }
+
+def duplicate_uuids(duplicates):
+    """duplicates with the kept and removed references as UUIDs"""
+    return {
+        filename: {'keep': dup_info['keep'].uuid, 'remove': [ref.uuid for ref in dup_info['remove']]}
+        for filename, dup_info in duplicates.items()
+    }
+
+def cleanup_in_memory(project_file, policy='ask'):
+    """Read, clean, validate and rewrite the project as one string
     
-    # Step 2: Read the file
+    policy is 'ask' (confirm on the terminal), 'dry-run' or 'apply'.
+    Returns a cleanup_result.
+    """
     print("\n📖 Reading project file...")
     with open(project_file, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Step 3: Parse file references
+    # Parse the project graph, or fall back to file reference tokens. Objects
+    # defined twice (e.g. by a bad merge) keep their first definition
     print("\n🔎 Analyzing file references...")
-    file_refs = parse_file_references(content)
-    print(f"  Found {len(file_refs)} total file references")
+    try:
+        graph = ProjectGraph(content, allow_duplicates=True)
+        print(f"  Parsed {len(graph.objects)} objects, {len(graph.by_isa['PBXFileReference'])} file references")
+        if graph.duplicate_definitions:
+            print(f"  {len(graph.duplicate_definitions)} objects defined more than once; later definitions will be removed")
+    except ParseError as e:
+        print(f"⚠️  Project graph unavailable ({e}), matching references line by line")
+        graph = None
+    # Issues the project already has, so validation only blames the cleanup for new ones
+    baseline = [issue_key(issue) for issue in validate_graph(graph)] if graph is not None else []
+    result = cleanup_result(project_file, 'graph' if graph is not None else 'lines')
     
-    # Step 4: Find duplicates
-    duplicates = analyze_duplicates(file_refs)
+    build_files = None
+    if graph is not None:
+        duplicates = analyze_graph_duplicates(graph)
+    else:
+        file_refs = parse_file_references(content)
+        paths, build_files = file_paths(content)
+        print(f"  Found {len(file_refs)} total file references, {len(paths)} files with a resolved path")
+        duplicates = analyze_duplicates(file_refs, paths)
+    result['duplicates'] = duplicate_uuids(duplicates)
     
-    if not duplicates:
+    if not duplicates and not (graph and graph.duplicate_definitions):
         print("\n✅ No duplicate file references found!")
-        return
-    
-    print(f"\n⚠️  Found {len(duplicates)} files with duplicate references:")
-    for filename, dup_info in sorted(duplicates.items()):
-        print(f"  - {filename}: {len(dup_info['remove']) + 1} references (keeping first)")
-    
-    # Step 5: Ask for confirmation
-    print(f"\n❓ This will remove {sum(len(d['remove']) for d in duplicates.values())} duplicate references.")
-    response = input("Continue? (yes/no): ").strip().lower()
-    
-    if response != 'yes':
-        print("\n❌ Cancelled by user.")
-        return
+        return result
+    print_duplicates(duplicates, len(graph.duplicate_definitions) if graph else 0)
+    if policy == 'ask' and not confirm_removal():
+        result['status'] = 'cancelled'
+        return result
     
-    # Step 6: Remove duplicates
     print("\n🧹 Removing duplicate references...")
-    cleaned_content, removed_count = remove_duplicate_references(content, duplicates)
-    print(f"  Removed {removed_count} lines")
+    cleaned_content, result['removal'] = remove_duplicate_references(content, duplicates, graph, build_files)
+    print_removal_report(result['removal'])
     
-    # Step 7: Validate cleaned content
     print("\n✔️  Validating cleaned project file...")
-    is_valid, message = validate_project_file(cleaned_content)
+    if graph is not None:
+        is_valid, result['message'] = validate_project_file(cleaned_content, baseline)
+    else:
+        # The project did not parse before cleaning either
+        is_valid, result['message'] = validate_structure(cleaned_content, content.count('{') - content.count('}'))
     
     if not is_valid:
-        print(f"❌ Validation failed: {message}")
-        print(f"   Backup preserved at: {backup_path}")
-        return
+        print(f"❌ Validation failed: {result['message']}")
+        result['status'] = 'invalid'
+        return result
+    if policy == 'dry-run':
+        result['status'] = 'dry-run'
+        return result
     
-    # Step 8: Write cleaned content
+    result['backup'] = create_backup(project_file)
     print("\n💾 Writing cleaned project file...")
     with open(project_file, 'w', encoding='utf-8') as f:
         f.write(cleaned_content)
+    result['status'] = 'cleaned'
+    return result
+
+def cleanup_streaming(project_file, policy='ask'):
+    """Clean the memory-mapped project, streaming kept byte ranges to a temporary file renamed over it
+    
+    Memory stays bounded by the object index however large the file is.
+    policy is as for cleanup_in_memory. Returns a cleanup_result.
+    """
+    result = cleanup_result(project_file, 'stream')
+    print("\n📖 Mapping project file...")
+    with open(project_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        print("\n🔎 Analyzing file references...")
+        objects, parents, build_files = scan_project_stream(mm)
+        print(f"  Indexed {len(objects)} files and groups, {len(build_files)} build files")
+        
+        duplicates = analyze_stream_duplicates(objects, parents)
+        result['duplicates'] = duplicate_uuids(duplicates)
+        if not duplicates:
+            print("\n✅ No duplicate file references found!")
+            return result
+        print_duplicates(duplicates)
+        if policy == 'ask' and not confirm_removal():
+            result['status'] = 'cancelled'
+            return result
+        
+        # The duplicates' PBXBuildFiles go too, so build phases lose their entries
+        uuids_to_remove = {ref.uuid for dup_info in duplicates.values() for ref in dup_info['remove']}
+        uuids_to_remove.update(uuid for uuid, file_ref in build_files.items() if file_ref in uuids_to_remove)
+        
+        print("\n🧹 Removing duplicate references...")
+        ranges, result['removal'] = stream_drop_ranges(mm, uuids_to_remove, objects)
+        print_removal_report(result['removal'])
+        
+        print("\n✔️  Validating cleaned project file...")
+        missing = [section for section in REQUIRED_SECTIONS if mm.find(section.encode()) < 0]
+        if policy == 'dry-run':
+            temp_path = None
+            balance = sum(chunk.count(b'{') - chunk.count(b'}') for chunk in kept_chunks(mm, ranges))
+        else:
+            temp_path, balance = write_kept_ranges(mm, ranges, project_file)
+    
+    if missing or balance:
+        if temp_path:
+            os.unlink(temp_path)
+        result['message'] = f"Missing required section: {missing[0]}" if missing else f"Unbalanced braces ({balance:+d})"
+        print(f"❌ Validation failed: {result['message']}")
+        result['status'] = 'invalid'
+        return result
+    result['message'] = "OK"
+    if policy == 'dry-run':
+        result['status'] = 'dry-run'
+        return result
+    
+    result['backup'] = create_backup(project_file)
+    print("\n💾 Writing cleaned project file...")
+    os.replace(temp_path, project_file)
+    result['status'] = 'cleaned'
+    return result
+
+def cleanup_project(project_file, policy='ask', stream=None):
+    """Clean one project in memory or, for large files or with stream, in streaming mode"""
+    if stream is None:
+        stream = os.path.getsize(project_file) >= STREAM_THRESHOLD_BYTES
+    return (cleanup_streaming if stream else cleanup_in_memory)(project_file, policy)
+
+def discover_projects(root):
+    """Every *.xcodeproj/project.pbxproj under root, largest first"""
+    projects = []
+    for directory, subdirectories, files in os.walk(root):
+        if directory.endswith('.xcodeproj'):
+            if 'project.pbxproj' in files:
+                projects.append(os.path.join(directory, 'project.pbxproj'))
+            subdirectories[:] = []
+            continue
+        subdirectories[:] = [d for d in subdirectories if not d.startswith('.') and d not in SKIPPED_DIRECTORIES]
+    return sorted(projects, key=os.path.getsize, reverse=True)
+
+def cleanup_quietly(project_file, policy, stream=None):
+    """cleanup_project without prompting, with its output captured in the result"""
+    started = time.perf_counter()
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            result = cleanup_project(project_file, policy, stream)
+    except Exception as e:
+        result = cleanup_result(project_file, 'stream' if stream else 'graph')
+        result['status'] = 'error'
+        result['message'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    result['log'] = log.getvalue()
+    return result
+
+def cleanup_batch(root, policy='dry-run', jobs=None, stream=None):
+    """Clean every project under root in a process pool; the aggregated report
+    
+    Projects are submitted largest first, so the workspace takes about as
+    long as its largest project once there are enough workers.
+    """
+    started = time.perf_counter()
+    projects = discover_projects(root)
+    jobs = min(jobs or os.cpu_count() or 1, max(len(projects), 1))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(cleanup_quietly, projects, repeat(policy), repeat(stream)))
+    else:
+        results = [cleanup_quietly(project_file, policy, stream) for project_file in projects]
+    
+    return {
+        'root': os.path.abspath(root),
+        'policy': policy,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'seconds': round(time.perf_counter() - started, 3),
+        'summary': {
+            'projects': len(results),
+            'statuses': dict(Counter(result['status'] for result in results)),
+            'duplicate_files': sum(len(result['duplicates']) for result in results),
+            'objects_removed': sum(len(result['removal']['objects']) for result in results
+                                   if result['removal'] and result['status'] in ('cleaned', 'dry-run'))
+        },
+        'projects': results
+    }
+
+def write_report(report, report_path):
+    """Write a cleanup report as JSON"""
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+    print(f"📋 Report written to: {report_path}")
+
+def section_blocks(content, name, start, end):
+    """(key, start, end) of the content-defined blocks of the section spanning content[start:end]
+    
+    A block is keyed by its section and the UUID of its first object.
+    """
+    block_start, first = start, None
+    for match in OBJECT_HEAD_PATTERN.finditer(content, start, end):
+        uuid = match.group(1)
+        if first is None:
+            first = uuid
+        elif zlib.crc32(uuid.encode('ascii')) % BLOCK_OBJECTS == 0:
+            yield f"{name}:{first}", block_start, match.start()
+            block_start, first = match.start(), uuid
+    yield f"{name}:{first or start}", block_start, end
+
+def text_digest(text):
+    """Hex digest identifying a block or section text"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+class ReferenceIndex:
+    """Persistent index of file references and group membership, kept per block of a section
+    
+    Each block of a watched section (see section_blocks) is stored with the
+    hash of its text, its objects (offset within the block and properties)
+    and its children -> group edges. update() hashes only the watched
+    sections whose text changed, re-parses only the blocks whose hash
+    changed, and patches the merged objects, parents and file paths for
+    them, so duplicates() only reads the paths that have several files.
+    """
+    
+    def __init__(self, project_file, index_path=None):
+        self.project_file = os.path.abspath(project_file)
+        # xcuserdata inside the .xcodeproj is per-user; this repo tracks it, so .gitignore lists the index
+        self.index_path = index_path or os.path.join(os.path.dirname(self.project_file), 'xcuserdata', 'duplicate_index.json')
+        self.blocks = {}
+        self.offsets = {}
+        self.errors = {}
+        # (section, occurrence) -> (hash, start, block keys) as of the last update
+        self.sections = {}
+        # Merged view of the blocks: objects at their offset within their block
+        self.objects = {}
+        self.block_of = {}
+        self.parents = {}
+        self.listed_by = defaultdict(set)
+        self.children = defaultdict(set)
+        # resolve_path cache, file_path of every file object and the files at each path
+        self.paths = {}
+        self.file_paths = {}
+        self.files_at = defaultdict(set)
+        self.duplicate_paths = set()
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('version') == INDEX_VERSION and stored.get('project') == self.project_file:
+                self.blocks = stored['blocks']
+        except (OSError, ValueError, KeyError):
+            pass
+        touched = set()
+        for key, block in self.blocks.items():
+            touched |= self.merge_block(block, key)
+        self.refresh_paths(touched)
+    
+    def save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'project': self.project_file, 'blocks': self.blocks}, f)
+        os.replace(temp_path, self.index_path)
+    
+    @staticmethod
+    def parse_block(text):
+        """Objects and parent edges of a run of object entries, parsed as an objects dictionary"""
+        prefix = '{objects = {'
+        graph = ProjectGraph(prefix + text + '};}')
+        objects = {
+            obj.uuid: [obj.start - len(prefix), {key: obj.properties[key] for key in ('isa', 'name', 'path', 'sourceTree')
+                                                 if isinstance(obj.properties.get(key), str)}]
+            for obj in graph.objects.values()
+        }
+        return objects, graph.parents
+    
+    def merge_block(self, block, key):
+        """Add a block's objects and edges to the merged view; the UUIDs whose path may have changed"""
+        for uuid, (start, properties) in block['objects'].items():
+            self.objects[uuid] = PBXObject(uuid, properties, start, start)
+            self.block_of[uuid] = key
+        for child, group in block['parents'].items():
+            self.listed_by[child].add(group)
+            self.children[group].add(child)
+            self.parents.setdefault(child, group)
+        return set(block['objects']) | set(block['parents'])
+    
+    def unmerge_block(self, block, key):
+        """Take a block's objects and edges out of the merged view; the UUIDs whose path may have changed"""
+        for uuid in block['objects']:
+            if self.block_of.get(uuid, key) == key:
+                self.objects.pop(uuid, None)
+                self.block_of.pop(uuid, None)
+        for child, group in block['parents'].items():
+            self.listed_by[child].discard(group)
+            self.children[group].discard(child)
+            if self.parents.get(child) == group:
+                if self.listed_by[child]:
+                    self.parents[child] = next(iter(self.listed_by[child]))
+                else:
+                    del self.parents[child]
+        return set(block['objects']) | set(block['parents'])
+    
+    def refresh_paths(self, touched):
+        """Re-resolve the file paths of touched and everything below them"""
+        stale = set()
+        pending = list(touched)
+        while pending:
+            uuid = pending.pop()
+            if uuid not in stale:
+                stale.add(uuid)
+                pending.extend(self.children.get(uuid, ()))
+        for uuid in stale:
+            self.paths.pop(uuid, None)
+            path = self.file_paths.pop(uuid, None)
+            if path is not None:
+                self.files_at[path].discard(uuid)
+                self.mark_duplicates(path)
+        for uuid in stale:
+            obj = self.objects.get(uuid)
+            if obj is not None and obj.isa in FILE_SECTIONS:
+                path = file_path(uuid, self.objects, self.parents, self.paths)
+                self.file_paths[uuid] = path
+                self.files_at[path].add(uuid)
+                self.mark_duplicates(path)
+    
+    def mark_duplicates(self, path):
+        if len(self.files_at[path]) > 1:
+            self.duplicate_paths.add(path)
+        else:
+            self.duplicate_paths.discard(path)
+            if not self.files_at[path]:
+                del self.files_at[path]
+    
+    def update(self, content):
+        """Bring the index up to date with content; the sections of the blocks that changed"""
+        changed = []
+        touched = set()
+        present = set()
+        offsets = {}
+        sections = {}
+        occurrences = Counter()
+        boundaries = section_boundaries(content)
+        for (start, name), (end, _) in zip(boundaries, boundaries[1:]):
+            if name not in WATCHED_SECTIONS:
+                continue
+            section = (name, occurrences[name])
+            occurrences[name] += 1
+            digest = text_digest(content[start:end])
+            previous = self.sections.get(section)
+            if previous and previous[0] == digest and all(key in self.blocks for key in previous[2]):
+                # Same text, possibly moved: only its blocks' offsets shift
+                for key in previous[2]:
+                    offsets[key] = self.offsets[key] + start - previous[1]
+                present.update(previous[2])
+                sections[section] = (digest, start, previous[2])
+                continue
+            keys = []
+            for key, block_start, block_end in section_blocks(content, name, start, end):
+                keys.append(key)
+                present.add(key)
+                offsets[key] = block_start
+                text = content[block_start:block_end]
+                digest_block = text_digest(text)
+                if key in self.blocks and self.blocks[key]['hash'] == digest_block:
+                    continue
+                changed.append(name)
+                try:
+                    objects, parents = self.parse_block(text)
+                    self.errors.pop(key, None)
+                except ParseError as e:
+                    # Keep the block out of the index until it parses again
+                    objects, parents = {}, {}
+                    self.errors[key] = str(e)
+                if key in self.blocks:
+                    touched |= self.unmerge_block(self.blocks[key], key)
+                self.blocks[key] = {'hash': digest_block, 'objects': objects, 'parents': parents}
+                touched |= self.merge_block(self.blocks[key], key)
+            sections[section] = (digest, start, keys)
+        for key in set(self.blocks) - present:
+            touched |= self.unmerge_block(self.blocks.pop(key), key)
+            self.errors.pop(key, None)
+            changed.append(key.split(':')[0])
+        self.offsets = offsets
+        self.sections = sections
+        self.refresh_paths(touched)
+        return changed
+    
+    def duplicates(self):
+        """Duplicate file references across the indexed blocks, as analyze_stream_duplicates reports them"""
+        duplicates = {}
+        for path in self.duplicate_paths:
+            group = []
+            for uuid in self.files_at[path]:
+                obj = self.objects[uuid]
+                start = self.offsets.get(self.block_of[uuid], 0) + obj.start
+                group.append(PBXObject(uuid, obj.properties, start, start))
+            group.sort(key=lambda x: x.start)
+            duplicates[path] = {
+                'keep': group[0],
+                'remove': group[1:]
+            }
+        return duplicates
+
+def validate_project(project_file):
+    """Print the integrity issues of project_file; True when it has no errors"""
+    with open(project_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    started = time.perf_counter()
+    try:
+        graph = ProjectGraph(content, allow_duplicates=True)
+    except ParseError as e:
+        print(f"❌ Project file does not parse: {e}")
+        return False
+    parsed = time.perf_counter()
+    issues = validate_graph(graph)
+    finished = time.perf_counter()
+    
+    print(f"  Checked {len(graph.objects)} objects and {len(graph.references)} references "
+          f"(parse {(parsed - started) * 1000:.0f} ms, validate {(finished - parsed) * 1000:.0f} ms)")
+    if not issues:
+        print("\n✅ No integrity issues found!")
+        return True
+    print()
+    print_issues(issues)
+    return not any(issue.severity == 'error' for issue in issues)
+
+def watch_project(project_file, interval=0.1, index_path=None, validate=False):
+    """Poll project_file and report duplicates as soon as a save introduces them
+    
+    Xcode replaces the file on save, so the stat signature (inode, size,
+    mtime) is compared on every poll; a change costs a read, a hash per
+    watched section, a hash per block of the sections that differ and a
+    parse of the blocks that differ. With validate, each change also runs
+    validate_graph over the whole project and reports the integrity errors
+    it introduced or fixed.
+    """
+    index = ReferenceIndex(project_file, index_path)
+    reported = None
+    reported_errors = set()
+    last = None
+    print(f"👀 Watching {project_file} (index: {index.index_path})")
+    while True:
+        try:
+            stat = os.stat(project_file)
+        except FileNotFoundError:
+            time.sleep(interval)
+            continue
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if signature != last:
+            last = signature
+            started = time.perf_counter()
+            with open(project_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            changed = index.update(content)
+            if not changed and reported is not None:
+                time.sleep(interval)
+                continue
+            duplicates = duplicate_uuids(index.duplicates())
+            elapsed = (time.perf_counter() - started) * 1000
+            
+            stamp = datetime.now().strftime('%H:%M:%S')
+            if changed:
+                blocks = Counter(changed)
+                print(f"[{stamp}] 🔁 " + ", ".join(f"{name} ({count} block{'s' if count > 1 else ''})"
+                                                  for name, count in sorted(blocks.items()))
+                      + f" re-parsed ({elapsed:.1f} ms)")
+            for key, error in sorted(index.errors.items()):
+                print(f"  ❌ {key} does not parse: {error}")
+            for path, dup_info in sorted(duplicates.items()):
+                new = set(dup_info['remove']) - set((reported or {}).get(path, {}).get('remove', ()))
+                if new:
+                    print(f"  ⚠️  Duplicate: {path} ({len(dup_info['remove']) + 1} references, "
+                          f"keeping {dup_info['keep']}, new: {', '.join(sorted(new))})")
+            for path in sorted(set(reported or ()) - set(duplicates)):
+                print(f"  ✅ Resolved: {path}")
+            if reported and not duplicates:
+                print("  ✅ No duplicate file references")
+            if validate and changed and not index.errors:
+                started = time.perf_counter()
+                issues = {issue_key(issue): issue for issue in validate_graph(ProjectGraph(content, allow_duplicates=True))
+                          if issue.severity == 'error'}
+                elapsed = (time.perf_counter() - started) * 1000
+                for key in sorted(set(issues) - reported_errors):
+                    print(f"  ❌ {issues[key].kind}: {issues[key].message}")
+                for kind, uuid, message in sorted(reported_errors - set(issues)):
+                    print(f"  ✅ Fixed {kind}: {message}")
+                if issues.keys() != reported_errors:
+                    print(f"  🔗 {len(issues)} integrity errors ({elapsed:.1f} ms)")
+                reported_errors = set(issues)
+            reported = duplicates
+            if changed:
+                index.save()
+        time.sleep(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # Path to your project file
+    parser.add_argument('project', nargs='?', default="JubileeMobileBay.xcodeproj/project.pbxproj",
+                        help='project.pbxproj to clean')
+    parser.add_argument('--stream', action='store_true', default=None,
+                        help=f'Memory-map the project and stream the cleaned copy to disk '
+                             f'(automatic from {STREAM_THRESHOLD_BYTES >> 20} MiB)')
+    parser.add_argument('--batch', metavar='ROOT',
+                        help='Clean every *.xcodeproj/project.pbxproj under ROOT without prompting')
+    policy = parser.add_mutually_exclusive_group()
+    policy.add_argument('--dry-run', action='store_const', dest='policy', const='dry-run',
+                        help='Report what would be removed without writing anything (default for --batch)')
+    policy.add_argument('--apply', action='store_const', dest='policy', const='apply',
+                        help='Remove duplicates without asking')
+    parser.add_argument('-j', '--jobs', type=int, help='Worker processes for --batch (default: one per CPU)')
+    parser.add_argument('--report', help='Write a JSON report here (default for --batch: duplicate_cleanup_report.json)')
+    parser.add_argument('--watch', action='store_true', help='Keep watching the project and report duplicates as saves add them')
+    parser.add_argument('--interval', type=float, default=0.1, help='Seconds between polls in --watch mode')
+    parser.add_argument('--index', help='Where --watch keeps its reference index '
+                                        '(default: xcuserdata/duplicate_index.json in the .xcodeproj)')
+    parser.add_argument('--validate', action='store_true',
+                        help='Check every reference in the project and exit; with --watch, check on every save')
+    args = parser.parse_args()
+    
+    if args.batch:
+        if not os.path.isdir(args.batch):
+            print(f"❌ Error: Not a directory: {args.batch}")
+            sys.exit(1)
+        print(f"🔍 Batch duplicate cleanup under {args.batch} ({args.policy or 'dry-run'})")
+        print("=" * 50)
+        report = cleanup_batch(args.batch, args.policy or 'dry-run', args.jobs, args.stream)
+        for result in report['projects']:
+            removed = len(result['removal']['objects']) if result['removal'] else 0
+            print(f"  {result['status']:<9} {len(result['duplicates']):>5} duplicates {removed:>6} objects "
+                  f"{result['seconds']:>7.2f}s  {result['project']}")
+            if result['status'] in ('invalid', 'error'):
+                print(f"            {result['message']}")
+        summary = report['summary']
+        print(f"\n{summary['projects']} projects in {report['seconds']:.2f}s: "
+              + ", ".join(f"{count} {status}" for status, count in sorted(summary['statuses'].items())))
+        write_report(report, args.report or 'duplicate_cleanup_report.json')
+        if summary['statuses'].get('invalid') or summary['statuses'].get('error'):
+            sys.exit(1)
+        return
+    
+    project_file = args.project
+    
+    if not os.path.exists(project_file):
+        print(f"❌ Error: Project file not found: {project_file}")
+        print("Please run this script from the project root directory.")
+        sys.exit(1)
+    
+    if args.watch:
+        try:
+            watch_project(project_file, args.interval, args.index, args.validate)
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching.")
+        return
+    
+    if args.validate:
+        print(f"🔗 Validating {project_file}")
+        print("=" * 50)
+        if not validate_project(project_file):
+            sys.exit(1)
+        return
+    
+    print("🔍 Xcode Project Duplicate File Reference Cleanup")
+    print("=" * 50)
+    
+    # Find, remove and validate duplicates; the backup is taken just before the project is rewritten
+    result = cleanup_project(project_file, args.policy or 'ask', args.stream)
+    if args.report:
+        write_report(result, args.report)
+    if result['status'] == 'dry-run':
+        print("\n📋 Dry run: nothing was written.")
+    if result['status'] != 'cleaned':
+        return
     
+    snapshot_id = result['backup']
     print("\n✅ Success! Duplicate references removed.")
-    print(f"   Backup saved at: {backup_path}")
+    print(f"   Backup saved as snapshot: {snapshot_id}")
     print("\n📋 Next steps:")
     print("   1. Open Xcode")
     print("   2. Clean Build Folder (⇧⌘K)")
     print("   3. Build the project (⌘B)")
     print("\n⚠️  If anything goes wrong, restore from backup:")
-    print(f"   cp {backup_path} {project_file}")
+    # backup_store.py sits next to this script; name it as the user can run it from here
+    backup_store = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backup_store.py')
+    if not os.path.relpath(backup_store).startswith(os.pardir):
+        backup_store = os.path.relpath(backup_store)
+    print(f"   python3 {shlex.quote(backup_store)} --project {shlex.quote(project_file)} restore {snapshot_id}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Xcode project.pbxproj object-graph parser
+Parses the OpenStep property list Xcode writes into an object graph:
+- UUID -> object map and isa -> objects index
+- Reverse reference edges, so "who points at this object" is a dict lookup
+- Text spans of every object and reference, so objects can be removed
+  (with their PBXBuildFiles and group entries) without rewriting the rest
+  of the file
+"""
+
+import re
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+# Whitespace and comments before a token, then the token itself
+TOKEN_PATTERN = re.compile(r'''
+    (?:\s+|/\*.*?\*/|//[^\n]*)*
+    (?:
+        (?P<string>"(?:[^"\\]|\\.)*")
+      | (?P<word>[\w$+/:.\-]+)
+      | (?P<data><[\s0-9A-Fa-f]*>)
+      | (?P<punct>[{}()=;,])
+      | (?P<error>\S)
+    )
+''', re.S | re.X)
+ESCAPE_PATTERN = re.compile(r'\\(U[0-9A-Fa-f]{4}|[0-7]{1,3}|.)', re.S)
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'a': '\a', 'b': '\b', 'f': '\f', 'v': '\v'}
+UUID_PATTERN = re.compile(r'[0-9A-F]{24}')
+# Strings Xcode writes without quotes
+BARE_PATTERN = re.compile(r'[A-Za-z0-9_$/:.\-]+')
+# An array element's comment and separating comma, e.g. ' /* Foo.swift */,'
+ELEMENT_TAIL_PATTERN = re.compile(r'(?:\s*/\*.*?\*/)?\s*,', re.S)
+
+# A PBXBuildFile only exists for the file or package product it builds
+DEPENDENT_KEYS = {'fileRef', 'productRef'}
+# Arrays that own their members: group children and build phase files
+OWNING_KEYS = {'children', 'files'}
+# Properties whose UUID-looking strings are plain values, not references
+UNCHECKED_KEYS = {'buildSettings'}
+
+class ParseError(ValueError):
+    """project.pbxproj is not a well-formed property list"""
+
+class Reference(NamedTuple):
+    """One UUID-valued property (or array element, or dictionary key) of an object"""
+    source: str
+    key: str  # Property of the source object holding the reference
+    target: str
+    start: int
+    end: int
+    in_array: bool
+
+class Issue(NamedTuple):
+    """One referential integrity problem found by validate_graph"""
+    severity: str  # 'error' or 'warning'
+    kind: str
+    uuid: str  # Object the issue is about
+    message: str
+
+class PBXObject:
+    """One entry of the objects dictionary"""
+
+    __slots__ = ('uuid', 'isa', 'properties', 'start', 'end')
+
+    def __init__(self, uuid, properties, start, end):
+        self.uuid = uuid
+        self.isa = properties.get('isa', '')
+        self.properties = properties
+        self.start = start
+        self.end = end
+
+    @property
+    def name(self):
+        return self.properties.get('name') or self.properties.get('path') or self.isa
+
+    def __repr__(self):
+        return f"<{self.isa} {self.uuid} {self.name!r}>"
+
+def unescape(text):
+    """Value of a quoted string token"""
+    def replace(match):
+        escape = match.group(1)
+        if escape[0] == 'U' and len(escape) == 5:
+            return chr(int(escape[1:], 16))
+        if escape[0] in '01234567':
+            return chr(int(escape, 8))
+        return ESCAPES.get(escape, escape)
+    body = text[1:-1]
+    return ESCAPE_PATTERN.sub(replace, body) if '\\' in body else body
+
+def quote(value):
+    """value as Xcode writes it: bare when it can be, otherwise quoted with escapes"""
+    if BARE_PATTERN.fullmatch(value) and '//' not in value:
+        return value
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t')
+    return f'"{escaped}"'
+
+class _Parser:
+    """Recursive descent over TOKEN_PATTERN tokens, recording object and UUID spans"""
+
+    def __init__(self, text, allow_duplicates=False):
+        self.text = text
+        self.tokens = TOKEN_PATTERN.finditer(text)
+        self.allow_duplicates = allow_duplicates
+        self.objects = {}
+        self.duplicates = []
+        self.references = []
+        self.source = None  # Object whose properties are being parsed
+        self.key = None  # Its property being parsed
+
+    def next(self):
+        """The next token's match; its lastgroup is the token kind"""
+        match = next(self.tokens, None)
+        if match is None:
+            raise ParseError("Unexpected end of file")
+        if match.lastgroup == 'error':
+            raise ParseError(f"Unexpected {match['error']!r} at offset {match.start('error')}")
+        return match
+
+    def expect(self, punctuation):
+        """Offset just past the expected punctuation token"""
+        match = self.next()
+        if match.lastgroup != 'punct' or match['punct'] != punctuation:
+            raise ParseError(f"Expected {punctuation!r} at offset {match.start(match.lastgroup)}, "
+                             f"found {match[match.lastgroup]!r}")
+        return match.end()
+
+    def value(self, match, in_array=False):
+        kind = match.lastgroup
+        text = match[kind]
+        if kind == 'punct':
+            if text == '{':
+                return self.dictionary()
+            if text == '(':
+                return self.array()
+            raise ParseError(f"Unexpected {text!r} at offset {match.start(kind)}")
+        if kind == 'data':
+            return bytes.fromhex(re.sub(r'\s', '', text[1:-1]))
+        value = unescape(text) if kind == 'string' else text
+        if self.source is not None and len(value) == 24 and UUID_PATTERN.fullmatch(value):
+            self.references.append(Reference(self.source, self.key, value, match.start(kind), match.end(), in_array))
+        return value
+
+    def array(self):
+        items = []
+        while True:
+            match = self.next()
+            if match['punct'] == ')':
+                return items
+            items.append(self.value(match, in_array=True))
+            match = self.next()
+            separator = match['punct']
+            if separator == ')':
+                return items
+            if separator != ',':
+                raise ParseError(f"Expected ',' or ')' at offset {match.start(match.lastgroup)}")
+
+    def dictionary(self, objects=False):
+        entries = {}
+        while True:
+            match = self.next()
+            kind = match.lastgroup
+            if kind == 'punct' and match['punct'] == '}':
+                return entries
+            if kind != 'word' and kind != 'string':
+                raise ParseError(f"Expected a key at offset {match.start(kind)}, found {match[kind]!r}")
+            key = unescape(match[kind]) if kind == 'string' else match[kind]
+            self.expect('=')
+
+            if objects:
+                start = match.start(kind)
+                self.source = key
+                mark = len(self.references)
+                properties = self.value(self.next())
+                self.source = None
+                finish = self.expect(';')
+                if not isinstance(properties, dict):
+                    raise ParseError(f"Object {key} at offset {start} is not a dictionary")
+                if key in self.objects:
+                    if not self.allow_duplicates:
+                        raise ParseError(f"Object {key} is defined twice (offset {start})")
+                    # The graph reflects the first definition only
+                    del self.references[mark:]
+                    self.duplicates.append((key, start, finish))
+                    continue
+                self.objects[key] = PBXObject(key, properties, start, finish)
+                continue
+
+            if self.source is not None:
+                if self.key is None:
+                    self.key = key
+                    entries[key] = self.value(self.next())
+                    self.key = None
+                else:
+                    # Nested dictionaries keyed by UUID, e.g. TargetAttributes
+                    if len(key) == 24 and UUID_PATTERN.fullmatch(key):
+                        self.references.append(Reference(self.source, self.key, key, match.start(kind), match.end(), False))
+                    entries[key] = self.value(self.next())
+            else:
+                match = self.next()
+                entries[key] = self.dictionary(objects=True) if key == 'objects' and match['punct'] == '{' else self.value(match)
+            self.expect(';')
+
+class ProjectGraph:
+    """The object graph of one project.pbxproj
+
+    objects maps UUIDs to PBXObjects, by_isa lists objects of each isa in
+    file order, referrers lists the References pointing at each UUID and
+    parents maps each group child to the group listing it.
+
+    An object defined twice is a ParseError unless allow_duplicates, when
+    the first definition is kept and the later ones are listed (UUID,
+    start, end) in duplicate_definitions.
+    """
+
+    def __init__(self, text, allow_duplicates=False):
+        self.text = text
+        parser = _Parser(text, allow_duplicates)
+        match = parser.next()
+        if match['punct'] != '{':
+            raise ParseError(f"Expected '{{' at offset {match.start(match.lastgroup)}")
+        self.root = parser.dictionary()
+        if next(parser.tokens, None) is not None:
+            raise ParseError("Unexpected content after the root dictionary")
+
+        self.objects = parser.objects
+        self.duplicate_definitions = parser.duplicates
+        self.references = parser.references
+        self.by_isa = defaultdict(list)
+        for obj in self.objects.values():
+            self.by_isa[obj.isa].append(obj)
+        self.referrers = defaultdict(list)
+        self.parents = {}
+        for reference in self.references:
+            self.referrers[reference.target].append(reference)
+            if reference.key == 'children':
+                self.parents.setdefault(reference.target, reference.source)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(f.read())
+
+    @property
+    def project(self):
+        """The PBXProject object named by rootObject"""
+        return self.objects.get(self.root.get('rootObject'))
+
+    @property
+    def main_group(self):
+        project = self.project
+        return self.objects.get(project.properties.get('mainGroup')) if project else None
+
+    def referenced_by(self, uuid, key=None):
+        """Objects with a reference to uuid, optionally only through the given property"""
+        return [self.objects[reference.source] for reference in self.referrers.get(uuid, ())
+                if key is None or reference.key == key]
+
+    def parent(self, uuid):
+        """The group listing uuid among its children, if any"""
+        return self.objects.get(self.parents.get(uuid))
+
+    def path(self, uuid):
+        """Path of a file or group (see resolve_path)"""
+        return resolve_path(uuid, self.objects, self.parents)
+
+    def file_path(self, uuid):
+        """Path of a file object, named when it has no path (see file_path)"""
+        return file_path(uuid, self.objects, self.parents)
+
+    def cascade(self, uuids):
+        """uuids plus every object that cannot exist without them
+
+        PBXBuildFiles go with the file or product they build, and the
+        children of a removed group (or files of a removed build phase) go
+        with it unless another surviving container still lists them.
+        """
+        removed = set()
+        pending = [uuid for uuid in uuids if uuid in self.objects]
+        while pending:
+            uuid = pending.pop()
+            if uuid in removed:
+                continue
+            removed.add(uuid)
+            for reference in self.referrers.get(uuid, ()):
+                if reference.key in DEPENDENT_KEYS and not reference.in_array:
+                    pending.append(reference.source)
+            properties = self.objects[uuid].properties
+            for key in OWNING_KEYS:
+                for child in properties.get(key, ()) if isinstance(properties.get(key), list) else ():
+                    holders = {reference.source for reference in self.referrers.get(child, ())
+                               if reference.key in OWNING_KEYS}
+                    if holders <= removed:
+                        pending.append(child)
+        return removed
+
+    def removal_spans(self, removed):
+        """Sorted (start, end) text ranges deleting the removed objects and every array entry naming them"""
+        spans = [line_span(self.text, self.objects[uuid].start, self.objects[uuid].end) for uuid in removed]
+        for uuid in removed:
+            for reference in self.referrers.get(uuid, ()):
+                if reference.in_array and reference.source not in removed:
+                    tail = ELEMENT_TAIL_PATTERN.match(self.text, reference.end)
+                    spans.append(line_span(self.text, reference.start, tail.end() if tail else reference.end))
+        return merge_spans(spans)
+
+    def remove(self, uuids, drop_duplicates=False):
+        """(new text, removed objects) after removing uuids and their cascade
+
+        With drop_duplicates, the later definitions of objects defined more
+        than once go too, leaving the first (the one the graph holds).
+        """
+        removed = self.cascade(uuids)
+        spans = self.removal_spans(removed)
+        if drop_duplicates:
+            spans = merge_spans(spans + [line_span(self.text, start, end) for _, start, end in self.duplicate_definitions])
+        kept, position = [], 0
+        for start, end in spans:
+            kept.append(self.text[position:start])
+            position = end
+        kept.append(self.text[position:])
+        return ''.join(kept), sorted((self.objects[uuid] for uuid in removed), key=lambda obj: obj.start)
+
+def validate_graph(graph):
+    """Referential integrity issues of a project graph, in time linear in its size
+
+    Errors: objects defined more than once, a missing root object or main
+    group, and references to undefined objects -- build files whose file is
+    gone ('missing-file'), build phase entries whose build file is gone
+    ('missing-build-file'), group children that no longer exist
+    ('missing-child') and any other dangling UUID. References into other
+    projects (remoteGlobalIDString behind a foreign containerPortal) and
+    UUID-like build settings are not checked. Warnings: PBXFileReferences
+    not reachable from the main group.
+    """
+    issues = []
+    for uuid, count in Counter(uuid for uuid, _, _ in graph.duplicate_definitions).items():
+        issues.append(Issue('error', 'duplicate-definition', uuid, f"{uuid} is defined {count + 1} times"))
+
+    root = graph.root.get('rootObject')
+    main_group = graph.main_group
+    if graph.project is None:
+        issues.append(Issue('error', 'missing-root', root or '', f"rootObject {root} is not defined"))
+    elif main_group is None:
+        issues.append(Issue('error', 'missing-root', root, f"mainGroup {graph.project.properties.get('mainGroup')} is not defined"))
+
+    for reference in graph.references:
+        if reference.target in graph.objects or reference.key in UNCHECKED_KEYS:
+            continue
+        source = graph.objects[reference.source]
+        if reference.key == 'remoteGlobalIDString' and source.properties.get('containerPortal') != root:
+            continue
+        if source.isa == 'PBXBuildFile':
+            kind = 'missing-file'
+        elif reference.key == 'children':
+            kind = 'missing-child'
+        elif reference.key == 'files':
+            kind = 'missing-build-file'
+        else:
+            kind = 'dangling-reference'
+        issues.append(Issue('error', kind, reference.source,
+                            f"{source.isa} {reference.source} ({source.name}) {reference.key} -> missing {reference.target}"))
+
+    if main_group is not None:
+        reachable = {main_group.uuid}
+        pending = [main_group.uuid]
+        while pending:
+            children = graph.objects[pending.pop()].properties.get('children')
+            for child in children if isinstance(children, list) else ():
+                if child in graph.objects and child not in reachable:
+                    reachable.add(child)
+                    pending.append(child)
+        for obj in graph.by_isa.get('PBXFileReference', ()):
+            if obj.uuid not in reachable:
+                issues.append(Issue('warning', 'unreachable-file', obj.uuid,
+                                    f"PBXFileReference {obj.uuid} ({obj.name}) is not reachable from the main group"))
+    return issues
+
+def resolve_path(uuid, objects, parents, cache=None):
+    """Path of a file or group, joined through its parent groups up to the first that is not group-relative
+
+    objects maps UUIDs to PBXObjects and parents maps a child UUID to the
+    UUID of the group listing it. A dict passed as cache remembers the path
+    of every object on the way, so resolving many files walks each group once.
+    """
+    chain = []
+    seen = set()
+    path = ''
+    obj = objects.get(uuid)
+    while obj is not None and obj.uuid not in seen:
+        if cache is not None and obj.uuid in cache:
+            path = cache[obj.uuid]
+            break
+        seen.add(obj.uuid)
+        chain.append(obj)
+        if obj.properties.get('sourceTree', '<group>') != '<group>':
+            break
+        obj = objects.get(parents.get(obj.uuid))
+
+    for obj in reversed(chain):
+        source_tree = obj.properties.get('sourceTree', '<group>')
+        if source_tree != '<group>':
+            path = source_tree
+        if 'path' in obj.properties:
+            path = f"{path}/{obj.properties['path']}" if path else obj.properties['path']
+        if cache is not None:
+            cache[obj.uuid] = path
+    return path
+
+def file_path(uuid, objects, parents, cache=None):
+    """resolve_path of a file object, ending in its name when it has no path of its own
+
+    PBXVariantGroups (and name-only file references) carry just a name, so
+    without it every variant group of a folder would resolve to the folder.
+    Only the returned key gets the name: children still resolve against the
+    group's path, as Xcode does.
+    """
+    path = resolve_path(uuid, objects, parents, cache)
+    properties = objects[uuid].properties
+    if 'path' not in properties and 'name' in properties:
+        path = f"{path}/{properties['name']}" if path else properties['name']
+    return path
+
+def line_span(text, start, end):
+    """start:end widened to whole lines when nothing else is on them"""
+    line_start = text.rfind('\n', 0, start) + 1
+    line_end = text.find('\n', end)
+    line_end = len(text) if line_end < 0 else line_end
+    if text[line_start:start].strip() or text[end:line_end].strip():
+        return start, end
+    return line_start, min(line_end + 1, len(text))
+
+def merge_spans(spans):
+    """Sorted, non-overlapping union of (start, end) ranges"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('project', nargs='?', default='JubileeMobileBay.xcodeproj/project.pbxproj', help='project.pbxproj to parse')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    graph = ProjectGraph.load(args.project)
+    elapsed = time.perf_counter() - started
+
+    print(f"📖 Parsed {len(graph.objects):,} objects and {len(graph.references):,} references in {elapsed:.3f}s")
+    for isa, objects in sorted(graph.by_isa.items()):
+        print(f"  {isa:<32} {len(objects):>7,}")
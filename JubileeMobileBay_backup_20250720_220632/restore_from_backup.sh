@@ -1,36 +1,47 @@
 #!/bin/bash
 
-# Find the most recent backup
-echo "🔍 Looking for backup files..."
-LATEST_BACKUP=$(ls -t JubileeMobileBay.xcodeproj/project.pbxproj.backup_* 2>/dev/null | head -1)
+PROJECT_FILE=JubileeMobileBay.xcodeproj/project.pbxproj
 
-if [ -z "$LATEST_BACKUP" ]; then
-    echo "❌ No backup files found!"
-    exit 1
-fi
+# Backups live in the snapshot store (see backup_store.py); restoring
+# snapshots the current file first, so the restore can be undone too
+echo "🔍 Looking for backups..."
+if python3 backup_store.py --project "$PROJECT_FILE" list 2>/dev/null | grep -q "snapshots,"; then
+    python3 backup_store.py --project "$PROJECT_FILE" list
+    echo ""
+    python3 backup_store.py --project "$PROJECT_FILE" restore "$@" || exit 1
+else
+    # Full copies made before the store existed
+    LATEST_BACKUP=$(ls -t "$PROJECT_FILE".backup_* 2>/dev/null | head -1)
 
-echo "✅ Found backup: $LATEST_BACKUP"
-echo ""
-echo "⚠️  This will restore the project file from the backup."
-echo "   Current (broken) project file will be overwritten."
-echo ""
-read -p "Continue? (yes/no): " response
+    if [ -z "$LATEST_BACKUP" ]; then
+        echo "❌ No backup files found!"
+        exit 1
+    fi
 
-if [ "$response" != "yes" ]; then
-    echo "❌ Cancelled."
-    exit 0
-fi
+    echo "✅ Found backup: $LATEST_BACKUP"
+    echo ""
+    echo "⚠️  This will restore the project file from the backup."
+    echo "   Current (broken) project file will be overwritten."
+    echo ""
+    read -p "Continue? (yes/no): " response
 
-# Create a backup of the broken file just in case
-cp JubileeMobileBay.xcodeproj/project.pbxproj JubileeMobileBay.xcodeproj/project.pbxproj.broken
+    if [ "$response" != "yes" ]; then
+        echo "❌ Cancelled."
+        exit 0
+    fi
 
-# Restore from backup
-cp "$LATEST_BACKUP" JubileeMobileBay.xcodeproj/project.pbxproj
+    # Create a backup of the broken file just in case
+    cp "$PROJECT_FILE" "$PROJECT_FILE".broken
+
+    # Restore from backup
+    cp "$LATEST_BACKUP" "$PROJECT_FILE"
+
+    echo "✅ Restored from backup!"
+    echo "   Broken file saved as: project.pbxproj.broken"
+fi
 
-echo "✅ Restored from backup!"
-echo "   Broken file saved as: project.pbxproj.broken"
 echo ""
 echo "📋 Next steps:"
 echo "   1. Open Xcode"
 echo "   2. Clean Build Folder (⇧⌘K)"
-echo "   3. Try building again"
\ No newline at end of file
+echo "   3. Try building again"